@@ -75,6 +75,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.cache.UpdateCacheMiddleware",
+    "hines.core.middleware.CacheMetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -306,6 +307,35 @@ else:
 # Seconds before expiring a cached item. None for never expiring.
 CACHES["default"]["TIMEOUT"] = 300
 
+if (
+    HINES_CACHE_TYPE == "redis"
+    and REDIS_URL
+    and os.getenv("HINES_CACHE_LOCAL_TIER", default="False") == "True"
+):
+    # Keep a short-lived copy of recently-used values in each process, in
+    # front of Redis. See hines.core.cache_backends.TwoTierCache.
+    CACHES["shared"] = CACHES["default"]
+    CACHES["default"] = {
+        "BACKEND": "hines.core.cache_backends.TwoTierCache",
+        "LOCATION": "shared",
+        "TIMEOUT": 300,
+        "OPTIONS": {
+            "LOCAL_TIMEOUT": 5,
+            "MAX_ENTRIES": 300,
+            "CHECK_INTERVAL": 1,
+            # Counters, locks, and the versions of cache tags:
+            "SHARED_ONLY_PREFIXES": [
+                "hines_cache_metrics:",
+                "hines_cache_tag:",
+                "hines_cache_refresh:",
+                "hines_cache_lock:",
+            ],
+        },
+    }
+
+# Record cache hits and misses for views, shown in the admin:
+HINES_CACHE_METRICS = os.getenv("HINES_CACHE_METRICS", default="False") == "True"
+
 TEST_RUNNER = "hines.core.test_runner.HinesTestRunner"
 
 
@@ -381,6 +411,9 @@ if os.getenv("DJANGOQ_REDIS_URL", ""):
         "redis": os.getenv("DJANGOQ_REDIS_URL"),
     }
 
+    # Regenerate stale cached pages with django-q tasks. See CacheMixin.
+    HINES_CACHE_STALE_WHILE_REVALIDATE = True
+
 
 # django-imagekit ######################################################
 # https://django-imagekit.readthedocs.io/en/stable/caching.html#removing-safeguards
@@ -454,6 +487,24 @@ HINES_AUTHOR_EMAIL = "phil@gyford.com"
 # Used for RSS feeds and Structured Data.
 HINES_SITE_ICON = "hines/img/site_icon.jpg"
 
+# If set, feeds are saved as files in this directory whenever their contents
+# change, and those files are served instead of generating the feeds.
+# nginx could serve them directly with something like:
+#   try_files /feeds$uri/index.xml @django;
+HINES_FEED_FILES_ROOT = os.getenv("HINES_FEED_FILES_ROOT", default="")
+
+# If set, the stats charts' hard-coded data is read from TOML files in this
+# directory instead of hines/stats/data/. Edited files are used the next time
+# compute_stats runs.
+HINES_STATS_DATA_DIR = os.getenv("HINES_STATS_DATA_DIR", default="")
+
+# If more than 0, a stats page computes any of its charts that haven't been
+# computed yet at the same time, in up to this many threads, waiting up to
+# HINES_STATS_CHART_TIMEOUT seconds for them. Each thread uses its own
+# database connection.
+HINES_STATS_CHART_WORKERS = int(os.getenv("HINES_STATS_CHART_WORKERS", default="0"))
+HINES_STATS_CHART_TIMEOUT = float(os.getenv("HINES_STATS_CHART_TIMEOUT", default="5"))
+
 # Any Day Archive pages before this YYYY-MM-DD date will 404:
 HINES_FIRST_DATE = "1989-06-02"
 
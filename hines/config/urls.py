@@ -27,6 +27,9 @@ register_converter(converters.TwoDigitDayConverter, "dd")
 # Used in links
 register_converter(converters.WordCharacterConverter, "word")
 
+# Used in weblogs and links feeds
+register_converter(converters.FeedCursorConverter, "feedcursor")
+
 
 sitemaps = {
     "pages": PagesSitemap,
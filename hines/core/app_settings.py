@@ -68,6 +68,44 @@ HOME_PAGE_DISPLAY = getattr(settings, "HINES_HOME_PAGE_DISPLAY", {})
 
 EVERYTHING_FEED_KINDS = getattr(settings, "HINES_EVERYTHING_FEED_KINDS", ())
 
+# Seconds to cache each feed item's rendered content:encoded for.
+# None for never expiring, 0 to not cache it at all.
+FEED_CONTENT_CACHE_TIMEOUT = getattr(
+    settings, "HINES_FEED_CONTENT_CACHE_TIMEOUT", 60 * 60 * 24 * 7
+)
+
+# A directory to save feeds' XML to, so that they can be served without
+# being built for every request. Leave empty to not do this.
+FEED_FILES_ROOT = getattr(settings, "HINES_FEED_FILES_ROOT", "")
+
+# Seconds for which complete pages of archived feeds can be cached.
+FEED_ARCHIVE_CACHE_TIMEOUT = getattr(
+    settings, "HINES_FEED_ARCHIVE_CACHE_TIMEOUT", 60 * 60 * 24 * 365
+)
+
+# Whether views with a cache_stale_timeout serve stale cached pages while a
+# django-q task regenerates them. Requires django-q to be running.
+CACHE_STALE_WHILE_REVALIDATE = getattr(
+    settings, "HINES_CACHE_STALE_WHILE_REVALIDATE", False
+)
+
+# Whether to record cache hits and misses for views using CacheMixin.
+# See hines.core.cache_metrics.
+CACHE_METRICS = getattr(settings, "HINES_CACHE_METRICS", False)
+
+# A directory of TOML files for the stats' StaticGenerator to use instead
+# of those in hines/stats/data/. See hines.stats.static_data.
+STATS_DATA_DIR = getattr(settings, "HINES_STATS_DATA_DIR", "")
+
+# How many threads the stats pages can use to compute charts that haven't
+# been computed yet, at the same time. 0 leaves them all to be fetched
+# separately by the page's JavaScript.
+STATS_CHART_WORKERS = getattr(settings, "HINES_STATS_CHART_WORKERS", 0)
+
+# Seconds the stats pages wait for those charts. Any that take longer are
+# fetched separately by the page's JavaScript.
+STATS_CHART_TIMEOUT = getattr(settings, "HINES_STATS_CHART_TIMEOUT", 5)
+
 ROOT_DIR = getattr(settings, "HINES_ROOT_DIR", "")
 
 TEMPLATE_SETS = getattr(settings, "HINES_TEMPLATE_SETS", None)
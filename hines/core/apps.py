@@ -6,3 +6,6 @@ class CoreConfig(AppConfig):
     label = "hines_core"
     verbose_name = "Core"
     default_auto_field = "django.db.models.BigAutoField"
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,528 @@
+import math
+import random
+import re
+import threading
+import time
+import weakref
+from hashlib import md5
+
+from django.conf import settings
+from django.contrib.sites.models import Site
+from django.core.cache import cache
+from django.core.handlers.base import BaseHandler
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.cache import get_cache_key, has_vary_header
+from django.utils.encoding import iri_to_uri
+from django_q.tasks import async_task
+
+from .cache_metrics import get_cached_views
+from .utils import make_site_request
+
+# The cache key for a tag's current version. It's part of the cache keys of
+# everything that depends on the tag, so changing it expires them all.
+TAG_VERSION_CACHE_KEY = "hines_cache_tag:{}"
+
+# Seconds that a tag's version is kept. Nothing cached with the tag can be
+# found once it's gone, so this must be longer than anything is cached with
+# tags, like StatsView's cache_timeout plus cache_stale_timeout of two days.
+TAG_VERSION_TIMEOUT = 60 * 60 * 24 * 7
+
+# Tags that every page cached by CacheMixin has, for the URL name of its view,
+# for its own path, and for each of its path's prefixes.
+# See get_page_cache_tags().
+VIEW_TAG = "view:{}"
+PAGE_TAG = "page:{}"
+PATH_TAG = "path:{}"
+
+# The cache key that stops more than one task regenerating a stale page:
+REFRESH_LOCK_CACHE_KEY = "hines_cache_refresh:{}"
+
+# Seconds before another task can be queued to regenerate the same page:
+REFRESH_LOCK_TIMEOUT = 60
+
+# The cache key that lets only one request at a time generate a missing page:
+PAGE_LOCK_CACHE_KEY = "hines_cache_lock:{}"
+
+# Seconds after which a page's lock is released, if its request didn't:
+PAGE_LOCK_TIMEOUT = 30
+
+# Seconds that other requests wait for a locked page to be cached, and how
+# often they check, before generating it themselves:
+PAGE_LOCK_WAIT = 5
+PAGE_LOCK_INTERVAL = 0.1
+
+# The deferred expiries waiting for each database connection, in each thread,
+# to commit. See _expire().
+_pending = threading.local()
+
+# Marks where a {% per_request %} template goes in a cached page:
+PER_REQUEST_PLACEHOLDER = "<!-- hines:per_request {} -->"
+
+_PER_REQUEST_RE = re.compile(
+    re.escape(PER_REQUEST_PLACEHOLDER).replace(re.escape("{}"), r"(\S+)")
+)
+
+
+def get_tagged_cache_key(key, tags, versions=None):
+    """
+    Returns key with the current versions of each of tags, e.g.
+    ["blog:writing", "day:2024-05-01"], added to it, so that whatever's
+    cached at the returned key is expired by invalidate_cache_tags().
+
+    Returns None if any of tags has no version, when nothing can have been
+    cached with them. Whatever's generated can then be cached with the key
+    from create_tagged_cache_key().
+
+    Fetches all the versions in one get_many(), unless versions, from
+    get_cache_tag_versions(), is passed. The versions must be fetched before
+    whatever's cached is generated, so that if a tag is invalidated in
+    between, it's cached at a key that's already out of date.
+    """
+    if not tags:
+        return key
+    if versions is None:
+        versions = get_cache_tag_versions(tags)
+    if not versions.keys() >= set(tags):
+        return None
+    digest = md5(
+        " ".join(f"{tag}={versions[tag]}" for tag in sorted(set(tags))).encode(),
+        usedforsecurity=False,
+    ).hexdigest()
+    return f"{key}.{digest}"
+
+
+def get_cache_tag_versions(tags):
+    """
+    Returns a dict of each of tags that has a version and its version.
+
+    This only reads from the cache, so that requests for pages that aren't
+    cached, like 404s, don't leave anything in it.
+    """
+    version_keys = {TAG_VERSION_CACHE_KEY.format(tag): tag for tag in set(tags)}
+    versions = cache.get_many(list(version_keys))
+    return {version_keys[key]: version for key, version in versions.items()}
+
+
+def create_tagged_cache_key(key, tags, versions):
+    """
+    Like get_tagged_cache_key(), but first gives each of tags that isn't in
+    versions a new random version, so that if a version is evicted from the
+    cache it won't go back to a value that things were cached with before.
+
+    versions must have been fetched with get_cache_tag_versions() before
+    whatever's being cached was generated. Returns None if another process
+    has added or invalidated any of the missing versions since, when what
+    was generated might already be out of date, so shouldn't be cached.
+
+    Call this only when something is about to be cached with the key.
+    """
+    versions = dict(versions)
+    for tag in set(tags) - versions.keys():
+        version = random.getrandbits(48)
+        if not cache.add(
+            TAG_VERSION_CACHE_KEY.format(tag), version, TAG_VERSION_TIMEOUT
+        ):
+            return None
+        versions[tag] = version
+    return get_tagged_cache_key(key, tags, versions)
+
+
+def invalidate_cache_tags(tags, *, defer=False):
+    """
+    Expires all the cached pages, and anything else cached with
+    get_tagged_cache_key(), that depend on any of tags, by giving each tag a
+    new random version. Nothing is deleted; the expired pages are no longer
+    found, and are removed when their own timeouts end.
+
+    If defer is True, this waits until the current transaction commits, and
+    is batched with any other deferred expiry in that transaction. If the
+    transaction, or the savepoint it's in, is rolled back, it's discarded.
+    """
+    _expire(tags=tags, defer=defer)
+
+
+def clear_cached_pages(*, prefixes=(), views=(), tags=()):
+    """
+    Deletes only the cached pages whose paths start with any of prefixes,
+    like "/phil/writing/2019/", whose views have any of the URL names in
+    views, like "weblogs:post_detail", or that have any of tags.
+
+    Prefixes and views only match pages cached by views using CacheMixin,
+    apart from the page at each prefix itself, which is always expired.
+    Prefixes should end with a slash, unless they're a complete path.
+
+    Nothing is looked up or deleted for each matching page: each prefix,
+    view and tag has a single version number, which is changed, so that
+    every page cached with the old version is missed. See
+    get_page_cache_tags().
+
+    Raises ValueError if any of views isn't the URL name of a view using
+    CacheMixin. Returns a list of those of views and tags that no cached page
+    has, so clearing them did nothing.
+    """
+    for prefix in prefixes:
+        if not prefix.startswith("/"):
+            msg = f"'{prefix}' should be a path starting with a slash."
+            raise ValueError(msg)
+
+    cached_views = {url_name for url_name, view_class in get_cached_views()}
+    for view in views:
+        if view not in cached_views:
+            msg = f"'{view}' isn't the URL name of a view that uses CacheMixin."
+            raise ValueError(msg)
+
+    named_tags = {VIEW_TAG.format(view): view for view in views}
+    named_tags.update((tag, tag) for tag in tags)
+    # Before they're given new versions:
+    versions = get_cache_tag_versions(named_tags)
+
+    all_tags = [PATH_TAG.format(prefix) for prefix in prefixes]
+    all_tags.extend(named_tags)
+
+    _delete(get_page_header_cache_keys(prefixes), all_tags)
+
+    return [name for tag, name in named_tags.items() if tag not in versions]
+
+
+def get_page_cache_tags(request):
+    """
+    Returns the tags that every page cached by CacheMixin has, so that
+    invalidate_cache_tags() and clear_cached_pages() can expire them: one for the URL
+    name of its view, one for its path, and one for each prefix of its path,
+    e.g. for "/phil/writing/2019/":
+
+        ["view:weblogs:post_year_archive", "page:/phil/writing/2019/",
+         "path:/", "path:/phil/", "path:/phil/writing/",
+         "path:/phil/writing/2019/"]
+
+    These are only part of the key prefix the page is cached with (see
+    get_tagged_cache_key()), so a page being cached only writes a version
+    for those that don't have one yet, however many pages share a prefix.
+    And nothing is written for pages that aren't cached, like 404s.
+    """
+    tags = []
+
+    match = request.resolver_match
+    if match is not None:
+        tags.append(VIEW_TAG.format(match.view_name))
+
+    path = request.path
+    tags.append(PAGE_TAG.format(path))
+    start = 0
+    while (end := path.find("/", start)) != -1:
+        tags.append(PATH_TAG.format(path[: end + 1]))
+        start = end + 1
+    if not path.endswith("/"):
+        tags.append(PATH_TAG.format(path))
+
+    return tags
+
+
+def delete_cache_keys(keys, *, defer=False):
+    """
+    Deletes keys from the cache in one delete_many(). defer is as for
+    invalidate_cache_tags().
+    """
+    _expire(keys=keys, defer=defer)
+
+
+def get_page_header_cache_keys(urls, key_prefix=None):
+    """
+    Returns the keys of the Vary headers that the cache middleware, or
+    cache_page() with key_prefix, store for each of urls, over both http
+    and https.
+
+    Without that key the middleware can't find the cached page, so deleting
+    it expires the page, whatever headers it varied on.
+
+    This is the same as django.utils.cache._generate_cache_header_key(),
+    but doesn't need a request. It assumes USE_I18N is False, as it is.
+    """
+    key_prefixes = [key_prefix or settings.CACHE_MIDDLEWARE_KEY_PREFIX]
+
+    suffix = f".{timezone.get_current_timezone_name()}" if settings.USE_TZ else ""
+
+    domain = None
+    keys = []
+    for url in urls:
+        if url.startswith(("http://", "https://")):
+            absolute_urls = [url]
+        else:
+            if domain is None:
+                domain = Site.objects.get_current().domain
+            absolute_urls = [
+                f"{scheme}://{domain}{url}" for scheme in ("http", "https")
+            ]
+
+        for absolute_url in absolute_urls:
+            digest = _hash_url(absolute_url)
+            keys.extend(
+                f"views.decorators.cache.cache_header.{prefix}.{digest}{suffix}"
+                for prefix in key_prefixes
+            )
+    return keys
+
+
+def get_view_key_prefix():
+    """
+    The start of the key_prefix for cache_page() in views using CacheMixin,
+    to which the versions of their tags are added.
+
+    Their pages are cached under a different key to the site-wide cache
+    middleware, so that it can't serve them without the view first checking
+    their tags' versions, how old they are, or adding the per-request parts.
+    """
+    return f"{settings.CACHE_MIDDLEWARE_KEY_PREFIX}view"
+
+
+def acquire_page_lock(request, key_prefix=None):
+    """
+    Tries to lock the page for request, so that only one request generates
+    it when it's missing from the cache. Returns the lock's key if it was
+    acquired, or None if another request holds it.
+    """
+    lock_key = _get_page_lock_key(request, key_prefix)
+    if cache.add(lock_key, value=True, timeout=PAGE_LOCK_TIMEOUT):
+        return lock_key
+    return None
+
+
+def release_page_lock(lock_key):
+    "Releases a lock acquired with acquire_page_lock()."
+    if lock_key is not None:
+        cache.delete(lock_key)
+
+
+def wait_for_cached_response(request, key_prefix=None, *, page_key_prefix=None):
+    """
+    Waits up to PAGE_LOCK_WAIT seconds for the request holding the page's
+    lock, acquired with key_prefix, to cache it. Returns the cached response,
+    or None if it didn't appear in time.
+
+    If the page is cached with a different key_prefix to its lock, pass it as
+    page_key_prefix. That can be a function returning the key_prefix, or
+    None if the page can't be cached yet, which is called on every check.
+
+    Also returns None as soon as the lock is released without the page
+    being cached, e.g. because it raised Http404, or its response can't be
+    cached, so that waiting requests generate it themselves straight away.
+    """
+    lock_key = _get_page_lock_key(request, key_prefix)
+    deadline = time.monotonic() + PAGE_LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(PAGE_LOCK_INTERVAL)
+        # Check this before the page, in case it's cached in between:
+        released = cache.get(lock_key) is None
+        page_key = _get_page_cache_key(request, key_prefix, page_key_prefix)
+        if page_key is not None:
+            response = cache.get(page_key)
+            if response is not None:
+                return response
+        if released:
+            return None
+    return None
+
+
+def mark_fresh_until(response, timeout, started):
+    """
+    Records on response, before it's cached, when it will become stale, and
+    how many seconds since started (a time.monotonic()) it took to generate.
+    """
+    response.hines_fresh_until = time.time() + timeout
+
+    def set_generation_time():
+        response.hines_generation_time = time.monotonic() - started
+
+    if getattr(response, "is_rendered", True):
+        set_generation_time()
+    else:
+        # Before cache_page()'s own callback, which caches it:
+        response.add_post_render_callback(lambda r: set_generation_time())
+
+
+def revalidate_if_stale(request, response, early_expiry_beta=None):
+    """
+    If response was served from the cache and has become stale, queue a
+    task to regenerate the page for request.
+
+    If early_expiry_beta is set, the page might be regenerated before it's
+    stale, more likely the closer it is to being stale and the longer it
+    took to generate. 1 is a good default; higher values regenerate earlier.
+    This is the "XFetch" algorithm from "Optimal Probabilistic Cache
+    Stampede Prevention" by Vattani, Chierichetti and Lowenstein.
+
+    Only one task is queued for each URL within REFRESH_LOCK_TIMEOUT.
+    """
+    fresh_until = getattr(response, "hines_fresh_until", None)
+    if fresh_until is not None:
+        now = time.time()
+        generation_time = getattr(response, "hines_generation_time", 0)
+        if early_expiry_beta and generation_time:
+            # log() of a number in (0, 1] is <= 0, so this moves now later:
+            now -= generation_time * early_expiry_beta * math.log(1 - random.random())
+        if fresh_until > now:
+            return
+
+    url = request.get_full_path()
+    lock_key = REFRESH_LOCK_CACHE_KEY.format(_hash_url(request.build_absolute_uri()))
+    if cache.add(lock_key, value=True, timeout=REFRESH_LOCK_TIMEOUT):
+        async_task("hines.core.tasks.refresh_cached_page", url=url)
+
+
+def refresh_cached_page(url):
+    """
+    Regenerates and caches the page at url, a path like "/terry/stats/",
+    whether or not it's already cached. Returns the response.
+    """
+    return request_page(url, refresh=True)
+
+
+def request_page(url, *, refresh=False):
+    """
+    Passes a request for url, a path like "/terry/stats/", through all the
+    middleware, as if from a visitor without cookies, so that it's cached
+    if it wasn't already. Returns the response.
+
+    If refresh is True, views using CacheMixin's stale-while-revalidate mode
+    regenerate the page whatever's in the cache.
+    """
+    request = make_site_request(url)
+    if refresh:
+        request.hines_cache_refresh = True
+
+    handler = BaseHandler()
+    handler.load_middleware()
+    return handler.get_response(request)
+
+
+def is_cacheable_response(response):
+    """
+    Whether UpdateCacheMiddleware, with a page_timeout, would cache response.
+    """
+    cache_control = response.get("Cache-Control", "").lower()
+    return not (
+        response.streaming
+        or response.status_code != 200
+        or (response.cookies and has_vary_header(response, "Cookie"))
+        or any(d in cache_control for d in ("private", "no-cache", "no-store"))
+        or has_vary_header(response, "*")
+    )
+
+
+def on_response_cached(response, func):
+    """
+    Calls func() once cache_page() has cached response. TemplateResponses
+    aren't cached until they're rendered.
+    """
+    if getattr(response, "is_rendered", True):
+        func()
+    else:
+        response.add_post_render_callback(lambda r: func())
+
+
+def render_per_request(response, request, context):
+    """
+    Replaces the {% per_request %} placeholders in response's content with
+    their templates, rendered with context for this request.
+    """
+    content = response.content.decode(response.charset)
+
+    for template_name in set(_PER_REQUEST_RE.findall(content)):
+        content = content.replace(
+            PER_REQUEST_PLACEHOLDER.format(template_name),
+            render_to_string(template_name, context, request=request),
+        )
+
+    response.content = content
+    if response.has_header("Content-Length"):
+        response.headers["Content-Length"] = str(len(response.content))
+
+
+def get_day_tag(dt):
+    "Returns the tag for the local day of the datetime dt, like 'day:2024-05-01'"
+    return f"day:{timezone.localtime(dt).date().isoformat()}"
+
+
+def _expire(keys=(), tags=(), *, defer=False):
+    connection = transaction.get_connection()
+    if not defer or not connection.in_atomic_block:
+        _delete(keys, tags)
+        return
+
+    transaction.on_commit(_PendingExpiry(keys, tags, _get_pending(connection)))
+
+
+def _get_pending(connection):
+    "Returns the set of _PendingExpirys for connection, in this thread."
+    if not hasattr(_pending, "expiries"):
+        _pending.expiries = {}
+    return _pending.expiries.setdefault(connection.alias, weakref.WeakSet())
+
+
+class _PendingExpiry:
+    """
+    Deletes keys and tags when the transaction commits, in one go with all
+    the other expiries pending for the same connection.
+
+    Each is only kept alive by its transaction.on_commit() callback, so one
+    discarded by a rollback also disappears from its pending set.
+    """
+
+    def __init__(self, keys, tags, pending):
+        self.keys = set(keys)
+        self.tags = set(tags)
+        self.pending = pending
+        pending.add(self)
+
+    def __call__(self):
+        if self not in self.pending:
+            # Already deleted with an earlier one.
+            return
+        expiries = list(self.pending)
+        self.pending.clear()
+        _delete(
+            set().union(*(e.keys for e in expiries)),
+            set().union(*(e.tags for e in expiries)),
+        )
+
+
+def _delete(keys, tags):
+    """
+    Deletes keys, and gives each tag a new random version, in two round trips.
+
+    Tags without a version are given one too, so that if a page using them
+    is being generated, create_tagged_cache_key() knows not to cache it.
+    """
+    if keys:
+        cache.delete_many(list(set(keys)))
+
+    if tags:
+        cache.set_many(
+            {
+                TAG_VERSION_CACHE_KEY.format(tag): random.getrandbits(48)
+                for tag in set(tags)
+            },
+            TAG_VERSION_TIMEOUT,
+        )
+
+
+def _get_page_cache_key(request, key_prefix, page_key_prefix):
+    if page_key_prefix is None:
+        page_key_prefix = key_prefix
+    elif callable(page_key_prefix):
+        page_key_prefix = page_key_prefix()
+        if page_key_prefix is None:
+            return None
+    return get_cache_key(request, key_prefix=page_key_prefix, method="GET", cache=cache)
+
+
+def _get_page_lock_key(request, key_prefix=None):
+    return PAGE_LOCK_CACHE_KEY.format(
+        _hash_url(request.build_absolute_uri()) + (key_prefix or "")
+    )
+
+
+def _hash_url(url):
+    return md5(iri_to_uri(url).encode("ascii"), usedforsecurity=False).hexdigest()
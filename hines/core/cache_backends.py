@@ -0,0 +1,250 @@
+import pickle
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+# The key, in the shared cache, of a token that changes whenever anything is
+# deleted from it, so that every process's local tier knows to empty itself:
+GENERATION_CACHE_KEY = "hines_two_tier_generation"
+
+# Each process's local tiers, by the names of their shared caches. Like
+# LocMemCache, these are shared between threads:
+_local_tiers = {}
+_local_tiers_lock = threading.Lock()
+
+_MISSING = object()
+
+
+class LocalTier:
+    """
+    A bounded, least-recently-used, in-memory store of pickled values, each
+    with an expiry time.
+    """
+
+    def __init__(self):
+        self.values = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {"local": Counter(), "shared": Counter()}
+        # The shared GENERATION_CACHE_KEY when we last checked it, and when:
+        self.generation = None
+        self.checked_at = None
+
+    def get(self, key):
+        with self.lock:
+            try:
+                expires, pickled = self.values[key]
+            except KeyError:
+                return _MISSING
+            if expires <= time.monotonic():
+                del self.values[key]
+                return _MISSING
+            self.values.move_to_end(key)
+        return pickle.loads(pickled)
+
+    def set(self, key, value, timeout, max_entries):
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self.lock:
+            self.values[key] = (time.monotonic() + timeout, pickled)
+            self.values.move_to_end(key)
+            while len(self.values) > max_entries:
+                self.values.popitem(last=False)
+
+    def delete(self, keys):
+        with self.lock:
+            for key in keys:
+                self.values.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.values.clear()
+
+
+class TwoTierCache(BaseCache):
+    """
+    A cache backend that keeps a small, short-lived copy of recently-used
+    values in each process, in front of another, shared, cache backend.
+
+    LOCATION is the alias of the shared cache in CACHES. OPTIONS can have:
+
+        LOCAL_TIMEOUT - Maximum seconds a value is kept locally. Default 5.
+        MAX_ENTRIES - Maximum number of values kept locally. Default 300.
+        CHECK_INTERVAL - Seconds between checking whether anything has
+            been deleted from the shared cache. Default 1.
+        SHARED_ONLY_PREFIXES - Keys starting with any of these are never
+            kept locally, e.g. locks, and values that are read, changed and
+            set again. Deleting them doesn't empty the local tiers.
+
+    Deleting or clearing through this backend, in any process, empties every
+    process's local tier within CHECK_INTERVAL seconds. A value set in one
+    process might still be read from another's local tier for LOCAL_TIMEOUT
+    seconds.
+
+    get_stats() returns the hits and misses in each tier, in this process.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get("OPTIONS", {})
+        self.shared_alias = location
+        self.local_timeout = float(options.get("LOCAL_TIMEOUT", 5))
+        self.check_interval = float(options.get("CHECK_INTERVAL", 1))
+        self.shared_only_prefixes = tuple(options.get("SHARED_ONLY_PREFIXES", ()))
+
+        with _local_tiers_lock:
+            self._local = _local_tiers.setdefault(location, LocalTier())
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias]
+
+    def get_stats(self):
+        "Returns a dict of the hits and misses in each tier, in this process."
+        return {
+            tier: {"hits": counts["hits"], "misses": counts["misses"]}
+            for tier, counts in self._local.stats.items()
+        }
+
+    def get(self, key, default=None, version=None):
+        if key.startswith(self.shared_only_prefixes):
+            return self.shared.get(key, default, version=version)
+
+        self._check_generation()
+
+        value = self._local.get(self.make_and_validate_key(key, version))
+        if value is not _MISSING:
+            self._local.stats["local"]["hits"] += 1
+            return value
+        self._local.stats["local"]["misses"] += 1
+
+        value = self.shared.get(key, _MISSING, version=version)
+        if value is _MISSING:
+            self._local.stats["shared"]["misses"] += 1
+            return default
+        self._local.stats["shared"]["hits"] += 1
+
+        self._set_local(key, value, DEFAULT_TIMEOUT, version)
+        return value
+
+    def get_many(self, keys, version=None):
+        self._check_generation()
+
+        found = {}
+        missing = []
+        for key in keys:
+            if key.startswith(self.shared_only_prefixes):
+                value = _MISSING
+            else:
+                value = self._local.get(self.make_and_validate_key(key, version))
+            if value is _MISSING:
+                missing.append(key)
+            else:
+                found[key] = value
+        self._local.stats["local"]["hits"] += len(found)
+        self._local.stats["local"]["misses"] += len(missing)
+
+        if missing:
+            shared_found = self.shared.get_many(missing, version=version)
+            self._local.stats["shared"]["hits"] += len(shared_found)
+            self._local.stats["shared"]["misses"] += len(missing) - len(shared_found)
+            for key, value in shared_found.items():
+                self._set_local(key, value, DEFAULT_TIMEOUT, version)
+            found.update(shared_found)
+
+        return found
+
+    def has_key(self, key, version=None):
+        if key.startswith(self.shared_only_prefixes):
+            return self.shared.has_key(key, version=version)
+        self._check_generation()
+        if self._local.get(self.make_and_validate_key(key, version)) is not _MISSING:
+            return True
+        return self.shared.has_key(key, version=version)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version=version)
+        self._set_local(key, value, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed_keys = self.shared.set_many(data, timeout, version=version)
+        for key, value in data.items():
+            if key not in failed_keys:
+                self._set_local(key, value, timeout, version)
+        return failed_keys
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        # Only the shared cache knows whether another process has added it:
+        added = self.shared.add(key, value, timeout, version=version)
+        if added:
+            self._set_local(key, value, timeout, version)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(key, timeout, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        self._local.delete([self.make_and_validate_key(key, version)])
+        return self.shared.incr(key, delta, version=version)
+
+    def delete(self, key, version=None):
+        deleted = self.shared.delete(key, version=version)
+        if not key.startswith(self.shared_only_prefixes):
+            self._local.delete([self.make_and_validate_key(key, version)])
+            self._bump_generation()
+        return deleted
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        self.shared.delete_many(keys, version=version)
+        local_keys = [
+            self.make_and_validate_key(k, version)
+            for k in keys
+            if not k.startswith(self.shared_only_prefixes)
+        ]
+        if local_keys:
+            self._local.delete(local_keys)
+            self._bump_generation()
+
+    def clear(self):
+        self.shared.clear()
+        self._local.clear()
+        self._bump_generation()
+
+    def _set_local(self, key, value, timeout, version):
+        if key.startswith(self.shared_only_prefixes):
+            return
+        local_key = self.make_and_validate_key(key, version)
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is not None and timeout <= 0:
+            self._local.delete([local_key])
+            return
+        if timeout is None or timeout > self.local_timeout:
+            timeout = self.local_timeout
+        self._local.set(local_key, value, timeout, self._max_entries)
+
+    def _check_generation(self):
+        """
+        Empties the local tier if anything's been deleted from the shared
+        cache since we last checked, which is at most every check_interval.
+        """
+        now = time.monotonic()
+        local = self._local
+        if (
+            local.checked_at is not None
+            and now - local.checked_at < self.check_interval
+        ):
+            return
+        local.checked_at = now
+
+        generation = self.shared.get(GENERATION_CACHE_KEY)
+        if generation != local.generation:
+            local.generation = generation
+            local.clear()
+
+    def _bump_generation(self):
+        "Tells every process to empty its local tier."
+        self.shared.set(GENERATION_CACHE_KEY, uuid.uuid4().hex, None)
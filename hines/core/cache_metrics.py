@@ -0,0 +1,146 @@
+from django.core.cache import cache
+from django.urls import URLPattern, URLResolver, get_resolver
+
+# The cache key for one counter, like "hits", for a view and URL name:
+METRICS_CACHE_KEY = "hines_cache_metrics:{}:{}:{}"
+
+# "render_ms" and "bytes" are totals over all the misses.
+COUNTERS = ("hits", "misses", "render_ms", "bytes")
+
+
+def record_cache_hit(view_name, url_name):
+    "Records that a page for view_name and url_name was served from the cache."
+    _incr(METRICS_CACHE_KEY.format(view_name, url_name, "hits"))
+
+
+def record_cache_miss(view_name, url_name, render_time, size):
+    """
+    Records that a page for view_name and url_name wasn't in the cache, so
+    took render_time seconds to generate, and was size bytes.
+    """
+    _incr(METRICS_CACHE_KEY.format(view_name, url_name, "misses"))
+    _incr(
+        METRICS_CACHE_KEY.format(view_name, url_name, "render_ms"),
+        round(render_time * 1000),
+    )
+    _incr(METRICS_CACHE_KEY.format(view_name, url_name, "bytes"), size)
+
+
+def get_cache_metrics():
+    """
+    Returns a list of dicts, one for each URL name whose view uses
+    CacheMixin, with its totals and averages, e.g.:
+
+        {
+            "view": "PostDetailView",
+            "url_name": "weblogs:post_detail",
+            "cache_timeout": 86400,
+            "hits": 120,
+            "misses": 4,
+            "hit_ratio": 0.97,
+            "average_render_ms": 85,
+            "average_bytes": 24010,
+        }
+    """
+    views = get_cached_views()
+
+    keys = [
+        METRICS_CACHE_KEY.format(view_class.__name__, url_name, counter)
+        for url_name, view_class in views
+        for counter in COUNTERS
+    ]
+    values = cache.get_many(keys)
+
+    metrics = []
+    for url_name, view_class in views:
+        view_name = view_class.__name__
+        counts = {
+            counter: values.get(
+                METRICS_CACHE_KEY.format(view_name, url_name, counter), 0
+            )
+            for counter in COUNTERS
+        }
+        requests = counts["hits"] + counts["misses"]
+        misses = counts["misses"]
+        metrics.append(
+            {
+                "view": view_name,
+                "url_name": url_name,
+                "cache_timeout": view_class.cache_timeout,
+                "hits": counts["hits"],
+                "misses": misses,
+                "hit_ratio": round(counts["hits"] / requests, 2) if requests else None,
+                "average_render_ms": round(counts["render_ms"] / misses)
+                if misses
+                else None,
+                "average_bytes": round(counts["bytes"] / misses) if misses else None,
+            }
+        )
+    return metrics
+
+
+def get_cache_tier_stats():
+    """
+    If the default cache is a TwoTierCache, returns a list of dicts of the
+    hits and misses in each of its tiers, in this process only, e.g.:
+
+        [
+            {"tier": "local", "hits": 300, "misses": 100, "hit_ratio": 0.75},
+            {"tier": "shared", "hits": 90, "misses": 10, "hit_ratio": 0.9},
+        ]
+
+    Otherwise returns None.
+    """
+    get_stats = getattr(cache, "get_stats", None)
+    if get_stats is None:
+        return None
+
+    tiers = []
+    for tier, counts in get_stats().items():
+        requests = counts["hits"] + counts["misses"]
+        tiers.append(
+            {
+                "tier": tier,
+                "hits": counts["hits"],
+                "misses": counts["misses"],
+                "hit_ratio": round(counts["hits"] / requests, 2) if requests else None,
+            }
+        )
+    return tiers
+
+
+def get_cached_views():
+    """
+    Returns a list of (url_name, view_class) tuples for all the named URLs
+    whose class-based views use CacheMixin, like
+    ("weblogs:post_detail", PostDetailView).
+    """
+    from .views import CacheMixin
+
+    views = []
+    for url_name, callback in _walk_patterns(get_resolver().url_patterns):
+        view_class = getattr(callback, "view_class", None)
+        if view_class is not None and issubclass(view_class, CacheMixin):
+            views.append((url_name, view_class))
+    return views
+
+
+def _walk_patterns(patterns, namespace=""):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            ns = namespace
+            if pattern.namespace:
+                ns = f"{namespace}{pattern.namespace}:"
+            yield from _walk_patterns(pattern.url_patterns, ns)
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            yield f"{namespace}{pattern.name}", pattern.callback
+
+
+def _incr(key, delta=1):
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        # It doesn't exist yet. If another request has just added it, add to
+        # that instead. These never expire.
+        if not cache.add(key, delta, None):
+            cache.incr(key, delta)
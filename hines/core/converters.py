@@ -1,5 +1,7 @@
 # Used for URL confs.
 
+from datetime import UTC, datetime, timedelta
+
 
 class FourDigitYearConverter:
     "Matches 4 digits."
@@ -47,3 +49,42 @@ class WordCharacterConverter:
 
     def to_url(self, value):
         return value
+
+
+class FeedCursorConverter:
+    """
+    Matches a feed archive cursor like "1493136000000000-123": a time in
+    microseconds since the epoch, and a pk.
+    Converts to and from a (datetime, pk) tuple.
+
+    Raises ValueError, so that the URL doesn't match, if the time or pk are
+    too big for a datetime or a database's bigint.
+    """
+
+    regex = r"[0-9]+-[0-9]+"
+
+    max_pk = 2**63 - 1
+
+    def to_python(self, value):
+        microseconds, pk = value.split("-")
+        pk = int(pk)
+        if pk > self.max_pk:
+            msg = f"Feed cursor pk {pk} is out of range."
+            raise ValueError(msg)
+
+        try:
+            time = datetime(1970, 1, 1, tzinfo=UTC) + timedelta(
+                microseconds=int(microseconds)
+            )
+        except OverflowError as err:
+            msg = f"Feed cursor time {microseconds} is out of range."
+            raise ValueError(msg) from err
+
+        return (time, pk)
+
+    def to_url(self, value):
+        time, pk = value
+        microseconds = (time - datetime(1970, 1, 1, tzinfo=UTC)) // timedelta(
+            microseconds=1
+        )
+        return f"{microseconds}-{pk}"
@@ -1,16 +1,31 @@
 import contextlib
+import copy
+import hashlib
 import re
 from xml.sax.saxutils import XMLGenerator
 
 from django.contrib.syndication.views import Feed
+from django.core.cache import cache
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models import Count, Max, Model, Q, QuerySet
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseRedirect
 from django.template import TemplateDoesNotExist, loader
 from django.templatetags.static import static
+from django.urls import reverse
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    quote_etag,
+)
 from django.utils.feedgenerator import Rss201rev2Feed
+from django.utils.http import http_date
 from django.utils.xmlutils import SimplerXMLGenerator, UnserializableContentError
 
 from hines.core import app_settings
 from hines.core.utils import get_site_url
 
+from .files import get_feed_file_path
+
 
 class HinesSimplerXMLGenerator(SimplerXMLGenerator):
     """
@@ -81,11 +96,20 @@ class ExtendedRSSFeed(Rss201rev2Feed):
     def rss_attributes(self):
         attrs = super().rss_attributes()
         attrs["xmlns:content"] = "http://purl.org/rss/1.0/modules/content/"
+        if self.feed.get("is_archive"):
+            attrs["xmlns:fh"] = "http://purl.org/syndication/history/1.0"
         return attrs
 
     def add_root_elements(self, handler):
         super().add_root_elements(handler)
 
+        # Add RFC 5005 archive elements, if any.
+        if self.feed.get("is_archive"):
+            handler.addQuickElement("fh:archive")
+
+        for rel, href in self.feed.get("archive_links", {}).items():
+            handler.addQuickElement("atom:link", None, {"rel": rel, "href": href})
+
         # Add <image></image> element
         # https://validator.w3.org/feed/docs/rss2.html#ltimagegtSubelementOfLtchannelgt
         image_url = self.channel_image_url()
@@ -120,19 +144,474 @@ class ExtendedRSSFeed(Rss201rev2Feed):
         return get_site_url()
 
 
+class ArchivePage:
+    """
+    Used as the object for a page of an ExtendedFeed's archive, instead of
+    the object that get_object() returns, which is in obj.
+    cursor is a (datetime, pk) tuple; the page's oldest item.
+    """
+
+    def __init__(self, obj, cursor):
+        self.obj = obj
+        self.cursor = cursor
+        # The cursor of the next, newer, page, once it's been looked up.
+        # False if there isn't one.
+        self.next_cursor = None
+
+
+class PreparedItems:
+    """
+    Used as the items() of the copy of an ExtendedFeed that builds the feed,
+    returning items that have already been fetched and prepared.
+    """
+
+    def __init__(self, items):
+        self.items = items
+
+    def __call__(self, obj):
+        return self.items
+
+
 class ExtendedFeed(Feed):
     """
     Required to add content:encoded elements to a feed.
     See the comments in ExtendedRSSFeed.
+
+    Also lets a feed declare the relations used for every item, so that they're
+    fetched in a fixed number of queries, rather than one or more per item:
+
+        class MyRSSFeed(ExtendedFeed):
+
+            items_select_related = ["author", "blog"]
+            items_prefetch_related = ["tags"]
+
+    Each item's rendered content:encoded is cached, keyed by the item's
+    item_content_cache_key_parts(), which includes its time_modified. So a
+    feed only renders the items that have changed since it was last built.
+
+    Before fetching any items we get the feed's version - the latest
+    validator_field of all its items, and their count - and use it for the
+    ETag and Last-Modified headers. If the client already has this version
+    we return a 304 without building the feed.
+
+    A feed can also have RFC 5005 archive pages, going back through all its
+    items. To do this, set feed_url_name and archive_url_name, and add
+    the archive URL, which takes a feedcursor, like:
+
+        path("feed/archive/<feedcursor:cursor>/", MyRSSFeed(), name="...")
+
+    Each archive page starts at its cursor, the (archive_ordering_field, pk)
+    of its oldest item, and has that and the next archive_page_size - 1
+    newer items, rather than using an OFFSET. The pages are counted from the
+    oldest item, so new items don't move their boundaries, and once a page
+    has all its items neither it nor its URL will change. A URL whose cursor
+    isn't the start of a page redirects to the page that includes it.
+
+    If HINES_FEED_FILES_ROOT is set, and generate_feed_files() has saved this
+    feed to a file, that file is returned instead of building the feed.
     """
 
     # Specify the path to a template to use that for the content:encoded data.
     content_template = None
 
+    # Passed to select_related() and prefetch_related() if items() returns a
+    # QuerySet:
+    items_select_related = []
+    items_prefetch_related = []
+
     stylesheets = [
         static("hines/xsl/pretty-feed-v3a.xsl"),
     ]
 
+    # The field whose latest value is used as the feed's Last-Modified time:
+    validator_field = "time_modified"
+
+    # Set both of these to the names of URLs to make archive pages.
+    # They take the kwargs from get_feed_url_kwargs(), and archive_url_name
+    # also takes a cursor.
+    feed_url_name = None
+    archive_url_name = None
+
+    # How the items are ordered, most recent first, along with pk:
+    archive_ordering_field = "time_published"
+
+    archive_page_size = 50
+
+    # Set on the copy of the feed that get_feed() uses, for an ArchivePage,
+    # and if the feed has archives:
+    archive_page = None
+    archive_links = None
+
+    _loaded_content_attr = "_feed_content"
+
+    def __call__(self, request, *args, **kwargs):
+        """
+        If this feed has been saved to a file by generate_feed_files() we
+        return that, without building the feed. Otherwise, get_response().
+        """
+        if "cursor" not in kwargs:
+            path = get_feed_file_path(request.path_info)
+            if path is not None and path.is_file():
+                return self.get_file_response(request, path)
+
+        return self.get_response(request, *args, **kwargs)
+
+    def get_file_response(self, request, path):
+        """
+        Returns a response with the contents of the pre-generated file at path,
+        or a 304 Not Modified if the client has the current version.
+        """
+        last_modified = int(path.stat().st_mtime)
+
+        response = get_conditional_response(request, last_modified=last_modified)
+        if response is None:
+            response = FileResponse(
+                path.open("rb"), content_type=self.feed_type.content_type
+            )
+            response.headers["Last-Modified"] = http_date(last_modified)
+        return response
+
+    def get_response(self, request, *args, **kwargs):
+        """
+        The same as the parent's __call__(), except we return a 304 Not
+        Modified if the feed's ETag or Last-Modified show the client has the
+        latest version.
+
+        And if there's a cursor, we return that page of the feed's archive.
+        """
+        cursor = kwargs.pop("cursor", None)
+
+        try:
+            obj = self.get_object(request, *args, **kwargs)
+        except ObjectDoesNotExist as err:
+            msg = "Feed object does not exist."
+            raise Http404(msg) from err
+
+        if cursor is not None:
+            page_cursor = self.get_archive_page_cursor(obj, cursor)
+            if page_cursor is None:
+                msg = "There's no archive page at that cursor."
+                raise Http404(msg)
+            if page_cursor != cursor:
+                # Only the pages' own URLs, whose contents can't change:
+                return HttpResponseRedirect(
+                    self._get_url(self.archive_url_name, obj, page_cursor)
+                )
+            obj = ArchivePage(obj, cursor)
+
+        etag = None
+        last_modified = None
+
+        version = self.get_items_version(obj)
+        if version is not None:
+            latest, count = version
+            etag = self._make_etag(latest, count)
+            if latest is not None:
+                last_modified = int(latest.timestamp())
+
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified
+            )
+            if response is not None:
+                return response
+
+        feedgen = self.get_feed(obj, request)
+        response = HttpResponse(content_type=feedgen.content_type)
+
+        if etag is not None:
+            response.headers["ETag"] = etag
+        if last_modified is not None:
+            response.headers["Last-Modified"] = http_date(last_modified)
+        elif version is None:
+            response.headers["Last-Modified"] = http_date(
+                feedgen.latest_post_date().timestamp()
+            )
+
+        if (
+            isinstance(obj, ArchivePage)
+            and len(feedgen.items) == self.archive_page_size
+        ):
+            # This page is complete, and newer items won't change it:
+            patch_cache_control(
+                response, public=True, max_age=app_settings.FEED_ARCHIVE_CACHE_TIMEOUT
+            )
+
+        feedgen.write(response, "utf-8")
+        return response
+
+    def get_items_version(self, obj):
+        """
+        Returns a tuple of the latest validator_field of all the feed's
+        possible items (not only the most recent ones), and how many there
+        are. The latest time is None if there are no items. An override can
+        return anything in place of the count that changes whenever the feed
+        does, and None for the latest time if it can't tell.
+
+        Or returns None if we can't tell, and then the feed will always be
+        built.
+
+        By default this works if items() returns a QuerySet. Override it if
+        not, or if the feed also shows things that can change without any of
+        the items changing, and include the time those last changed.
+
+        Not used for archive pages.
+        """
+        if isinstance(obj, ArchivePage):
+            return None
+
+        qs = self.get_all_items(obj)
+        if qs is None:
+            return None
+
+        result = qs.order_by().aggregate(
+            latest=Max(self.validator_field), count=Count("pk")
+        )
+        return result["latest"], result["count"]
+
+    def get_all_items(self, obj):
+        """
+        If items() returns a QuerySet, returns it without any slice, i.e.
+        all the feed's possible items, not only the most recent ones.
+        Otherwise returns None.
+        """
+        items = self.items(obj)
+        if not isinstance(items, QuerySet):
+            return None
+
+        qs = items.all()
+        qs.query.clear_limits()
+        return qs
+
+    def get_archive_items(self, page):
+        "Returns the QuerySet of items for an ArchivePage."
+        qs = self._get_archive_queryset(page.obj).filter(
+            self._not_before_cursor_q(page.cursor)
+        )
+        next_cursor = self._get_next_archive_cursor(page)
+        if next_cursor:
+            qs = qs.filter(self._before_cursor_q(next_cursor))
+        return qs
+
+    def get_archive_links(self, obj):
+        """
+        Returns a dict of RFC 5005 links, mapping each rel to a URL.
+
+        The feed itself links to the archive page with the newest item that's
+        older than all of the feed's items. Archive pages link to the feed,
+        and the pages before and after them, if any.
+        """
+        links = {}
+
+        if isinstance(obj, ArchivePage):
+            links["current"] = self._get_url(self.feed_url_name, obj.obj)
+
+            next_cursor = self._get_next_archive_cursor(obj)
+            if next_cursor:
+                links["next-archive"] = self._get_url(
+                    self.archive_url_name, obj.obj, next_cursor
+                )
+
+            # The previous page starts archive_page_size items before ours:
+            older = list(
+                self._get_archive_queryset(obj.obj)
+                .values_list(self.archive_ordering_field, "pk")
+                .filter(self._before_cursor_q(obj.cursor))[: self.archive_page_size]
+            )
+            if older:
+                links["prev-archive"] = self._get_url(
+                    self.archive_url_name, obj.obj, older[-1]
+                )
+
+        else:
+            num_items = getattr(self, "num_items", self.archive_page_size)
+            # The newest item that's older than all of the feed's items:
+            newest_archived = list(
+                self._get_archive_queryset(obj).values_list(
+                    self.archive_ordering_field, "pk"
+                )[num_items : num_items + 1]
+            )
+            if newest_archived:
+                # The page that it's on:
+                cursor = self.get_archive_page_cursor(obj, newest_archived[0])
+                links["prev-archive"] = self._get_url(
+                    self.archive_url_name, obj, cursor
+                )
+
+        return links
+
+    def get_archive_page_cursor(self, obj, cursor):
+        """
+        Returns the cursor of the archive page that includes cursor's
+        position: that of the oldest item on the page with the newest item
+        that isn't newer than cursor. Or None if there's no such item.
+
+        The pages are counted from the oldest item, so this counts the items
+        up to cursor, and then steps back fewer than archive_page_size items
+        from cursor, rather than using an OFFSET from the oldest.
+        """
+        qs = self._get_archive_queryset(obj).filter(self._not_after_cursor_q(cursor))
+        num_items = qs.count()
+        if num_items == 0:
+            return None
+
+        # The newest of those is (num_items - 1) items after the oldest:
+        steps_back = (num_items - 1) % self.archive_page_size
+        return qs.values_list(self.archive_ordering_field, "pk")[steps_back]
+
+    def feed_extra_kwargs(self, obj):
+        """
+        Adds RFC 5005 links to the feed, if it has an archive.
+        """
+        kwargs = super().feed_extra_kwargs(obj)
+
+        if self.archive_page is not None:
+            kwargs["is_archive"] = True
+
+        if self.archive_links is not None:
+            kwargs["archive_links"] = self.archive_links
+
+        return kwargs
+
+    def get_feed_url_kwargs(self, obj):
+        """
+        The kwargs for reversing feed_url_name and archive_url_name.
+        """
+        return {}
+
+    def _get_archive_queryset(self, obj):
+        return self.get_all_items(obj).order_by(
+            f"-{self.archive_ordering_field}", "-pk"
+        )
+
+    def _get_next_archive_cursor(self, page):
+        """
+        Returns the cursor of the page after the ArchivePage page: the item
+        archive_page_size items newer than page's cursor. Or False if there's
+        no such item.
+        """
+        if page.next_cursor is None:
+            newer = list(
+                self._get_archive_queryset(page.obj)
+                .values_list(self.archive_ordering_field, "pk")
+                .filter(self._not_before_cursor_q(page.cursor))
+                .reverse()[self.archive_page_size : self.archive_page_size + 1]
+            )
+            page.next_cursor = newer[0] if newer else False
+        return page.next_cursor
+
+    def _before_cursor_q(self, cursor):
+        "A Q for items older than cursor, a (archive_ordering_field, pk) tuple."
+        time, pk = cursor
+        field = self.archive_ordering_field
+        return Q(**{f"{field}__lt": time}) | Q(**{field: time, "pk__lt": pk})
+
+    def _not_after_cursor_q(self, cursor):
+        "A Q for items that are the cursor's item, or older."
+        time, pk = cursor
+        field = self.archive_ordering_field
+        return Q(**{f"{field}__lt": time}) | Q(**{field: time, "pk__lte": pk})
+
+    def _not_before_cursor_q(self, cursor):
+        "A Q for items that are the cursor's item, or newer."
+        time, pk = cursor
+        field = self.archive_ordering_field
+        return Q(**{f"{field}__gt": time}) | Q(**{field: time, "pk__gte": pk})
+
+    def _get_url(self, url_name, obj, cursor=None):
+        kwargs = self.get_feed_url_kwargs(obj)
+        if cursor is not None:
+            kwargs["cursor"] = cursor
+        return get_site_url() + reverse(url_name, kwargs=kwargs)
+
+    def _make_etag(self, latest, count):
+        feed_class = f"{self.__class__.__module__}.{self.__class__.__qualname__}"
+        latest = latest.isoformat() if latest is not None else ""
+        version = f"{feed_class}:{latest}:{count}"
+        return quote_etag(
+            hashlib.md5(version.encode(), usedforsecurity=False).hexdigest()
+        )
+
+    def prepare_items(self, items):
+        """
+        Applies items_select_related and items_prefetch_related to items, if
+        it's a QuerySet, and returns the items as a list, so that they're only
+        fetched once.
+
+        Override this to prefetch things for items that aren't a QuerySet.
+        """
+        if isinstance(items, QuerySet):
+            if self.items_select_related:
+                items = items.select_related(*self.items_select_related)
+            if self.items_prefetch_related:
+                items = items.prefetch_related(*self.items_prefetch_related)
+
+        return list(items)
+
+    def load_item_contents(self, items):
+        """
+        Sets the content:encoded for all the items at once, getting whatever
+        we can from the cache, rendering the rest, and caching those.
+        """
+        timeout = app_settings.FEED_CONTENT_CACHE_TIMEOUT
+        if timeout == 0:
+            return
+
+        items_by_key = {}
+        for item in items:
+            key = self.get_item_content_cache_key(item)
+            if key is not None:
+                items_by_key[key] = item
+
+        if not items_by_key:
+            return
+
+        cached = cache.get_many(list(items_by_key))
+        rendered = {}
+
+        for key, item in items_by_key.items():
+            if key in cached:
+                content = cached[key]
+            else:
+                content = self.render_item_content(item)
+                rendered[key] = content
+            self._set_loaded_content(item, content)
+
+        if rendered:
+            cache.set_many(rendered, timeout)
+
+    def get_item_content_cache_key(self, item):
+        """
+        Returns the cache key for item's rendered content, or None if it
+        shouldn't be cached.
+        """
+        parts = self.item_content_cache_key_parts(item)
+        if parts is None:
+            return None
+
+        feed_class = f"{self.__class__.__module__}.{self.__class__.__qualname__}"
+        # The site URL is used in the content, so should be part of the key:
+        version = ":".join(str(p) for p in (get_site_url(), *parts))
+        digest = hashlib.md5(version.encode(), usedforsecurity=False).hexdigest()
+        return f"hines_feed_content:{feed_class}:{digest}"
+
+    def item_content_cache_key_parts(self, item):
+        """
+        Returns a tuple of things that identify this version of item, used
+        to make its content cache key. Or None if it shouldn't be cached.
+
+        By default only model instances with a time_modified are cached,
+        keyed by their model, pk and time_modified. Override this if the
+        content depends on anything else.
+        """
+        if not isinstance(item, Model):
+            return None
+
+        time_modified = getattr(item, "time_modified", None)
+        if time_modified is None:
+            return None
+
+        return (item._meta.label_lower, item.pk, time_modified.isoformat())
+
     def item_extra_kwargs(self, item):
         """
         Add 'content' to the item, which will be used to make the
@@ -144,6 +623,16 @@ class ExtendedFeed(Feed):
         return extra
 
     def get_item_content(self, item):
+        """
+        Returns the content:encoded for item, using the version set by
+        load_item_contents() if there is one.
+        """
+        content = self._get_loaded_content(item)
+        if content is None:
+            content = self.render_item_content(item)
+        return content
+
+    def render_item_content(self, item):
         """
         If there's a self.content_template, then render that for the
         content:encoded element, otherwise use the self.item_content() method.
@@ -169,6 +658,48 @@ class ExtendedFeed(Feed):
         context["foo"] = "bar"
         return context
 
+    def get_feed(self, obj, request):
+        """
+        Fetches and prepares the items before the parent's get_feed() uses
+        them, and, for an ArchivePage, gets its items, with everything else
+        coming from the feed's usual object.
+
+        Feed instances are shared between requests, so the parent's
+        get_feed() is called on a copy of this one, which has these items,
+        and the ArchivePage and its links, if any.
+        """
+        feed = copy.copy(self)
+
+        if self.archive_url_name is not None:
+            feed.archive_links = self.get_archive_links(obj)
+
+        if isinstance(obj, ArchivePage):
+            feed.archive_page = obj
+            items = self.get_archive_items(obj)
+            obj = obj.obj
+        else:
+            items = self.items(obj)
+
+        items = self.prepare_items(items)
+        self.load_item_contents(items)
+        feed.items = PreparedItems(items)
+
+        return super(ExtendedFeed, feed).get_feed(obj, request)
+
+    # Feed instances are shared between requests, so rather than storing
+    # loaded content on self, we store it on each item.
+
+    def _get_loaded_content(self, item):
+        if isinstance(item, dict):
+            return item.get(self._loaded_content_attr)
+        return getattr(item, self._loaded_content_attr, None)
+
+    def _set_loaded_content(self, item, content):
+        if isinstance(item, dict):
+            item[self._loaded_content_attr] = content
+        else:
+            setattr(item, self._loaded_content_attr, content)
+
     def _get_content_template(self):
         content_tmp = None
 
@@ -1,4 +1,5 @@
 from django.contrib.sites.models import Site
+from django.db.models import prefetch_related_objects
 from django.urls import reverse
 
 from hines.core import app_settings
@@ -39,6 +40,23 @@ class EverythingFeedRSS(ExtendedFeed):
         kinds = app_settings.EVERYTHING_FEED_KINDS
         return RecentObjects(kinds).get_objects(num=self.num_items)
 
+    def get_items_version(self, obj):
+        kinds = app_settings.EVERYTHING_FEED_KINDS
+        return RecentObjects(kinds).get_version()
+
+    def prepare_items(self, items):
+        """
+        items is a list of dicts, not a QuerySet, so fetch the relations used
+        for each kind of object ourselves.
+        """
+        posts = [i["object"] for i in items if i["kind"] == "blog_post"]
+        prefetch_related_objects(posts, "author", "blog")
+
+        bookmarks = [i["object"] for i in items if i["kind"] == "pinboard_bookmark"]
+        prefetch_related_objects(bookmarks, "account")
+
+        return items
+
     # Getting details for each post in the feed:
 
     def item_title(self, item):
@@ -112,3 +130,20 @@ class EverythingFeedRSS(ExtendedFeed):
         elif app_settings.AUTHOR_EMAIL:
             email = app_settings.AUTHOR_EMAIL
         return email
+
+    def item_content_cache_key_parts(self, item):
+        if item["kind"] == "blog_post":
+            post = item["object"]
+            parts = super().item_content_cache_key_parts(post)
+            # These are in the content but can change without the Post changing:
+            return (*parts, post.blog.name, post.comments_allowed)
+
+        elif item["kind"] == "pinboard_bookmark":
+            return super().item_content_cache_key_parts(item["object"])
+
+        elif item["kind"] == "flickr_photos":
+            # The content changes if any of the day's photos change, or if
+            # photos are added or removed:
+            return tuple(
+                (photo.pk, photo.time_modified.isoformat()) for photo in item["objects"]
+            )
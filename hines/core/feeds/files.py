@@ -0,0 +1,143 @@
+import json
+import os
+import tempfile
+from pathlib import Path
+
+from django.core.cache import cache
+from django.urls import resolve, reverse
+from django_q.tasks import async_task
+
+from hines.core import app_settings
+from hines.core.utils import make_site_request
+from hines.weblogs.models import Blog
+
+# The name of the file that each feed's XML is saved as, within a directory
+# matching the feed's URL. e.g. for the feed at /phil/feeds/links/rss/:
+# <HINES_FEED_FILES_ROOT>/phil/feeds/links/rss/index.xml
+FEED_FILE_NAME = "index.xml"
+
+# The name of the file, in HINES_FEED_FILES_ROOT, listing the paths of the
+# feed files we saved, so that we only ever delete files that we saved.
+MANIFEST_FILE_NAME = ".feed_files.json"
+
+# Set while a generate_feed_files task is waiting to run, so that lots of
+# changes at once only queue one task:
+PENDING_CACHE_KEY = "hines_feed_files_pending"
+
+# In case the task never runs and so doesn't clear it:
+PENDING_TIMEOUT = 60 * 10
+
+
+def get_feed_file_path(url):
+    """
+    Returns the Path of the pre-generated file for the feed at the URL path
+    url, or None if we're not using feed files.
+    The file might not exist.
+    """
+    if not app_settings.FEED_FILES_ROOT:
+        return None
+
+    return Path(app_settings.FEED_FILES_ROOT) / url.strip("/") / FEED_FILE_NAME
+
+
+def get_feed_file_urls():
+    """
+    Returns a list of the URL paths of all the feeds that we save to files.
+    """
+    urls = [
+        reverse("hines:everything_feed_rss"),
+        reverse("hines:bookmarks_feed_rss"),
+        reverse("hines:comments_feed_rss"),
+    ]
+
+    for blog in Blog.objects.all():
+        urls.append(
+            reverse("weblogs:blog_feed_posts_rss", kwargs={"blog_slug": blog.slug})
+        )
+
+    return urls
+
+
+def queue_generate_feed_files():
+    """
+    Queues a task to run generate_feed_files(), unless one is already
+    waiting to run, in which case it will include any changes made now.
+    """
+    if cache.add(PENDING_CACHE_KEY, value=True, timeout=PENDING_TIMEOUT):
+        async_task("hines.core.tasks.generate_feed_files")
+
+
+def generate_feed_files():
+    """
+    Saves the XML of every feed in get_feed_file_urls() to its file, and
+    deletes any feed files we saved before that aren't needed now, e.g. for
+    Blogs that no longer exist.
+
+    Returns a list of the Paths of the files that were saved.
+    """
+    if not app_settings.FEED_FILES_ROOT:
+        return []
+
+    # Anything that changes from now on needs another task to save it:
+    cache.delete(PENDING_CACHE_KEY)
+
+    root = Path(app_settings.FEED_FILES_ROOT)
+    manifest_path = root / MANIFEST_FILE_NAME
+
+    paths = []
+    for url in get_feed_file_urls():
+        paths.append(generate_feed_file(url))
+
+    try:
+        old_paths = {root / p for p in json.loads(manifest_path.read_text())}
+    except FileNotFoundError:
+        old_paths = set()
+
+    for path in old_paths.difference(paths):
+        path.unlink(missing_ok=True)
+
+    _write_file(
+        manifest_path,
+        json.dumps([str(p.relative_to(root)) for p in paths]).encode(),
+    )
+
+    return paths
+
+
+def generate_feed_file(url):
+    """
+    Saves the XML of the ExtendedFeed at the URL path url to its file,
+    returning the Path of the file.
+    """
+    match = resolve(url)
+    response = match.func.get_response(
+        make_site_request(url), *match.args, **match.kwargs
+    )
+
+    path = get_feed_file_path(url)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    _write_file(path, response.content)
+
+    return path
+
+
+def _write_file(path, content):
+    """
+    Writes the bytes content to the file at path, via a temporary file that's
+    then renamed, so that anything reading it never sees a partly-written
+    file.
+    """
+    # The temporary file is in the same directory so that os.replace() is a
+    # rename within the same filesystem, which is atomic.
+    with tempfile.NamedTemporaryFile(
+        dir=path.parent, prefix=".", suffix=".tmp", delete=False
+    ) as f:
+        try:
+            f.write(content)
+        except Exception:
+            Path(f.name).unlink()
+            raise
+
+    # NamedTemporaryFile is only readable by its owner:
+    Path(f.name).chmod(0o644)
+    os.replace(f.name, path)
@@ -3,14 +3,22 @@ from django.core.cache import DEFAULT_CACHE_ALIAS, caches
 from django.core.cache.backends.base import InvalidCacheBackendError
 from django.core.management.base import BaseCommand, CommandError
 
+from hines.core.cache import clear_cached_pages
+
 
 class Command(BaseCommand):
     """
     A simple management command which clears the site-wide cache.
     From https://github.com/django-extensions/django-extensions/blob/master/django_extensions/management/commands/clear_cache.py
+
+    Or, with --prefix, --view or --tag, only clears the cached pages that
+    match. Warns about any view or tag that no cached page has. e.g.:
+
+        ./manage.py clear_cache --prefix=/phil/writing/2019/
+        ./manage.py clear_cache --view=weblogs:post_detail --tag=blog:writing
     """
 
-    help = "Fully clear site-wide cache."
+    help = "Fully clear site-wide cache, or only some cached pages."
 
     def add_arguments(self, parser):
         parser.add_argument("--cache", action="append", help="Name of cache to clear")
@@ -22,8 +30,49 @@ class Command(BaseCommand):
             dest="all_caches",
             help="Clear all configured caches",
         )
+        parser.add_argument(
+            "--prefix",
+            action="append",
+            default=[],
+            dest="prefixes",
+            help="Only clear pages whose paths start with this, like /phil/writing/",
+        )
+        parser.add_argument(
+            "--view",
+            action="append",
+            default=[],
+            dest="views",
+            help="Only clear pages from the view with this URL name, like home",
+        )
+        parser.add_argument(
+            "--tag",
+            action="append",
+            default=[],
+            dest="tags",
+            help="Only clear pages with this cache tag, like blog:writing",
+        )
+
+    def handle(self, cache, all_caches, prefixes, views, tags, *args, **kwargs):
+        if prefixes or views or tags:
+            if cache or all_caches:
+                msg = (
+                    "Using --cache or --all with --prefix, --view or --tag "
+                    "is not supported"
+                )
+                raise CommandError(msg)
+            try:
+                uncached = clear_cached_pages(prefixes=prefixes, views=views, tags=tags)
+            except ValueError as err:
+                raise CommandError(str(err)) from err
+            for name in uncached:
+                msg = f"No cached pages have {name}, so none were cleared."
+                self.stderr.write(self.style.WARNING(msg))
+            cleared = [n for n in prefixes + views + tags if n not in uncached]
+            if cleared:
+                cleared = ", ".join(cleared)
+                self.stdout.write(f"Cached pages for {cleared} have been cleared!\n")
+            return
 
-    def handle(self, cache, all_caches, *args, **kwargs):
         if not cache and not all_caches:
             cache = [DEFAULT_CACHE_ALIAS]
         elif cache and all_caches:
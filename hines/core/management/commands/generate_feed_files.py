@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from hines.core import app_settings
+from hines.core.feeds.files import generate_feed_files
+
+
+class Command(BaseCommand):
+    """
+    Saves the XML of all the site's feeds to files in HINES_FEED_FILES_ROOT.
+    Those files are then served instead of building the feeds.
+    """
+
+    help = "Saves all the feeds as files in HINES_FEED_FILES_ROOT"
+
+    def handle(self, *args, **options):
+        if not app_settings.FEED_FILES_ROOT:
+            msg = "The HINES_FEED_FILES_ROOT setting is empty"
+            raise CommandError(msg)
+
+        paths = generate_feed_files()
+
+        noun = "file" if len(paths) == 1 else "files"
+        self.stdout.write(f"{len(paths)} feed {noun} saved")
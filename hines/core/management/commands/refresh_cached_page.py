@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from hines.core.cache import refresh_cached_page
+
+
+class Command(BaseCommand):
+    """
+    Regenerates the cached copy of a page, whether or not it has expired.
+    Used to regenerate stale pages in views with a cache_stale_timeout.
+    """
+
+    help = "Regenerates the cached copy of the page at a URL path"
+
+    def add_arguments(self, parser):
+        parser.add_argument("url", help='A URL path, like "/terry/stats/"')
+
+    def handle(self, url, *args, **options):
+        response = refresh_cached_page(url)
+
+        if response.status_code != 200:
+            msg = f"{url} returned a {response.status_code} response"
+            raise CommandError(msg)
+
+        self.stdout.write(f"{url} refreshed")
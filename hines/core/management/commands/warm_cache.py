@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand
+
+from hines.config.urls import sitemaps
+from hines.core.warm import get_warm_cache_urls, warm_cache
+
+
+class Command(BaseCommand):
+    """
+    Requests the site's key pages and all the pages in its sitemaps, so that
+    they're cached before visitors request them. e.g. after a deploy or
+    clearing the cache.
+    """
+
+    help = "Requests pages from the sitemaps so that they're cached"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=4,
+            help="How many pages to request at once (default 4)",
+        )
+        parser.add_argument(
+            "--time-limit",
+            type=int,
+            default=None,
+            help="Stop requesting pages after this many seconds",
+        )
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=None,
+            help="The maximum number of pages to request",
+        )
+        parser.add_argument(
+            "--recent-first",
+            action="store_true",
+            default=False,
+            help="Request the most recently modified pages first",
+        )
+
+    def handle(self, *args, **options):
+        urls = get_warm_cache_urls(
+            sitemaps, recent_first=options["recent_first"], limit=options["limit"]
+        )
+
+        results = warm_cache(
+            urls,
+            concurrency=options["concurrency"],
+            time_limit=options["time_limit"],
+        )
+
+        noun = "page" if results["requested"] == 1 else "pages"
+        self.stdout.write(f"{results['requested']} {noun} requested")
+
+        if results["failed"]:
+            self.stdout.write(self.style.WARNING(f"{results['failed']} failed to load"))
+        if results["skipped"]:
+            self.stdout.write(
+                self.style.WARNING(f"{results['skipped']} skipped, out of time")
+            )
@@ -0,0 +1,28 @@
+from . import app_settings
+from .cache_metrics import record_cache_hit
+
+
+class CacheMetricsMiddleware:
+    """
+    Records a cache hit for every response that CacheMixin labelled before
+    it was cached, unless the view generated it for this request.
+
+    Should come straight after UpdateCacheMiddleware, so that it sees the
+    pages that FetchFromCacheMiddleware serves without reaching the view.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        labels = getattr(response, "hines_cache_metrics", None)
+        if (
+            labels is not None
+            and app_settings.CACHE_METRICS
+            and not getattr(request, "hines_cache_miss", False)
+        ):
+            record_cache_hit(*labels)
+
+        return response
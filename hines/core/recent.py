@@ -1,12 +1,28 @@
+import heapq
 from datetime import datetime
+from itertools import groupby, islice
 
 from ditto.flickr.models import Account as FlickrAccount
 from ditto.flickr.models import Photo
 from ditto.pinboard.models import Account as PinboardAccount
 from ditto.pinboard.models import Bookmark
+from django.core.cache import cache
+from django.db.models import Count, Max
 from django.utils import timezone
 
-from hines.weblogs.models import Blog, Post
+from hines.weblogs.models import Blog, Post, get_comments_closed_time
+
+# The cache key for a dict mapping kinds that have been validated, like
+# ('blog_posts', 'writing'), to the pks of their Blogs, Flickr Users, etc.
+KIND_REGISTRY_CACHE_KEY = "hines_core_recent_kinds"
+
+
+def clear_kind_registry():
+    """
+    Forget all the validated kinds, so that they'll be validated again.
+    Called when any of the objects the kinds refer to change.
+    """
+    cache.delete(KIND_REGISTRY_CACHE_KEY)
 
 
 class RecentObjects:
@@ -25,11 +41,11 @@ class RecentObjects:
 
         'object': A Django object of the correct type, e.g. Post or Bookmark.
         OR
-        'objects': A Queryset of all Photos posted on that day.
+        'objects': A list of all Photos posted on that day.
 
         'kind': e.g. 'blog_post', 'flickr_photos', 'pinboard_bookmark'.
         'time': The datetime this object was uploaded/published.
-                OR the datetime at midnight for the day of the Photos QS.
+                OR the datetime at midnight for the day of the Photos list.
 
     NOTE: Some types have a single item at a specific time.
           Some types have several items from a specific day.
@@ -38,22 +54,30 @@ class RecentObjects:
 
     To add a new kind...
 
-    1. Add to `valid_kind_types`.
-    2. Add a check in `validate_kinds()`.
-    3. Add a clause in `get_objects()`.
-    4. Add a method, equivalent of `get_flickr_photos()`.
+    1. Add to `kind_providers`.
+    2. Add its model to the signal receivers in hines.core.signals.
+    3. Add a clause in `get_objects()` and `get_kind_queryset()`.
+    4. Add a generator method, equivalent of `iter_flickr_photos()`, which
+       yields dicts in reverse chronological order.
     5. Add tests.
     """
 
     # Will be the kinds passed to __init__(), assuming they're valid.
     kinds = []
 
+    # The maximum number of rows fetched in each query for a single kind:
+    chunk_size = 10
+
+    # For each kind_type we accept, how to find the pk we'll filter its items
+    # by: (model, lookup for the kind_id, field on the model with the pk).
+    kind_providers = {
+        "blog_posts": (Blog, "slug", "pk"),
+        "flickr_photos": (FlickrAccount, "user__nsid", "user_id"),
+        "pinboard_bookmarks": (PinboardAccount, "username", "pk"),
+    }
+
     # __init__() throws an error if supplied with kind_types that aren't these.
-    valid_kind_types = [
-        "blog_posts",
-        "flickr_photos",
-        "pinboard_bookmarks",
-    ]
+    valid_kind_types = list(kind_providers)
 
     def __init__(self, kinds):
         """
@@ -66,19 +90,42 @@ class RecentObjects:
             ('flickr_photos', '35034346050@N01'), # A Flickr Account User's NSID
             ('pinboard_bookmarks', 'philgyford'), # A Pinboard Account's username
         )
+
+        Kinds that have been validated before are remembered in the cache,
+        along with their pks, so we don't query the database for them again
+        until one of the relevant objects is saved or deleted.
         """
         self.kinds = []
+        # Will map each valid kind to the pk of its Blog, Flickr User, etc:
+        self.kind_pks = {}
         invalid_kinds = []
 
+        registry = cache.get(KIND_REGISTRY_CACHE_KEY, {})
+        registry_changed = False
+
         for kind in kinds:
-            if self.validate_kind(kind):
+            kind = tuple(kind)
+
+            if kind in registry:
+                pk = registry[kind]
+            else:
+                pk = self.resolve_kind(kind)
+                if pk is not None:
+                    registry[kind] = pk
+                    registry_changed = True
+
+            if pk is not None:
                 self.kinds.append(kind)
+                self.kind_pks[kind] = pk
             else:
                 if len(kind) == 2:
                     invalid_kinds.append(f"{kind[0]}: {kind[1]}")
                 else:
                     invalid_kinds.append(str(kind))
 
+        if registry_changed:
+            cache.set(KIND_REGISTRY_CACHE_KEY, registry, None)
+
         if len(invalid_kinds) > 0:
             msg = "Invalid kind(s) supplied to __init__(): {}".format(
                 ", ".join(invalid_kinds)
@@ -97,125 +144,212 @@ class RecentObjects:
 
         Returns False otherwise.
         """
+        return self.resolve_kind(kind) is not None
+
+    def resolve_kind(self, kind):
+        """
+        Checks a tuple like ('blog_posts', 'my-blog',).
 
+        Returns the pk of the object that the kind's items are filtered by
+        (e.g. the pk of the Blog with a slug of 'my-blog') if the kind is valid.
+
+        Returns None otherwise.
+        """
         if len(kind) != 2:
-            return False
+            return None
 
         kind_type = kind[0]
         kind_id = kind[1]
 
         if kind_type not in self.valid_kind_types:
-            return False
-
-        if kind_type == "blog_posts":
-            try:
-                Blog.objects.get(slug=kind_id)
-            except Blog.DoesNotExist:
-                return False
+            return None
 
-        elif kind_type == "flickr_photos":
-            try:
-                FlickrAccount.objects.get(user__nsid=kind_id)
-            except FlickrAccount.DoesNotExist:
-                return False
-
-        elif kind_type == "pinboard_bookmarks":
-            try:
-                PinboardAccount.objects.get(username=kind_id)
-            except PinboardAccount.DoesNotExist:
-                return False
+        model, lookup, pk_field = self.kind_providers[kind_type]
 
-        return True
+        return (
+            model.objects.filter(**{lookup: kind_id})
+            .values_list(pk_field, flat=True)
+            .first()
+        )
 
     def get_objects(self, num=10):
         """
         Returns a list of the `num` most recently posted/uploaded public
         objects of the requested kinds.
+
+        Each kind is a lazy iterator of objects in reverse chronological order,
+        and we do a k-way merge of them all. Rows are only fetched from the
+        database, a chunk at a time, when the merge needs them, so we fetch
+        about `num` rows in total rather than `num` rows for every kind.
         """
-        objects = []
+        chunk_size = max(1, min(num, self.chunk_size))
+
+        iterators = []
 
         for kind in self.kinds:
             kind_type = kind[0]
-            kind_id = kind[1]
+            kind_pk = self.kind_pks[kind]
 
             if kind_type == "blog_posts":
-                objects.extend(self.get_blog_posts(kind_id, num))
+                iterators.append(self.iter_blog_posts(kind_pk, chunk_size))
 
             elif kind_type == "flickr_photos":
-                objects.extend(self.get_flickr_photos(kind_id, num))
+                iterators.append(self.iter_flickr_photos(kind_pk, chunk_size))
 
             elif kind_type == "pinboard_bookmarks":
-                objects.extend(self.get_pinboard_bookmarks(kind_id, num))
+                iterators.append(self.iter_pinboard_bookmarks(kind_pk, chunk_size))
+
+        merged = heapq.merge(*iterators, key=lambda k: k["time"], reverse=True)
+
+        return list(islice(merged, num))
+
+    def get_version(self):
+        """
+        Returns a tuple of the most recent time_modified of all the public
+        objects of all our kinds, and how many of those objects there are.
+        Cheap to fetch, and changes whenever any of the objects change, or
+        are added or removed.
+
+        For Posts, the time also includes their Blog's time_modified, and
+        when comments last closed on one of them, which both change what's
+        shown for them.
+
+        The time will be None if there are no objects.
+        """
+        latest = None
+        count = 0
+
+        for kind in self.kinds:
+            qs = self.get_kind_queryset(kind[0], self.kind_pks[kind])
+            aggregates = {"latest": Max("time_modified"), "count": Count("pk")}
+            if kind[0] == "blog_posts":
+                aggregates["blog_modified"] = Max("blog__time_modified")
+
+            result = qs.order_by().aggregate(**aggregates)
+            count += result.pop("count")
 
-        sorted_objects = sorted(objects, key=lambda k: k["time"], reverse=True)
+            times = list(result.values())
+            if kind[0] == "blog_posts":
+                times.append(get_comments_closed_time(qs))
 
-        return sorted_objects[:num]
+            for time in times:
+                if time is not None and (latest is None or time > latest):
+                    latest = time
 
-    def get_blog_posts(self, blog_slug, num):
+        return latest, count
+
+    def get_kind_queryset(self, kind_type, kind_pk):
         """
-        Returns a list of the `num` most recent Posts from the Blog with
-        `blog_slug`.
+        Returns an unordered QuerySet of all the public objects of kind_type,
+        filtered by kind_pk (e.g. the pk of a Blog).
         """
-        objects = []
+        if kind_type == "blog_posts":
+            return Post.public_objects.filter(blog_id=kind_pk)
+
+        elif kind_type == "flickr_photos":
+            return Photo.public_objects.filter(user_id=kind_pk)
 
-        posts = Post.public_objects.filter(blog__slug=blog_slug).order_by(
+        elif kind_type == "pinboard_bookmarks":
+            return Bookmark.public_objects.filter(account_id=kind_pk)
+
+    def iter_blog_posts(self, blog_pk, chunk_size):
+        """
+        Yields the most recent Posts from the Blog with `blog_pk`, most
+        recent first.
+        """
+        posts = self.get_kind_queryset("blog_posts", blog_pk).order_by(
             "-time_published"
-        )[:num]
-        for post in posts:
-            objects.append(
-                {"kind": "blog_post", "object": post, "time": post.time_published}
-            )
+        )
 
-        return objects
+        for post in _iterate_in_chunks(posts, chunk_size):
+            yield {"kind": "blog_post", "object": post, "time": post.time_published}
 
-    def get_flickr_photos(self, nsid, num):
+    def iter_flickr_photos(self, user_pk, chunk_size):
         """
-        Returns a list of the `num` most recent dates on which user `nsid` has
-        posted photos, with a queryset of Photos for each one.
+        Yields the most recent dates on which the Flickr User with `user_pk`
+        has posted photos, most recent first, with a list of Photos for each.
 
-        NOTE: This has `objects` rather than `object` (a QuerySet of all the
-        Photos from that day).
+        For each chunk of `chunk_size` days we make a single query that fetches
+        all the Photos posted on those days, and group them by local day here.
+
+        NOTE: This has `objects` rather than `object` (a list of all the
+        Photos from that day, earliest first).
         """
-        objects = []
+        photos = self.get_kind_queryset("flickr_photos", user_pk)
 
-        photo_dates = Photo.public_objects.filter(user__nsid=nsid).dates(
-            "post_time", "day", order="DESC"
-        )[:num]
+        photo_dates = photos.dates("post_time", "day", order="DESC")
 
-        for photo_date in photo_dates:
-            photos = Photo.public_objects.filter(
-                user__nsid=nsid, post_time__date=photo_date
-            ).order_by("post_time")
+        start = 0
 
-            # Turn photo_date into a timezone aware time at midnight:
-            photo_time = datetime.combine(photo_date, datetime.min.time())
-            photo_time = timezone.make_aware(
-                photo_time, timezone.get_current_timezone()
+        while True:
+            days = self._group_photos_by_day(
+                photos.filter(
+                    post_time__date__in=photo_dates[start : start + chunk_size]
+                ).order_by("-post_time")
             )
 
-            objects.append(
-                {"kind": "flickr_photos", "objects": photos, "time": photo_time}
-            )
+            for photo_date, day_photos in days:
+                # Turn photo_date into a timezone aware time at midnight:
+                photo_time = datetime.combine(photo_date, datetime.min.time())
+                photo_time = timezone.make_aware(
+                    photo_time, timezone.get_current_timezone()
+                )
+
+                yield {
+                    "kind": "flickr_photos",
+                    "objects": day_photos,
+                    "time": photo_time,
+                }
+
+            if len(days) < chunk_size:
+                return
 
-        return objects
+            start += chunk_size
 
-    def get_pinboard_bookmarks(self, username, num):
+    def _group_photos_by_day(self, photos):
         """
-        Returns a list of the `num` most recent Bookmarks from `username`.
+        Given Photos ordered by post_time, most recent first, returns a list
+        of (date, [Photo, Photo, ...]) tuples, one per local day, most recent
+        day first. Each day's Photos are ordered earliest first.
         """
-        objects = []
+        days = []
+
+        for photo_date, day_photos in groupby(
+            photos, key=lambda p: timezone.localtime(p.post_time).date()
+        ):
+            days.append((photo_date, list(reversed(list(day_photos)))))
+
+        return days
 
-        bookmarks = Bookmark.public_objects.filter(account__username=username).order_by(
+    def iter_pinboard_bookmarks(self, account_pk, chunk_size):
+        """
+        Yields the most recent Bookmarks from the Pinboard Account with
+        `account_pk`, most recent first.
+        """
+        bookmarks = self.get_kind_queryset("pinboard_bookmarks", account_pk).order_by(
             "-post_time"
-        )[:num]
-
-        for bookmark in bookmarks:
-            objects.append(
-                {
-                    "kind": "pinboard_bookmark",
-                    "object": bookmark,
-                    "time": bookmark.post_time,
-                }
-            )
+        )
+
+        for bookmark in _iterate_in_chunks(bookmarks, chunk_size):
+            yield {
+                "kind": "pinboard_bookmark",
+                "object": bookmark,
+                "time": bookmark.post_time,
+            }
+
+
+def _iterate_in_chunks(qs, chunk_size):
+    """
+    Yields the items from the ordered QuerySet `qs`, fetching them from the
+    database `chunk_size` rows at a time, and only when they're needed.
+    """
+    start = 0
+
+    while True:
+        chunk = list(qs[start : start + chunk_size])
+        yield from chunk
+
+        if len(chunk) < chunk_size:
+            return
 
-        return objects
+        start += chunk_size
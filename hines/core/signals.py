@@ -0,0 +1,144 @@
+from ditto.flickr.models import Account as FlickrAccount
+from ditto.flickr.models import Photo
+from ditto.flickr.models import User as FlickrUser
+from ditto.pinboard.models import Account as PinboardAccount
+from ditto.pinboard.models import Bookmark
+from ditto.twitter.models import Tweet
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from hines.custom_comments.models import CustomComment
+from hines.stats.generators import WeblogGenerator
+from hines.stats.snapshots import expire_snapshots
+from hines.weblogs.models import Blog, Post, Trackback
+
+from . import app_settings
+from .cache import PAGE_TAG, get_day_tag, invalidate_cache_tags
+from .feeds.files import queue_generate_feed_files
+from .recent import clear_kind_registry
+
+
+@receiver(post_save, sender=Blog)
+@receiver(post_delete, sender=Blog)
+@receiver(post_save, sender=FlickrAccount)
+@receiver(post_delete, sender=FlickrAccount)
+@receiver(post_save, sender=FlickrUser)
+@receiver(post_delete, sender=FlickrUser)
+@receiver(post_save, sender=PinboardAccount)
+@receiver(post_delete, sender=PinboardAccount)
+def recent_objects_kind_actions(sender, instance, using, **kwargs):
+    """
+    If we're saving/deleting something that a RecentObjects kind might refer
+    to, forget the kinds that have already been validated.
+    """
+    clear_kind_registry()
+
+
+@receiver(post_save, sender=Blog)
+@receiver(post_delete, sender=Blog)
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Photo)
+@receiver(post_delete, sender=Photo)
+@receiver(post_save, sender=Bookmark)
+@receiver(post_delete, sender=Bookmark)
+@receiver(post_save, sender=CustomComment)
+@receiver(post_delete, sender=CustomComment)
+def feed_files_actions(sender, instance, using, **kwargs):
+    """
+    If we're saving feeds to files, save them all again after something
+    that might be in them changes.
+    """
+    if app_settings.FEED_FILES_ROOT:
+        transaction.on_commit(queue_generate_feed_files, using=using)
+
+
+@receiver(post_save, sender=Blog)
+@receiver(post_delete, sender=Blog)
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Trackback)
+@receiver(post_delete, sender=Trackback)
+@receiver(post_save, sender=CustomComment)
+@receiver(post_delete, sender=CustomComment)
+@receiver(post_save, sender=Photo)
+@receiver(post_delete, sender=Photo)
+@receiver(post_save, sender=Bookmark)
+@receiver(post_delete, sender=Bookmark)
+@receiver(post_save, sender=Tweet)
+@receiver(post_delete, sender=Tweet)
+def cache_tags_actions(sender, instance, using, **kwargs):
+    """
+    Delete all the cached pages that depend on the object that's changed.
+    See CacheMixin.
+
+    This waits until the transaction commits, so that saving several things
+    at once, e.g. in the admin, only deletes from the cache once.
+    """
+    tags = get_cache_tags_for_object(instance)
+    # Pages the object was on before it was saved, like its old day:
+    tags.extend(getattr(instance, "_previous_cache_tags", []))
+    invalidate_cache_tags(tags, defer=True)
+
+
+@receiver(pre_save, sender=Post)
+def previous_cache_tags_actions(sender, instance, raw, using, **kwargs):
+    """
+    Remember the cache tags for the Post as it was before it's saved, so
+    that if its Blog, date or slug changes, the pages it was on are expired.
+    """
+    if raw or instance.pk is None:
+        return
+    previous = (
+        Post.objects.using(using).select_related("blog").filter(pk=instance.pk).first()
+    )
+    if previous is not None:
+        instance._previous_cache_tags = get_cache_tags_for_object(previous)
+
+
+def get_cache_tags_for_object(obj):
+    "Returns a list of the cache tags that obj affects."
+    tags = []
+
+    if isinstance(obj, Blog):
+        tags = ["posts", f"blog:{obj.slug}"]
+
+    elif isinstance(obj, Post):
+        tags = ["posts", f"blog:{obj.blog.slug}"]
+        if obj.time_published is not None:
+            tags.extend([get_day_tag(obj.time_published), get_post_page_tag(obj)])
+
+    elif isinstance(obj, Trackback):
+        if obj.post.time_published is not None:
+            tags = [get_post_page_tag(obj.post)]
+
+    elif isinstance(obj, CustomComment):
+        if obj.content_type.model_class() is Post:
+            post = Post.objects.filter(pk=obj.object_pk).first()
+            if post is not None and post.time_published is not None:
+                tags = [get_post_page_tag(post)]
+
+    elif isinstance(obj, (Photo, Bookmark, Tweet)):
+        kind = {Photo: "photos", Bookmark: "bookmarks", Tweet: "tweets"}[type(obj)]
+        tags = [kind, get_day_tag(obj.post_time)]
+
+    return tags
+
+
+def get_post_page_tag(post):
+    """
+    The tag that the Post's own page has, for its path. See
+    hines.core.cache.get_page_cache_tags().
+    """
+    return PAGE_TAG.format(post.get_absolute_url())
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def stats_snapshot_actions(sender, instance, using, **kwargs):
+    """
+    Delete the precomputed data for stats charts about Posts, so that it's
+    computed again when next needed, like its cached copy.
+    """
+    expire_snapshots(WeblogGenerator)
@@ -8,6 +8,12 @@ from django.core.management import call_command
 #   days="1", account="gyford"
 
 
+def compute_stats(force="false"):
+    out = StringIO()
+    call_command("compute_stats", stdout=out, force=(force == "true"))
+    return out.getvalue()
+
+
 def fetch_flickr_photos(days="30", account=None):
     if account is None:
         return False
@@ -68,12 +74,27 @@ def fetch_twitter_tweets(recent="200", account=None):
     return out.getvalue()
 
 
+def generate_feed_files():
+    out = StringIO()
+    call_command("generate_feed_files", stdout=out)
+    return out.getvalue()
+
+
 def publish_scheduled_posts():
     out = StringIO()
     call_command("publish_scheduled_posts", stdout=out)
     return out.getvalue()
 
 
+def refresh_cached_page(url=None):
+    if url is None:
+        return False
+
+    out = StringIO()
+    call_command("refresh_cached_page", url, stdout=out)
+    return out.getvalue()
+
+
 def update_twitter_tweets(account=None):
     if account is None:
         return False
@@ -90,3 +111,11 @@ def update_twitter_users(account=None):
     out = StringIO()
     call_command("update_twitter_users", stdout=out, account=account)
     return out.getvalue()
+
+
+def warm_cache(time_limit="600"):
+    out = StringIO()
+    call_command(
+        "warm_cache", stdout=out, recent_first=True, time_limit=int(time_limit)
+    )
+    return out.getvalue()
@@ -15,6 +15,7 @@ from spectator.events.templatetags.spectator_events import (
 )
 
 from hines.core import app_settings
+from hines.core.cache import PER_REQUEST_PLACEHOLDER
 from hines.core.utils import get_site_url
 
 register = template.Library()
@@ -35,6 +36,25 @@ def gravatar_url(email):
         return ""
 
 
+@register.simple_tag(takes_context=True)
+def per_request(context, template_name):
+    """
+    Renders template_name with the current context, like {% include %}.
+
+    But if the view is caching the page with CacheMixin.cache_per_request,
+    outputs a placeholder instead, which is replaced by the rendered
+    template on each request. For things like forms with CSRF tokens.
+
+    Example usage:
+
+        {% per_request "weblogs/includes/comment_form.html" %}
+    """
+    if context.get("per_request_placeholders"):
+        return mark_safe(PER_REQUEST_PLACEHOLDER.format(template_name))
+
+    return context.template.engine.get_template(template_name).render(context)
+
+
 @register.filter
 def get_item(dictionary, key):
     """
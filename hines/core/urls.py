@@ -29,6 +29,11 @@ urlpatterns = [
         links_feeds.BookmarksFeedRSS(),
         name="bookmarks_feed_rss",
     ),
+    path(
+        "feeds/links/rss/archive/<feedcursor:cursor>/",
+        links_feeds.BookmarksFeedRSS(),
+        name="bookmarks_feed_rss_archive",
+    ),
     path(
         f"feeds/{admin_comments_slug}/rss/",
         comments_feeds.AdminCommentsFeedRSS(),
@@ -88,4 +93,9 @@ urlpatterns = [
         core_views.admin_clear_cache,
         name="admin_clear_cache",
     ),
+    path(
+        "admin-custom/cache-metrics/",
+        core_views.admin_cache_metrics,
+        name="admin_cache_metrics",
+    ),
 ]
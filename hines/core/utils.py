@@ -3,6 +3,7 @@ from datetime import UTC, datetime
 
 import markdown2
 from django.contrib.sites.models import Site
+from django.http import HttpRequest, QueryDict
 from django.utils.html import strip_tags
 from django.utils.text import Truncator
 
@@ -128,65 +129,6 @@ def truncate_string(
     return text
 
 
-def expire_view_cache(path, key_prefix=None):
-    """
-    This function allows you to invalidate any item from the per-view cache.
-
-    It probably won't work with things cached using the per-site cache
-    middleware (because that takes account of the Vary: Cookie header).
-
-    This assumes you're using the Sites framework.
-
-    Arguments:
-
-        * path: The URL of the view to invalidate, like `/blog/posts/1234/`.
-
-        * key prefix: The same as that used for the cache_page()
-          function/decorator (if any).
-    """
-    from django.conf import settings
-    from django.contrib.sites.models import Site
-    from django.core.cache import cache
-    from django.http import HttpRequest
-    from django.utils.cache import get_cache_key
-
-    # Prepare metadata for our fake request.
-    # I'm not sure how 'real' this data needs to be, but still:
-
-    domain_parts = Site.objects.get_current().domain.split(":")
-    request_meta = {"SERVER_NAME": domain_parts[0]}
-    if len(domain_parts) > 1:
-        request_meta["SERVER_PORT"] = domain_parts[1]
-    else:
-        request_meta["SERVER_PORT"] = "80"
-
-    # Create a fake request object
-
-    request = HttpRequest()
-    request.method = "GET"
-    request.META = request_meta
-    request.path = path
-
-    if settings.USE_I18N:
-        request.LANGUAGE_CODE = settings.LANGUAGE_CODE
-
-    # If this key is in the cache, delete it:
-
-    try:
-        cache_key = get_cache_key(request, key_prefix=key_prefix)
-        if cache_key:
-            if cache.get(cache_key):
-                cache.delete(cache_key)
-                return (True, "Successfully invalidated")
-            else:
-                return (False, "Cache_key does not exist in cache")
-        else:
-            msg = "Failed to create cache_key"
-            raise ValueError(msg)
-    except (ValueError, Exception) as err:  # noqa: BLE001
-        return (False, err)
-
-
 def get_site_url():
     """
     Returns the full domain of the website.
@@ -204,3 +146,26 @@ def get_site_url():
     domain = Site.objects.get_current().domain
 
     return f"{protocol}://{domain}"
+
+
+def make_site_request(url):
+    """
+    Returns a GET request for url, a path like "/terry/stats/?page=2", as if
+    it came from a browser to our site. For generating pages outside of
+    a real request.
+    """
+    path, _, query_string = url.partition("?")
+
+    request = HttpRequest()
+    request.method = "GET"
+    request.path = request.path_info = path
+    request.META = {
+        "SERVER_NAME": Site.objects.get_current().domain,
+        "SERVER_PORT": "80",
+        "QUERY_STRING": query_string,
+    }
+    if app_settings.USE_HTTPS:
+        request.META["SERVER_PORT"] = "443"
+        request.META["HTTP_X_FORWARDED_PROTO"] = "https"
+    request.GET = QueryDict(query_string)
+    return request
@@ -1,5 +1,6 @@
 import datetime
 import re
+import time
 from collections import OrderedDict
 
 from ditto.flickr.models import Photo, Photoset
@@ -19,8 +20,10 @@ from django.http import (
     HttpResponseNotFound,
     HttpResponseRedirect,
     HttpResponseServerError,
+    JsonResponse,
 )
-from django.shortcuts import get_object_or_404, redirect
+from django.middleware.cache import CacheMiddleware
+from django.shortcuts import get_object_or_404, redirect, render
 from django.template.loader import get_template
 from django.urls import reverse
 from django.utils import timezone
@@ -35,6 +38,27 @@ from spectator.reading.models import Publication
 from spectator.reading.views import ReadingHomeView as SpectatorReadingHomeView
 
 from hines.core import app_settings
+from hines.core.cache import (
+    acquire_page_lock,
+    clear_cached_pages,
+    create_tagged_cache_key,
+    get_cache_tag_versions,
+    get_page_cache_tags,
+    get_tagged_cache_key,
+    get_view_key_prefix,
+    is_cacheable_response,
+    mark_fresh_until,
+    on_response_cached,
+    release_page_lock,
+    render_per_request,
+    revalidate_if_stale,
+    wait_for_cached_response,
+)
+from hines.core.cache_metrics import (
+    get_cache_metrics,
+    get_cache_tier_stats,
+    record_cache_miss,
+)
 from hines.core.utils import make_date
 from hines.weblogs.models import Blog
 
@@ -90,21 +114,240 @@ class CacheMixin:
     Add this mixin to a view to cache it.
 
     Disables caching for logged-in users.
+
+    If the view has cache_tags (or get_cache_tags()), like "blog:writing" or
+    "day:2024-05-01", the cached page will be expired whenever something with
+    those tags changes. See hines.core.cache and hines.core.signals. Every
+    page is also tagged with its view's URL name and its path's prefixes,
+    for hines.core.cache.clear_cached_pages().
+
+    The pages are cached with a key prefix made from the current versions of
+    all those tags, and not by the site-wide cache middleware, which can't
+    know them. Tags are only given versions when a page is cached with them.
+
+    If the view has a cache_stale_timeout, the cached page is kept for that
+    much longer. Visitors during that time get the stale page straight away,
+    and the first of them queues a task to regenerate it. With a
+    cache_early_expiry_beta that might happen a little before it's stale.
+
+    When the page isn't in the cache only one request generates it, while
+    any others wait for it to be cached.
+
+    If cache_per_request is True, parts of the template that must differ for
+    each visitor, like forms with CSRF tokens, or messages, can be rendered
+    with the {% per_request "template.html" %} tag. Those are cached as
+    placeholders, which are replaced by rendering the templates with
+    get_per_request_context() for every request.
+
+    If HINES_CACHE_METRICS is True, cache hits and misses are recorded. See
+    hines.core.cache_metrics and CacheMetricsMiddleware.
     """
 
     cache_timeout = 60 * 5  # seconds
 
+    # If set, and HINES_CACHE_STALE_WHILE_REVALIDATE is True, then for this many
+    # seconds after cache_timeout the stale page is served from the cache
+    # while a django-q task regenerates it.
+    cache_stale_timeout = None
+
+    # If set, with cache_stale_timeout, pages are randomly regenerated before
+    # they're stale, and earlier the higher this is. 1 is a good value.
+    # See hines.core.cache.revalidate_if_stale().
+    cache_early_expiry_beta = None
+
+    cache_per_request = False
+
+    cache_tags = []
+
     def get_cache_timeout(self):
         return self.cache_timeout
 
+    def get_cache_stale_timeout(self):
+        if app_settings.CACHE_STALE_WHILE_REVALIDATE:
+            return self.cache_stale_timeout
+        return None
+
+    def get_cache_tags(self):
+        return self.cache_tags
+
+    def get_cache_key_prefix(self, versions=None):
+        """
+        The key_prefix for caching this page, which changes whenever any of
+        its tags, or those for its view and path, are invalidated. Or None if
+        any of them has no version yet, when the page can't be in the cache.
+
+        versions is as for get_tagged_cache_key().
+        """
+        return get_tagged_cache_key(
+            get_view_key_prefix(), self._get_all_cache_tags(), versions
+        )
+
+    def get_per_request_context(self):
+        """
+        The context for rendering the {% per_request %} templates, in
+        addition to that from the context processors.
+        """
+        return {}
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        if getattr(self, "_render_per_request_placeholders", False):
+            context["per_request_placeholders"] = True
+        return context
+
     def dispatch(self, *args, **kwargs):
         if hasattr(self.request, "user") and self.request.user.is_authenticated:
             # Logged-in, return the page without caching.
             return super().dispatch(*args, **kwargs)
         else:
             # Unauthenticated user; use caching.
-            return cache_page(self.get_cache_timeout())(super().dispatch)(
-                *args, **kwargs
+            return self._dispatch_with_view_cache(*args, **kwargs)
+
+    def _dispatch_with_view_cache(self, *args, **kwargs):
+        """
+        Caches the page separately from the site-wide cache middleware, with
+        a key prefix that changes whenever any of its tags are invalidated.
+        And so that on every request we can check whether it's stale, and add
+        the per-request parts.
+        """
+        timeout = self.get_cache_timeout()
+        stale_timeout = self.get_cache_stale_timeout()
+        cache_timeout = timeout + (stale_timeout or 0)
+        versions = get_cache_tag_versions(self._get_all_cache_tags())
+        key_prefix = self.get_cache_key_prefix(versions)
+        self._render_per_request_placeholders = self.cache_per_request
+        started = time.monotonic()
+
+        def view(*args, **kwargs):
+            started = time.monotonic()
+            self._page_generated = True
+            response = super(CacheMixin, self).dispatch(*args, **kwargs)
+            mark_fresh_until(response, timeout, started)
+            return response
+
+        if getattr(self.request, "hines_cache_refresh", False):
+            # A task is regenerating the page; cache it whatever's in the cache.
+            self.request._cache_update_cache = True
+            response = view(*args, **kwargs)
+            response = self._update_cache(view, response, cache_timeout, versions)
+        elif key_prefix is None:
+            # Nothing can have been cached with tags that have no versions.
+            self.request._cache_update_cache = True
+            response = self._generate_once(view)(*args, **kwargs)
+            response = self._update_cache(view, response, cache_timeout, versions)
+        else:
+            response = cache_page(cache_timeout, key_prefix=key_prefix)(
+                self._generate_once(view)
+            )(*args, **kwargs)
+
+        self._record_cache_metrics(response, started)
+        self._release_page_lock(response)
+
+        if getattr(self.request, "_cache_update_cache", False):
+            # Once it's cached, stop the site-wide cache middleware caching it
+            # too, where it would be served without our checks and changes.
+            on_response_cached(
+                response,
+                lambda: setattr(self.request, "_cache_update_cache", False),
+            )
+        elif stale_timeout:
+            revalidate_if_stale(self.request, response, self.cache_early_expiry_beta)
+
+        if self.cache_per_request:
+            # After it's been cached, so that the cached copy has placeholders.
+            on_response_cached(
+                response,
+                lambda: render_per_request(
+                    response, self.request, self.get_per_request_context()
+                ),
+            )
+        return response
+
+    def _get_all_cache_tags(self):
+        return [*self.get_cache_tags(), *get_page_cache_tags(self.request)]
+
+    def _update_cache(self, view, response, cache_timeout, versions):
+        """
+        Caches response, which was generated without cache_page() looking for
+        it, because it's being refreshed, or because some of its tags had no
+        versions. Those are only given versions if response can be cached.
+        """
+        if not getattr(self.request, "_cache_update_cache", False):
+            return response
+        if not is_cacheable_response(response):
+            return response
+
+        key_prefix = create_tagged_cache_key(
+            get_view_key_prefix(), self._get_all_cache_tags(), versions
+        )
+        if key_prefix is None:
+            # A tag was invalidated while the page was generated.
+            self.request._cache_update_cache = False
+            return response
+
+        return CacheMiddleware(
+            view, page_timeout=cache_timeout, key_prefix=key_prefix
+        ).process_response(self.request, response)
+
+    def _generate_once(self, view):
+        """
+        Wraps view, which is only called when the page isn't in the cache, so
+        that if another request is already generating the page this waits
+        for that to be cached instead. That's then served as a cache hit.
+        """
+
+        def wrapped(*args, **kwargs):
+            lock_prefix = get_view_key_prefix()
+            self._page_lock_key = acquire_page_lock(self.request, lock_prefix)
+            if self._page_lock_key is None:
+                response = wait_for_cached_response(
+                    self.request,
+                    lock_prefix,
+                    page_key_prefix=self.get_cache_key_prefix,
+                )
+                if response is not None:
+                    # It's a hit, so don't cache it again.
+                    self.request._cache_update_cache = False
+                    return response
+            try:
+                return view(*args, **kwargs)
+            except Exception:
+                release_page_lock(self._page_lock_key)
+                raise
+
+        return wrapped
+
+    def _release_page_lock(self, response):
+        lock_key = getattr(self, "_page_lock_key", None)
+        if lock_key is not None:
+            on_response_cached(response, lambda: release_page_lock(lock_key))
+
+    def _record_cache_metrics(self, response, started):
+        """
+        If response was generated for this request, records how long that
+        took, since started, and how big it is.
+
+        Labels it with the view's name and URL name, before it's cached, so
+        that CacheMetricsMiddleware can record hits, however it's served.
+        """
+        if not app_settings.CACHE_METRICS:
+            return
+
+        if getattr(self, "_page_generated", False):
+            view_name = self.__class__.__name__
+            match = self.request.resolver_match
+            url_name = match.view_name if match else ""
+
+            response.hines_cache_metrics = (view_name, url_name)
+            self.request.hines_cache_miss = True
+            on_response_cached(
+                response,
+                lambda: record_cache_miss(
+                    view_name,
+                    url_name,
+                    time.monotonic() - started,
+                    len(response.content),
+                ),
             )
 
 
@@ -113,10 +356,36 @@ def admin_clear_cache(request):
     """
     Clear all of the caches.
 
+    Or, if there are any "prefix", "view" or "tag" GET parameters, only
+    clear the cached pages that match them. See clear_cached_pages().
+
     Copied from django-extensions
     https://github.com/django-extensions/django-extensions/blob/main/django_extensions/management/commands/clear_cache.py
     """
-    if request.user.is_superuser:
+    prefixes = [p for p in request.GET.getlist("prefix") if p]
+    views = [v for v in request.GET.getlist("view") if v]
+    tags = [t for t in request.GET.getlist("tag") if t]
+
+    if not request.user.is_superuser:
+        messages.error(request, "Only superusers allowed.")
+
+    elif prefixes or views or tags:
+        try:
+            uncached = clear_cached_pages(prefixes=prefixes, views=views, tags=tags)
+        except ValueError as err:
+            messages.error(request, str(err))
+        else:
+            for name in uncached:
+                msg = f"No cached pages have {name}, so none were cleared."
+                messages.warning(request, msg)
+            cleared = [n for n in prefixes + views + tags if n not in uncached]
+            if cleared:
+                cleared = ", ".join(cleared)
+                messages.success(
+                    request, f"Cached pages for {cleared} have been cleared."
+                )
+
+    else:
         cache = getattr(settings, "CACHES", {DEFAULT_CACHE_ALIAS: {}}).keys()
 
         for key in cache:
@@ -126,15 +395,51 @@ def admin_clear_cache(request):
                 messages.error(request, f'Cache "{key}" is invalid.')
             else:
                 messages.success(request, f'Cache "{key}" has been cleared.')
-    else:
-        messages.error("Only superusers allowed.")
 
     return HttpResponseRedirect(reverse("admin:index"))
 
 
+@login_required
+def admin_cache_metrics(request):
+    """
+    Shows the cache hits, misses, and generation times and sizes, for each
+    view that uses CacheMixin. And, if the cache is a TwoTierCache, the hits
+    and misses in each of its tiers. Superusers only.
+
+    With ?format=json, returns the same data as JSON.
+    """
+    if not request.user.is_superuser:
+        return HttpResponseForbidden("Only superusers allowed.")
+
+    metrics = get_cache_metrics()
+    tiers = get_cache_tier_stats()
+
+    if request.GET.get("format") == "json":
+        return JsonResponse(
+            {"enabled": app_settings.CACHE_METRICS, "views": metrics, "tiers": tiers}
+        )
+
+    return render(
+        request,
+        "admin/cache_metrics.html",
+        {
+            "title": "Cache metrics",
+            "enabled": app_settings.CACHE_METRICS,
+            "metrics": metrics,
+            "tiers": tiers,
+        },
+    )
+
+
 class HomeView(CacheMixin, TemplateView):
     template_name = "hines_core/home.html"
 
+    cache_timeout = 60 * 60 * 24  # seconds
+    cache_stale_timeout = 60 * 60 * 24  # seconds
+    cache_early_expiry_beta = 1
+
+    cache_tags = ["posts", "photos", "bookmarks"]
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context["sections"] = self.get_recent_items()
@@ -456,7 +761,7 @@ class MTSearchRedirectView(RedirectView):
         return search_str
 
 
-class DayArchiveView(YearMixin, MonthMixin, DayMixin, TemplateView):
+class DayArchiveView(CacheMixin, YearMixin, MonthMixin, DayMixin, TemplateView):
     """
     Trying to keep things a bit consistent with BaseDateListView, except we
     don't have a single QuerySet we're fetching for this date, so we can't
@@ -472,6 +777,19 @@ class DayArchiveView(YearMixin, MonthMixin, DayMixin, TemplateView):
     year_format = "%Y"
     template_name = "hines_core/archive_day.html"
 
+    cache_timeout = 60 * 60 * 24  # seconds
+
+    def get_cache_tags(self):
+        date = _date_from_string(
+            self.get_year(),
+            self.get_year_format(),
+            self.get_month(),
+            self.get_month_format(),
+            self.get_day(),
+            self.get_day_format(),
+        )
+        return [f"day:{date.isoformat()}"]
+
     def get_allow_empty(self):
         """
         Returns ``True`` if the view should display empty lists, and ``False``
@@ -709,7 +1027,7 @@ class PaginatedListView(ListView):
             raise Http404(msg) from err
 
 
-class PhotosHomeView(PaginatedListView):
+class PhotosHomeView(CacheMixin, PaginatedListView):
     """
     We only have a single page showing photos, so doesn't make sense to put
     it in its own app. So here we are.
@@ -720,6 +1038,10 @@ class PhotosHomeView(PaginatedListView):
     # Divisible by four columns:
     paginate_by = 48
 
+    cache_timeout = 60 * 60 * 24  # seconds
+
+    cache_tags = ["photos"]
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
 
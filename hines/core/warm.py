@@ -0,0 +1,106 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import UTC, datetime
+from urllib.parse import urlsplit
+
+from django.contrib.sites.models import Site
+from django.db import connections
+from django.urls import reverse
+
+from hines.core.cache import request_page
+from hines.stats.views import StatsView
+from hines.weblogs.models import Blog
+
+
+def get_warm_cache_urls(sitemaps, *, recent_first=False, limit=None):
+    """
+    Returns a list of the URL paths of pages whose caches we warm: some key
+    list pages, followed by the pages in sitemaps, a dict like the one used
+    for the sitemap views.
+
+    If recent_first is True, the sitemaps' pages are ordered by their
+    lastmod, most recent first, with any that have none first.
+
+    limit is the maximum number of URLs to return.
+    """
+    urls = [reverse("home")]
+    urls.extend(
+        reverse("weblogs:blog_detail", kwargs={"blog_slug": blog.slug})
+        for blog in Blog.objects.all()
+    )
+    urls.extend(
+        reverse("stats:stats_detail", kwargs={"slug": page["slug"]})
+        for page in StatsView.pages
+    )
+
+    site = Site.objects.get_current()
+    sitemap_urls = []
+    for sitemap_class in sitemaps.values():
+        sitemap = sitemap_class()
+        for page in sitemap.paginator.page_range:
+            sitemap_urls.extend(sitemap.get_urls(page=page, site=site))
+
+    if recent_first:
+        # Anything without a lastmod, like the home pages, is sorted first:
+        latest = datetime.max.replace(tzinfo=UTC)
+        sitemap_urls.sort(key=lambda u: _aware(u["lastmod"]) or latest, reverse=True)
+
+    for sitemap_url in sitemap_urls:
+        parts = urlsplit(sitemap_url["location"])
+        urls.append(f"{parts.path}?{parts.query}" if parts.query else parts.path)
+
+    # Remove duplicates, keeping the order:
+    urls = list(dict.fromkeys(urls))
+
+    return urls[:limit] if limit else urls
+
+
+def warm_cache(urls, *, concurrency=4, time_limit=None):
+    """
+    Requests all of urls, a list of URL paths, so that any that weren't
+    already cached are. concurrency is how many are requested at once.
+
+    If time_limit is set, no more URLs are requested after that many
+    seconds.
+
+    Returns a dict of the number of URLs that were "requested", that
+    "failed" (didn't return a 200 response), and that were "skipped"
+    because of the time_limit.
+    """
+    deadline = None if time_limit is None else time.monotonic() + time_limit
+
+    def warm(url):
+        if deadline is not None and time.monotonic() > deadline:
+            return "skipped"
+        response = request_page(url)
+        return "requested" if response.status_code == 200 else "failed"
+
+    def warm_in_thread(url):
+        try:
+            return warm(url)
+        finally:
+            # Each thread has its own database connections:
+            connections.close_all()
+
+    results = {"requested": 0, "failed": 0, "skipped": 0}
+
+    if concurrency == 1:
+        for url in urls:
+            results[warm(url)] += 1
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for result in executor.map(warm_in_thread, urls):
+                results[result] += 1
+
+    return results
+
+
+def _aware(dt):
+    "Sitemaps' lastmods can be dates, or naive or aware datetimes"
+    if dt is None:
+        return None
+    if not isinstance(dt, datetime):
+        dt = datetime(dt.year, dt.month, dt.day)  # noqa: DTZ001
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=UTC)
+    return dt
@@ -1,9 +1,13 @@
+import hashlib
+
 import django_comments
 from django.contrib.contenttypes.models import ContentType
+from django.contrib.contenttypes.prefetch import GenericPrefetch
 from django.contrib.sites.models import Site
 
 from hines.core.feeds import ExtendedFeed, ExtendedRSSFeed
 from hines.core.utils import get_site_url
+from hines.weblogs.models import Post
 
 
 class CommentsFeedRSS(ExtendedFeed):
@@ -22,6 +26,12 @@ class CommentsFeedRSS(ExtendedFeed):
     # Used for the content:encoded element:
     content_template = "comments/feeds/content.html"
 
+    # Fetch the Posts the comments were posted on, and their Blogs (used in
+    # their URLs), all at once:
+    items_prefetch_related = [
+        GenericPrefetch("content_object", [Post.objects.select_related("blog")])
+    ]
+
     # Getting details about the feed/site:
 
     def get_object(self, request):
@@ -49,6 +59,44 @@ class CommentsFeedRSS(ExtendedFeed):
 
         return qs.order_by("-submit_date")[:20]
 
+    def get_items_version(self, obj):
+        """
+        Comments have no time_modified, and they can be edited, moderated or
+        removed, and their Posts' titles changed, without their submit_date
+        changing. So the version is a digest of the fields that the feed
+        shows of each of its comments, and their Posts' time_modified.
+
+        There's no latest time, and so no Last-Modified header, because we
+        can't tell when a comment was last changed.
+        """
+        comments = list(
+            self.items(obj).values_list(
+                "pk",
+                "is_public",
+                "submit_date",
+                "user_name",
+                "comment",
+                "content_type_id",
+                "object_pk",
+            )
+        )
+        post_type_id = ContentType.objects.get_for_model(Post).pk
+        post_pks = {
+            object_pk
+            for *_fields, content_type_id, object_pk in comments
+            if content_type_id == post_type_id
+        }
+        times = list(
+            Post.objects.filter(pk__in=post_pks)
+            .order_by("pk")
+            .values_list("pk", "time_modified")
+        )
+
+        digest = hashlib.md5(
+            repr((comments, times)).encode(), usedforsecurity=False
+        ).hexdigest()
+        return None, digest
+
     # Getting details for each post in the feed:
 
     def item_link(self, item):
@@ -85,11 +133,13 @@ class CommentsFeedRSS(ExtendedFeed):
 
     def _get_parent_object(self, item):
         # Get the object that this CustomComment was posted on:
-        content_type = ContentType.objects.get(pk=item.content_type_id)
-        if not content_type.model_class():
-            msg = f"Content type {item.content_type_id} object has no associated model"
+        obj = item.content_object
+        if obj is None:
+            msg = (
+                f"Content type {item.content_type_id} object {item.object_pk} "
+                "doesn't exist"
+            )
             raise AttributeError(msg)
-        obj = content_type.get_object_for_this_type(pk=item.object_pk)
         return obj
 
 
@@ -13,6 +13,16 @@ class BookmarksFeedRSS(ExtendedFeed):
 
     content_template = "links/feeds/item_content.html"
 
+    items_select_related = ["account"]
+
+    items_prefetch_related = ["tags"]
+
+    feed_url_name = "hines:bookmarks_feed_rss"
+
+    archive_url_name = "hines:bookmarks_feed_rss_archive"
+
+    archive_ordering_field = "post_time"
+
     # Getting details about the feed:
 
     def link(self, obj):
@@ -51,7 +61,11 @@ class BookmarksFeedRSS(ExtendedFeed):
         return item.time_modified
 
     def item_categories(self, item):
-        return [tag.name for tag in item.tags.all()]
+        # Bookmark.tags.all() makes a new query to exclude private tags (which
+        # start with "."), so we use the prefetched tags and do that here:
+        return sorted(
+            tag.name for tag in item.tags.get_queryset() if not tag.name.startswith(".")
+        )
 
     def item_guid(self, item):
         return get_site_url() + item.get_absolute_url()
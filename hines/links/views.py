@@ -4,13 +4,17 @@ from ditto.pinboard.models import Bookmark, BookmarkTag
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.db.models import Count
 
-from hines.core.views import PaginatedListView
+from hines.core.views import CacheMixin, PaginatedListView
 
 
-class HomeView(PaginatedListView):
+class HomeView(CacheMixin, PaginatedListView):
     template_name = "links/home.html"
     queryset = Bookmark.public_objects.all()
 
+    cache_timeout = 60 * 60 * 24  # seconds
+
+    cache_tags = ["bookmarks"]
+
 
 class BookmarkDetailView(pinboard_views.BookmarkDetailView):
     "A single Bookmark"
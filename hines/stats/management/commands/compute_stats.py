@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from hines.stats.snapshots import compute_snapshots, get_chart_names
+
+
+class Command(BaseCommand):
+    """
+    Computes the data for StatsView's charts and saves it as StatsSnapshots,
+    so that the stats pages don't have to.
+    """
+
+    help = "Computes and saves the data for the stats charts"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "charts",
+            nargs="*",
+            help="Names of charts to compute, like books_per_year (default all)",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            default=False,
+            help="Compute charts even if their source data hasn't changed",
+        )
+
+    def handle(self, *args, **options):
+        chart_names = options["charts"] or None
+
+        if chart_names:
+            unknown = set(chart_names) - set(get_chart_names())
+            if unknown:
+                msg = f"Unknown chart(s): {', '.join(sorted(unknown))}"
+                raise CommandError(msg)
+
+        results = compute_snapshots(chart_names, force=options["force"])
+
+        noun = "chart" if len(results["computed"]) == 1 else "charts"
+        self.stdout.write(
+            self.style.SUCCESS(f"{len(results['computed'])} {noun} computed")
+        )
+        if results["skipped"]:
+            self.stdout.write(f"{len(results['skipped'])} unchanged, skipped")
@@ -0,0 +1,30 @@
+# Generated by Django 6.0.7 on 2026-10-18 15:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatsSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('time_created', models.DateTimeField(auto_now_add=True, help_text='The time this item was created in the database.')),
+                ('time_modified', models.DateTimeField(auto_now=True, help_text='The time this item was last saved to the database.')),
+                ('chart_name', models.CharField(help_text="e.g. 'books_per_year'", max_length=100, unique=True)),
+                ('generator', models.CharField(help_text='The name of the Generator class the data came from.', max_length=50)),
+                ('data', models.JSONField(help_text='The dict returned by the Generator.')),
+                ('computed_at', models.DateTimeField(help_text='When the data was computed.')),
+                ('watermark', models.CharField(blank=True, help_text="Describes the state of the source data when this was computed. If the Generator's watermark is still the same, the data needn't be computed again.", max_length=255)),
+            ],
+            options={
+                'ordering': ['chart_name'],
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+from django.db import models
+
+from hines.core.models import TimeStampedModelMixin
+
+
+class StatsSnapshot(TimeStampedModelMixin, models.Model):
+    """
+    The precomputed data for one of StatsView's charts, so that pages can be
+    built without running the Generators every time.
+
+    Filled by the `compute_stats` management command, and by StatsView when
+    a chart doesn't have one yet. See hines.stats.snapshots.
+    """
+
+    chart_name = models.CharField(
+        max_length=100, unique=True, help_text="e.g. 'books_per_year'"
+    )
+
+    generator = models.CharField(
+        max_length=50,
+        help_text="The name of the Generator class the data came from.",
+    )
+
+    data = models.JSONField(help_text="The dict returned by the Generator.")
+
+    computed_at = models.DateTimeField(help_text="When the data was computed.")
+
+    watermark = models.CharField(
+        max_length=255,
+        blank=True,
+        help_text=(
+            "Describes the state of the source data when this was computed. "
+            "If the Generator's watermark is still the same, the data needn't "
+            "be computed again."
+        ),
+    )
+
+    class Meta:
+        ordering = ["chart_name"]
+
+    def __str__(self):
+        return self.chart_name
@@ -0,0 +1,94 @@
+import json
+
+from django.utils import timezone
+
+from hines.core.cache import delete_cache_keys
+
+from .models import StatsSnapshot
+
+
+def get_chart_names():
+    "Returns the names of all the charts on StatsView's pages, in order."
+    from .views import StatsView
+
+    return [chart for page in StatsView.pages for chart in page["charts"]]
+
+
+def compute_snapshots(chart_names=None, *, force=False):
+    """
+    Computes and saves a StatsSnapshot for each of chart_names, or for all
+    the charts if it's None.
+
+    Unless force is True, charts whose Generator's watermark hasn't changed
+    since their snapshot was computed are skipped.
+
+    A chart's cached data is only deleted if its new data is different, so
+    charts without a watermark, like StaticGenerator's, which are computed
+    every time, stay cached until their data changes.
+
+    Returns a dict of the lists of chart names that were "computed" and
+    "skipped".
+    """
+    from .views import StatsView
+
+    if chart_names is None:
+        chart_names = get_chart_names()
+
+    view = StatsView()
+    existing = StatsSnapshot.objects.in_bulk(chart_names, field_name="chart_name")
+    # Each Generator's watermark is only worked out once:
+    watermarks = {}
+
+    results = {"computed": [], "skipped": []}
+    changed = []
+
+    for chart_name in chart_names:
+        generator_class = view.get_chart_generator(chart_name)
+
+        if generator_class not in watermarks:
+            watermarks[generator_class] = generator_class.get_watermark()
+        watermark = watermarks[generator_class]
+
+        snapshot = existing.get(chart_name)
+        if (
+            not force
+            and snapshot is not None
+            and watermark is not None
+            and snapshot.watermark == watermark
+        ):
+            results["skipped"].append(chart_name)
+            continue
+
+        # Round-tripped through JSON, as the snapshot's data was:
+        data = json.loads(json.dumps(view.get_live_data(chart_name)))
+        save_snapshot(chart_name, generator_class, data, watermark)
+        results["computed"].append(chart_name)
+        if snapshot is None or snapshot.data != data:
+            changed.append(chart_name)
+
+    # So that StatsView uses the new snapshots:
+    keys = [view.get_chart_cache_key(name) for name in changed]
+    delete_cache_keys([key for key in keys if key is not None])
+
+    return results
+
+
+def save_snapshot(chart_name, generator_class, data, watermark):
+    "Creates or updates the StatsSnapshot for chart_name."
+    StatsSnapshot.objects.update_or_create(
+        chart_name=chart_name,
+        defaults={
+            "generator": generator_class.__name__,
+            "data": data,
+            "computed_at": timezone.now(),
+            "watermark": watermark or "",
+        },
+    )
+
+
+def expire_snapshots(generator_class):
+    """
+    Deletes the snapshots of all the charts whose data comes from
+    generator_class, so that they're computed again when next needed.
+    """
+    StatsSnapshot.objects.filter(generator=generator_class.__name__).delete()
@@ -0,0 +1,60 @@
+import tomllib
+from pathlib import Path
+
+from hines.core import app_settings
+
+# Where StaticGenerator's data files are, unless HINES_STATS_DATA_DIR is set:
+DEFAULT_DATA_DIR = Path(__file__).resolve().parent / "data"
+
+# Each file's path mapped to its (modified time, data), so that each file is
+# only parsed again when it changes:
+_data_files = {}
+
+
+def get_data_dir():
+    "Returns the Path of the directory StaticGenerator's data files are in."
+    if app_settings.STATS_DATA_DIR:
+        return Path(app_settings.STATS_DATA_DIR)
+    return DEFAULT_DATA_DIR
+
+
+def load_data(name):
+    """
+    Returns the data from the TOML file called name, like "headaches" for
+    headaches.toml, in the stats data directory.
+
+    Each table in the file is a series of yearly values, like:
+
+        [totals]
+        "2001" = 42
+        "2002" = 50
+
+    and is returned as a dict of dicts, with each series sorted by year:
+
+        {"totals": {"2001": 42, "2002": 50}}
+
+    Raises FileNotFoundError if there's no such file.
+    """
+    path = get_data_dir() / f"{name}.toml"
+    mtime = path.stat().st_mtime_ns
+
+    cached = _data_files.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    with path.open("rb") as f:
+        data = {
+            series: dict(sorted(values.items()))
+            for series, values in tomllib.load(f).items()
+        }
+
+    _data_files[path] = (mtime, data)
+    return data
+
+
+def load_series(name, series="totals"):
+    """
+    Returns one series of yearly values, like {"2001": 42, "2002": 50},
+    from the data file called name. See load_data().
+    """
+    return load_data(name)[series]
@@ -12,5 +12,10 @@ urlpatterns = [
     path(
         r"creating/", RedirectView.as_view(pattern_name="stats:home", permanent=False)
     ),
+    path(
+        "data/<slug:chart_name>.json",
+        views.StatsChartDataView.as_view(),
+        name="chart_data",
+    ),
     path("<slug:slug>/", views.StatsView.as_view(), name="stats_detail"),
 ]
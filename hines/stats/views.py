@@ -1,6 +1,29 @@
-from django.http import Http404
-from django.views.generic import TemplateView
-
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from hashlib import md5
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.http import Http404, HttpResponse
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils.cache import (
+    add_never_cache_headers,
+    get_conditional_response,
+    patch_cache_control,
+    quote_etag,
+)
+from django.views.generic import TemplateView, View
+
+from hines.core import app_settings
+from hines.core.cache import (
+    TAG_VERSION_TIMEOUT,
+    create_tagged_cache_key,
+    get_cache_tag_versions,
+    get_tagged_cache_key,
+)
 from hines.core.views import CacheMixin
 
 from .generators import (
@@ -13,6 +36,25 @@ from .generators import (
     TwitterGenerator,
     WeblogGenerator,
 )
+from .models import StatsSnapshot
+from .snapshots import save_snapshot
+
+# The cache key for the data of a single chart, like "books_per_year":
+CHART_CACHE_KEY = "hines_stats_chart:{}"
+
+
+def chart_generator(generator_class):
+    """
+    Decorates a StatsView.get_data_<chart>() method to say which Generator
+    its data comes from, so that StatsView.get_chart_data() caches it for
+    that Generator's cache_timeout and cache_tags.
+    """
+
+    def decorator(method):
+        method.chart_generator = generator_class
+        return method
+
+    return decorator
 
 
 class StatsView(CacheMixin, TemplateView):
@@ -22,9 +64,21 @@ class StatsView(CacheMixin, TemplateView):
 
     # Heavy pages; no need to be up-to-the-minute.
     cache_timeout = 86400  # seconds
+    # And then serve the stale page while it's regenerated:
+    cache_stale_timeout = 86400  # seconds
+    cache_early_expiry_beta = 1
 
     template_name = "stats/stats.html"
 
+    # Data computed by compute_charts(), keyed by chart name.
+    computed_charts = {}
+
+    # Whether any charts on the page will be fetched by its JavaScript.
+    has_pending_charts = False
+
+    # Shared by the threads computing different events charts:
+    _events_counts = None
+
     pages = [
         {
             "slug": "creating",
@@ -92,6 +146,10 @@ class StatsView(CacheMixin, TemplateView):
         },
     ]
 
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._events_counts_lock = threading.Lock()
+
     def get(self, request, *args, **kwargs):
         "Ensure the slug is valid for our pages."
         slug = kwargs.get("slug")
@@ -99,11 +157,31 @@ class StatsView(CacheMixin, TemplateView):
         valid_slugs = [p["slug"] for p in self.pages]
 
         if slug is None or slug in valid_slugs:
-            return super().get(request, *args, **kwargs)
+            response = super().get(request, *args, **kwargs)
         else:
             msg = f"'{slug}' is not a valid slug."
             raise Http404(msg)
 
+        if self.has_pending_charts:
+            # Don't cache the page until all its charts are ready.
+            add_never_cache_headers(response)
+        return response
+
+    def get_cache_tags(self):
+        """
+        The cache_tags of the Generators of the charts on this page, so that
+        it's expired along with their data.
+        """
+        tags = set(super().get_cache_tags())
+        slug = self.kwargs.get("slug")
+        for page in self.pages:
+            if page["slug"] == slug:
+                for chart in page["charts"]:
+                    generator_class = self.get_chart_generator(chart)
+                    if generator_class is not None:
+                        tags.update(generator_class.cache_tags)
+        return sorted(tags)
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
 
@@ -117,113 +195,343 @@ class StatsView(CacheMixin, TemplateView):
                 context["current_page"] = page
                 break
 
-        # Get the data for all of the charts on this page.
+        # Get the data for the charts on this page that's already been
+        # computed. If HINES_STATS_CHART_WORKERS is set, the others are
+        # computed now, at the same time. Any that still aren't ready are
+        # fetched from StatsChartDataView by the page's JavaScript, so that
+        # they don't hold up the page, which isn't cached until they're ready.
+        charts = {
+            chart: self.get_chart_data(chart, compute=False)
+            for chart in context["current_page"]["charts"]
+        }
+        missing = [chart for chart, data in charts.items() if data is None]
+
+        if missing and app_settings.STATS_CHART_WORKERS:
+            self.computed_charts = self.compute_charts(missing)
+            for chart in self.computed_charts:
+                # Saves and caches the computed data:
+                charts[chart] = self.get_chart_data(chart)
+
         context["charts"] = []
-        for chart in context["current_page"]["charts"]:
-            context["charts"].append(self.get_chart_data(chart))
+        for chart, chart_data in charts.items():
+            if chart_data is None:
+                self.has_pending_charts = True
+                chart_data = {
+                    "name": chart,
+                    "pending": True,
+                    "url": reverse("stats:chart_data", kwargs={"chart_name": chart}),
+                }
+            context["charts"].append(chart_data)
 
         return context
 
-    def get_chart_data(self, chart_name):
+    def compute_charts(self, chart_names):
+        """
+        Computes the live data for all of chart_names at the same time, in
+        up to HINES_STATS_CHART_WORKERS threads, each with its own database
+        connection.
+
+        Returns a dict of chart names and their data, for the charts that
+        finished within HINES_STATS_CHART_TIMEOUT seconds. Any others carry
+        on in their threads, but their data isn't used.
+        """
+        executor = ThreadPoolExecutor(
+            max_workers=min(app_settings.STATS_CHART_WORKERS, len(chart_names)),
+            thread_name_prefix="stats-chart",
+        )
+        futures = {
+            executor.submit(self._compute_chart, chart_name): chart_name
+            for chart_name in chart_names
+        }
+        done, _not_done = wait(futures, timeout=app_settings.STATS_CHART_TIMEOUT)
+        # Don't wait for any that timed out, or start any still queued:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+        return {
+            futures[future]: future.result() for future in futures if future in done
+        }
+
+    def _compute_chart(self, chart_name):
+        "Run in a thread by compute_charts()."
+        try:
+            return self.get_live_data(chart_name)
+        finally:
+            # Django only closes the request thread's connections itself:
+            connections.close_all()
+
+    def get_chart_data(self, chart_name, *, compute=True):
         """
         Passed a chart_name (like 'books_per_year') it returns a dict of
         data for its chart, including:
             'title'
             'description'
             'data' - A list of data for the chart
+
+        If compute is False, and the data isn't in the cache or a snapshot,
+        returns None.
         """
+        data = self.get_cached_data(chart_name, compute=compute)
+        if data is None:
+            return None
+
         chart_data = {
             "name": chart_name,
         }
 
-        data_method = getattr(self, f"get_data_{chart_name}")
-
-        chart_data.update(data_method())
+        chart_data.update(data)
 
         return chart_data
 
+    def get_cached_data(self, chart_name, *, compute=True):
+        """
+        Returns the data for chart_name, from the cache if possible. Each
+        chart is cached separately, according to its Generator, so one page's
+        charts can be reused on another, and a chart whose data has changed
+        doesn't mean recalculating the others.
+
+        If compute is False, and the data isn't in the cache or a snapshot,
+        returns None.
+        """
+        generator_class = self.get_chart_generator(chart_name)
+
+        if generator_class is None:
+            return self.get_live_data(chart_name) if compute else None
+
+        tags = generator_class.cache_tags
+        versions = get_cache_tag_versions(tags)
+        key = self.get_chart_cache_key(chart_name, versions)
+        data = None if key is None else cache.get(key)
+        if data is None:
+            data = self.get_snapshot_data(chart_name, generator_class, compute=compute)
+            if data is None:
+                return None
+            key = create_tagged_cache_key(
+                CHART_CACHE_KEY.format(chart_name), tags, versions
+            )
+            if key is not None:
+                timeout = generator_class.cache_timeout
+                if tags:
+                    # It can't be found once its tags' versions have gone:
+                    timeout = min(timeout or TAG_VERSION_TIMEOUT, TAG_VERSION_TIMEOUT)
+                cache.set(key, data, timeout)
+
+        return data
+
+    def get_chart_cache_key(self, chart_name, versions=None):
+        """
+        Returns the key chart_name's data is cached at, which changes when
+        any of its Generator's cache_tags are invalidated. Or None if any of
+        them has no version, when it can't be cached.
+
+        versions is as for get_tagged_cache_key().
+        """
+        generator_class = self.get_chart_generator(chart_name)
+        tags = generator_class.cache_tags if generator_class else []
+        return get_tagged_cache_key(CHART_CACHE_KEY.format(chart_name), tags, versions)
+
+    def get_snapshot_data(self, chart_name, generator_class, *, compute=True):
+        """
+        Returns the data from chart_name's StatsSnapshot. If there isn't one
+        it's computed now, and saved for next time, unless compute is False,
+        when it returns None.
+        """
+        data = (
+            StatsSnapshot.objects.filter(chart_name=chart_name)
+            .values_list("data", flat=True)
+            .first()
+        )
+        if data is None and compute:
+            data = self.get_live_data(chart_name)
+            save_snapshot(
+                chart_name, generator_class, data, generator_class.get_watermark()
+            )
+        return data
+
+    def get_live_data(self, chart_name):
+        """
+        Computes the data for chart_name by calling get_data_<chart_name>(),
+        unless compute_charts() has already done so.
+        """
+        if chart_name in self.computed_charts:
+            return self.computed_charts[chart_name]
+        return getattr(self, f"get_data_{chart_name}")()
+
+    @property
+    def events_counts(self):
+        "Shared by all the EventsGenerators, so that they only make one query."
+        with self._events_counts_lock:
+            if self._events_counts is None:
+                self._events_counts = EventsGenerator.get_counts()
+        return self._events_counts
+
+    def get_chart_generator(self, chart_name):
+        "Returns the Generator class that chart_name's data comes from, if any."
+        data_method = getattr(self, f"get_data_{chart_name}")
+        return getattr(data_method, "chart_generator", None)
+
+    @chart_generator(StaticGenerator)
     def get_data_music_spending_per_year(self):
         return StaticGenerator().get_music_spending_per_year()
 
+    @chart_generator(StaticGenerator)
     def get_data_cash_withdrawals_per_year(self):
         return StaticGenerator().get_cash_withdrawals_per_year()
 
+    @chart_generator(StaticGenerator)
     def get_data_amazon_spending_per_year(self):
         return StaticGenerator().get_amazon_spending_per_year()
 
+    @chart_generator(ReadingGenerator)
     def get_data_books_per_year(self):
         return ReadingGenerator(kind="book").get_per_year()
 
+    @chart_generator(ReadingGenerator)
     def get_data_periodicals_per_year(self):
         return ReadingGenerator(kind="periodical").get_per_year()
 
+    @chart_generator(StaticGenerator)
     def get_data_headaches_per_year(self):
         return StaticGenerator().get_headaches_per_year()
 
+    @chart_generator(StaticGenerator)
     def get_data_steps_per_year(self):
         return StaticGenerator().get_steps_per_year()
 
+    @chart_generator(StaticGenerator)
     def get_data_days_worked_per_year(self):
         return StaticGenerator().get_days_worked_per_year()
 
+    @chart_generator(EventsGenerator)
     def get_data_events_per_year(self):
-        return EventsGenerator(kind="all").get_per_year()
+        return EventsGenerator(kind="all", counts=self.events_counts).get_per_year()
 
+    @chart_generator(EventsGenerator)
     def get_data_movies_per_year(self):
-        return EventsGenerator(kind="cinema").get_per_year()
+        return EventsGenerator(kind="cinema", counts=self.events_counts).get_per_year()
 
+    @chart_generator(EventsGenerator)
     def get_data_concerts_per_year(self):
-        return EventsGenerator(kind="concert").get_per_year()
+        return EventsGenerator(kind="concert", counts=self.events_counts).get_per_year()
 
+    @chart_generator(EventsGenerator)
     def get_data_comedy_per_year(self):
-        return EventsGenerator(kind="comedy").get_per_year()
+        return EventsGenerator(kind="comedy", counts=self.events_counts).get_per_year()
 
+    @chart_generator(EventsGenerator)
     def get_data_dance_per_year(self):
-        return EventsGenerator(kind="dance").get_per_year()
+        return EventsGenerator(kind="dance", counts=self.events_counts).get_per_year()
 
+    @chart_generator(EventsGenerator)
     def get_data_museums_per_year(self):
-        return EventsGenerator(kind="museum").get_per_year()
+        return EventsGenerator(kind="museum", counts=self.events_counts).get_per_year()
 
+    @chart_generator(EventsGenerator)
     def get_data_gigs_per_year(self):
-        return EventsGenerator(kind="gig").get_per_year()
+        return EventsGenerator(kind="gig", counts=self.events_counts).get_per_year()
 
+    @chart_generator(EventsGenerator)
     def get_data_theatres_per_year(self):
-        return EventsGenerator(kind="theatre").get_per_year()
+        return EventsGenerator(kind="theatre", counts=self.events_counts).get_per_year()
 
+    @chart_generator(EventsGenerator)
     def get_data_misc_events_per_year(self):
-        return EventsGenerator(kind="misc").get_per_year()
+        return EventsGenerator(kind="misc", counts=self.events_counts).get_per_year()
 
+    @chart_generator(WeblogGenerator)
     def get_data_writing_per_year(self):
         return WeblogGenerator(blog_slug="writing").get_posts_per_year()
 
+    @chart_generator(StaticGenerator)
     def get_data_github_contributions_per_year(self):
         return StaticGenerator().get_github_contributions_per_year()
 
+    @chart_generator(StaticGenerator)
     def get_data_diary_words_per_year(self):
         return StaticGenerator().get_diary_words_per_year()
 
+    @chart_generator(StaticGenerator)
     def get_data_emails_received_per_year(self):
         return StaticGenerator().get_emails_received_per_year()
 
+    @chart_generator(FlickrGenerator)
     def get_data_flickr_photos_per_year(self):
         return FlickrGenerator(nsid="35034346050@N01").get_photos_per_year()
 
+    @chart_generator(StaticGenerator)
     def get_data_social_media_posts_per_year(self):
         return StaticGenerator().get_social_media_posts_per_year()
 
+    # @chart_generator(StaticGenerator)
     # def get_data_mastodon_posts_per_year(self):
     #     return StaticGenerator().get_mastodon_posts_per_year()
 
+    # @chart_generator(TwitterGenerator)
     # def get_data_twitter_tweets_per_year(self):
     #     return TwitterGenerator(screen_name="philgyford").get_tweets_per_year()
 
+    @chart_generator(TwitterGenerator)
     def get_data_twitter_favorites_per_year(self):
         return TwitterGenerator(screen_name="philgyford").get_favorites_per_year()
 
+    @chart_generator(PinboardGenerator)
     def get_data_pinboard_bookmarks_per_year(self):
         return PinboardGenerator(username="philgyford").get_bookmarks_per_year()
 
+    @chart_generator(LastfmGenerator)
     def get_data_lastfm_scrobbles_per_year(self):
         return LastfmGenerator(username="gyford").get_scrobbles_per_year(
             start_year=2006
         )
+
+
+class StatsChartDataView(View):
+    """
+    Returns the data for one of StatsView's charts as JSON, along with its
+    rendered HTML, for the stats pages to fetch charts whose data wasn't
+    ready when the page was built.
+
+    Has an ETag, so that browsers can revalidate it cheaply, and is cached
+    by browsers for as long as its Generator's cache_timeout, up to a day.
+    """
+
+    # Seconds browsers can use the JSON for, at most:
+    max_age = 86400
+
+    def get(self, request, *args, **kwargs):
+        chart_name = kwargs.get("chart_name")
+
+        charts = [chart for page in StatsView.pages for chart in page["charts"]]
+        if chart_name not in charts:
+            msg = f"'{chart_name}' is not a valid chart."
+            raise Http404(msg)
+
+        view = StatsView()
+        chart = view.get_chart_data(chart_name)
+        chart["html"] = render_to_string(
+            "stats/includes/chart.html", {"chart": chart}, request=request
+        )
+        content = json.dumps(chart, cls=DjangoJSONEncoder)
+
+        etag = quote_etag(md5(content.encode(), usedforsecurity=False).hexdigest())
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = HttpResponse(content, content_type="application/json")
+            response.headers["ETag"] = etag
+
+        # private, so that the site-wide cache middleware doesn't cache it,
+        # and we can compare ETags using the chart's own cached data.
+        patch_cache_control(
+            response,
+            private=True,
+            max_age=self.get_max_age(view.get_chart_generator(chart_name)),
+        )
+        return response
+
+    def get_max_age(self, generator_class):
+        """
+        Charts whose data changes when something's saved, rather than after
+        a time, are always revalidated.
+        """
+        if generator_class is None or generator_class.cache_tags:
+            return 0
+        return min(generator_class.cache_timeout or self.max_age, self.max_age)
@@ -1,6 +1,6 @@
 from hines.core.feeds import ExtendedFeed, ExtendedRSSFeed
 
-from .models import Blog
+from .models import Blog, get_comments_closed_time
 
 
 class BlogPostsFeedRSS(ExtendedFeed):
@@ -8,11 +8,22 @@ class BlogPostsFeedRSS(ExtendedFeed):
 
     feed_type = ExtendedRSSFeed
 
+    items_select_related = ["author", "blog"]
+
+    items_prefetch_related = ["tags"]
+
+    feed_url_name = "weblogs:blog_feed_posts_rss"
+
+    archive_url_name = "weblogs:blog_feed_posts_rss_archive"
+
     # Getting details about the blog:
 
     def get_object(self, request, blog_slug):
         return Blog.objects.get(slug=blog_slug)
 
+    def get_feed_url_kwargs(self, obj):
+        return {"blog_slug": obj.slug}
+
     def link(self, obj):
         return obj.get_absolute_url()
 
@@ -28,6 +39,19 @@ class BlogPostsFeedRSS(ExtendedFeed):
     def items(self, obj):
         return obj.public_posts[: self.num_items]
 
+    def get_items_version(self, obj):
+        """
+        The Blog's details, and whether comments are open on each Post, are
+        also in the feed, and can change without any Post changing.
+        """
+        version = super().get_items_version(obj)
+        if version is None:
+            return None
+
+        latest, count = version
+        times = [latest, obj.time_modified, get_comments_closed_time(obj.public_posts)]
+        return max((t for t in times if t is not None), default=None), count
+
     # Getting details for each post in the feed:
 
     def item_description(self, item):
@@ -52,6 +76,10 @@ class BlogPostsFeedRSS(ExtendedFeed):
     def item_categories(self, item):
         return [tag.name for tag in item.tags.all()]
 
+    def item_content_cache_key_parts(self, item):
+        # Whether comments are allowed can change without the Post changing:
+        return (*super().item_content_cache_key_parts(item), item.comments_allowed)
+
     def item_content(self, item):
         "For content:encoded"
         content = item.intro_html + item.body_html
@@ -1,4 +1,5 @@
 from django.core.management.base import BaseCommand
+from django.db import transaction
 
 from hines.core.utils import datetime_now
 from hines.weblogs.models import Post
@@ -15,10 +16,12 @@ class Command(BaseCommand):
         num_posts = posts.count()
 
         if num_posts > 0:
-            for post in posts:
-                post.status = Post.Status.LIVE
-                post.time_published = datetime_now()
-                post.save()
+            # So that the cached pages they affect are expired in one batch.
+            with transaction.atomic():
+                for post in posts:
+                    post.status = Post.Status.LIVE
+                    post.time_published = datetime_now()
+                    post.save()
 
             noun = "Post" if num_posts == 1 else "Posts"
 
@@ -0,0 +1,17 @@
+# Generated by Django 6.0.7 on 2026-10-18 15:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weblogs', '0030_remove_post_allow_outgoing_webmentions'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['blog', 'status', 'time_published', 'id'], name='weblogs_post_archive_idx'),
+        ),
+    ]
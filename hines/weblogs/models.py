@@ -8,7 +8,7 @@ from bs4 import BeautifulSoup
 from django.conf import settings
 from django.contrib import messages
 from django.db import models
-from django.db.models import Count
+from django.db.models import Count, Max
 from django.template.defaultfilters import linebreaks
 from django.urls import reverse
 from django.utils import timezone
@@ -20,7 +20,6 @@ from taggit.models import Tag, TaggedItemBase
 from hines.core import app_settings
 from hines.core.models import TimeStampedModelMixin
 from hines.core.utils import (
-    expire_view_cache,
     get_site_url,
     markdownify,
     truncate_string,
@@ -259,6 +258,13 @@ class Post(TimeStampedModelMixin, models.Model):
 
     class Meta:
         ordering = ["-time_published", "-time_created"]
+        indexes = [
+            # For getting pages of public Posts for feed archives
+            models.Index(
+                fields=["blog", "status", "time_published", "id"],
+                name="weblogs_post_archive_idx",
+            )
+        ]
 
     def __str__(self):
         return self.title
@@ -271,15 +277,6 @@ class Post(TimeStampedModelMixin, models.Model):
 
         super().save(*args, **kwargs)
 
-        # Expire old detail page, home page, and blog home page.
-        # Assumes the things used to generate the absolute_url haven't changed.
-        expire_view_cache(reverse("home"))
-        expire_view_cache(
-            reverse("weblogs:blog_detail", kwargs={"blog_slug": self.blog.slug})
-        )
-        if self.time_published is not None:
-            expire_view_cache(self.get_absolute_url())
-
     def get_absolute_url(self):
         return reverse(
             "weblogs:post_detail",
@@ -518,6 +515,27 @@ class Post(TimeStampedModelMixin, models.Model):
             return self.comments_are_open
 
 
+def get_comments_closed_time(posts):
+    """
+    Returns the most recent time that comments closed on any of the Posts in
+    the QuerySet posts, because they became older than
+    COMMENTS_CLOSE_AFTER_DAYS. See Post.comments_are_open.
+
+    Returns None if that setting is None, or no Posts are that old.
+    """
+    cutoff_days = app_settings.COMMENTS_CLOSE_AFTER_DAYS
+    if cutoff_days is None:
+        return None
+
+    cutoff = timedelta(days=cutoff_days)
+    latest = (
+        posts.filter(time_published__lt=timezone.now() - cutoff)
+        .order_by()
+        .aggregate(latest=Max("time_published"))["latest"]
+    )
+    return None if latest is None else latest + cutoff
+
+
 class PostCommentModerator(CommentModerator):
     """
     In addition to what we do in Post.comments_allowed, this should also
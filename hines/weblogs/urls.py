@@ -48,6 +48,11 @@ urlpatterns = [
         feeds.BlogPostsFeedRSS(),
         name="blog_feed_posts_rss",
     ),
+    path(
+        "<slug:blog_slug>/feeds/posts/rss/archive/<feedcursor:cursor>/",
+        feeds.BlogPostsFeedRSS(),
+        name="blog_feed_posts_rss_archive",
+    ),
     path(
         "<slug:blog_slug>/tags/", views.BlogTagListView.as_view(), name="blog_tag_list"
     ),
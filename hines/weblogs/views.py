@@ -78,6 +78,18 @@ class AllImagesView(TemplateView):
         return context
 
 
+class BlogCacheMixin(CacheMixin):
+    """
+    For cached views that only list Posts from the Blog defined by the
+    `blog_slug` URL kwarg, so they're expired when any of its Posts change.
+    """
+
+    cache_timeout = 60 * 60 * 24  # seconds
+
+    def get_cache_tags(self):
+        return [f"blog:{self.kwargs['blog_slug']}"]
+
+
 class BlogDetailParentView(SingleObjectMixin, PaginatedListView):
     """
     A parent class for all views that will list Posts from a Blog.
@@ -99,7 +111,7 @@ class BlogDetailParentView(SingleObjectMixin, PaginatedListView):
         return context
 
 
-class BlogDetailView(CacheMixin, BlogDetailParentView):
+class BlogDetailView(BlogCacheMixin, BlogDetailParentView):
     "Front page of a Blog, listing its recent Posts."
 
     template_name = "weblogs/blog_detail.html"
@@ -108,7 +120,7 @@ class BlogDetailView(CacheMixin, BlogDetailParentView):
         return self.object.public_posts.all().select_related("blog")
 
 
-class BlogArchiveView(CacheMixin, DetailView):
+class BlogArchiveView(BlogCacheMixin, DetailView):
     "List of all the months in which there are posts."
 
     template_name = "weblogs/blog_archive.html"
@@ -124,7 +136,7 @@ class BlogArchiveView(CacheMixin, DetailView):
         return self.object.public_posts.dates("time_created", "month")
 
 
-class BlogTagDetailView(CacheMixin, BlogDetailParentView):
+class BlogTagDetailView(BlogCacheMixin, BlogDetailParentView):
     "Listing Posts with a particular Tag (by 'tag_slug') in a Blog."
 
     template_name = "weblogs/blog_tag_detail.html"
@@ -140,7 +152,7 @@ class BlogTagDetailView(CacheMixin, BlogDetailParentView):
         )
 
 
-class BlogTagListView(CacheMixin, DetailView):
+class BlogTagListView(BlogCacheMixin, DetailView):
     "Listing the most popular Tags in a Blog."
 
     model = Blog
@@ -153,15 +165,17 @@ class BlogTagListView(CacheMixin, DetailView):
         return context
 
 
-class PostDetailView(TemplateSetMixin, DateDetailView):
+class PostDetailView(BlogCacheMixin, TemplateSetMixin, DateDetailView):
     """
     A bit complicated because we need to match the post using its slug,
     its date, and its weblog slug.
 
-    Removed CacheMixin because it was screwing up the CSRF token
-    for the comment form.
+    The comment form, with its CSRF token, and any messages are rendered
+    for each request, rather than cached with the rest of the page.
     """
 
+    cache_per_request = True
+
     # True, because we want to be able to preview scheduled posts:
     allow_future = True
     date_field = "time_published"
@@ -175,6 +189,13 @@ class PostDetailView(TemplateSetMixin, DateDetailView):
     # Not a standard field, but we'll store the date here.
     date = None
 
+    def get_per_request_context(self):
+        "For rendering the comment form, per request. See CacheMixin."
+        post = getattr(self, "object", None)
+        if post is None:
+            post = self.get_object(self.get_queryset().select_related("blog"))
+        return {"post": post}
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         if self.object:
@@ -334,12 +355,12 @@ class PostDayArchiveView(RedirectView):
         )
 
 
-class PostMonthArchiveView(CacheMixin, PostDatedArchiveMixin, MonthArchiveView):
+class PostMonthArchiveView(BlogCacheMixin, PostDatedArchiveMixin, MonthArchiveView):
     month_format = "%m"
     template_name = "weblogs/post_archive_month.html"
 
 
-class PostYearArchiveView(CacheMixin, PostDatedArchiveMixin, YearArchiveView):
+class PostYearArchiveView(BlogCacheMixin, PostDatedArchiveMixin, YearArchiveView):
     year_format = "%Y"
     make_object_list = True
     template_name = "weblogs/post_archive_year.html"
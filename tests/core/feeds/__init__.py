@@ -1,7 +1,9 @@
 from xml.dom import minidom
 
 from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
 
 class FeedTestCase(TestCase):
@@ -40,6 +42,16 @@ class FeedTestCase(TestCase):
 
         return chan
 
+    def get_num_queries(self, url):
+        """
+        Returns the number of database queries made when fetching url.
+        Fetches it once first, so things like the current Site are cached.
+        """
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(url)
+        return len(context.captured_queries)
+
     def assertChildNodes(self, elem, expected):  # noqa: N802
         actual = set(n.nodeName for n in elem.childNodes)
         expected = set(expected)
@@ -1,7 +1,11 @@
+from datetime import timedelta
 from unittest.mock import patch
 
+from ditto.pinboard.factories import AccountFactory, BookmarkFactory
 from django.contrib.sites.models import Site
+from django.utils import timezone
 from django.utils.feedgenerator import rfc2822_date
+from freezegun import freeze_time
 
 from hines.core.utils import make_datetime
 from hines.users.factories import UserFactory
@@ -23,7 +27,7 @@ class EverythingFeedTestCase(FeedTestCase):
         user = UserFactory(
             first_name="Bob", last_name="Ferris", email="bob@example.org"
         )
-        blog = BlogFactory(
+        self.blog = BlogFactory(
             name="My Blog", slug="my-blog", show_author_email_in_feed=True
         )
         LivePostFactory(
@@ -33,7 +37,7 @@ class EverythingFeedTestCase(FeedTestCase):
             intro="The post intro.",
             body="This is the post <b>body</b>.\n\nOK?",
             author=user,
-            blog=blog,
+            blog=self.blog,
             time_published=make_datetime("2017-04-25 16:00:00"),
         )
 
@@ -81,3 +85,60 @@ class EverythingFeedTestCase(FeedTestCase):
             content,
             '<p><em>From <a href="http://example.com/terry/my-blog/">My Blog</a>.</em></p><p>The post intro.</p><p>This is the post <b>body</b>.</p><p>OK?</p><hr><p><a href="http://example.com/terry/my-blog/2017/04/25/my-blog-post/#comments">Read comments or post one</a></p>\n',  # noqa: E501
         )
+
+    @override_app_settings(
+        EVERYTHING_FEED_KINDS=(
+            ("blog_posts", "my-blog"),
+            ("pinboard_bookmarks", "bob"),
+        )
+    )
+    def test_num_queries(self):
+        "The number of queries shouldn't depend on the number of items."
+        account = AccountFactory(username="bob")
+        BookmarkFactory(account=account)
+        url = "/terry/feeds/everything/rss/"
+
+        num_queries = self.get_num_queries(url)
+
+        LivePostFactory.create_batch(3, blog=self.blog)
+        BookmarkFactory.create_batch(3, account=account)
+
+        self.assertEqual(self.get_num_queries(url), num_queries)
+
+    @override_app_settings(
+        EVERYTHING_FEED_KINDS=(
+            ("blog_posts", "my-blog"),
+            ("pinboard_bookmarks", "bob"),
+        )
+    )
+    def test_etag(self):
+        "It should return a 304 until any of the kinds' objects change."
+        account = AccountFactory(username="bob")
+        bookmark = BookmarkFactory(account=account)
+        url = "/terry/feeds/everything/rss/"
+
+        etag = self.client.get(url).headers["ETag"]
+
+        response = self.client.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+
+        bookmark.title = "A new title"
+        bookmark.save()
+
+        response = self.client.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+
+    @override_app_settings(EVERYTHING_FEED_KINDS=(("blog_posts", "my-blog"),))
+    def test_etag_changes_when_blog_changes(self):
+        "The Blog's name is in the Posts' content, so should change the ETag"
+        url = "/terry/feeds/everything/rss/"
+        etag = self.client.get(url).headers["ETag"]
+
+        with freeze_time(timezone.now() + timedelta(minutes=1)):
+            self.blog.name = "New Blog Name"
+            self.blog.save()
+
+            response = self.client.get(url, headers={"If-None-Match": etag})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("New Blog Name", response.content.decode())
@@ -0,0 +1,141 @@
+import tempfile
+from io import StringIO
+from pathlib import Path
+from unittest.mock import patch
+
+from django.contrib.sites.models import Site
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import override_settings
+from django.utils.http import http_date
+
+from hines.core import app_settings
+from hines.core.feeds.files import generate_feed_files, get_feed_file_path
+from hines.weblogs.factories import BlogFactory, LivePostFactory
+
+from . import FeedTestCase
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class FeedFilesTestCase(FeedTestCase):
+    feed_url = "/terry/my-blog/feeds/posts/rss/"
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(cache.clear)
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.root = Path(tmp_dir.name)
+
+        for name, value in (
+            ("FEED_FILES_ROOT", tmp_dir.name),
+            ("EVERYTHING_FEED_KINDS", (("blog_posts", "my-blog"),)),
+        ):
+            patcher = patch.object(app_settings, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        site = Site.objects.get()
+        site.domain = "example.com"
+        site.save()
+
+        self.blog = BlogFactory(slug="my-blog")
+        LivePostFactory(blog=self.blog, title="My post")
+
+    def test_generates_files(self):
+        paths = generate_feed_files()
+
+        self.assertEqual(len(paths), 4)
+        self.assertIn(self.root / "terry/my-blog/feeds/posts/rss/index.xml", paths)
+        self.assertIn(self.root / "terry/feeds/links/rss/index.xml", paths)
+
+        content = get_feed_file_path(self.feed_url).read_text()
+        self.assertIn("<title>My post</title>", content)
+        self.assertIn("http://example.com/terry/my-blog/", content)
+
+    def test_deletes_old_files(self):
+        "Files for feeds that no longer exist should be deleted"
+        other_blog = BlogFactory(slug="other-blog")
+        generate_feed_files()
+        old_path = get_feed_file_path("/terry/other-blog/feeds/posts/rss/")
+        self.assertTrue(old_path.exists())
+
+        other_blog.delete()
+        generate_feed_files()
+
+        self.assertFalse(old_path.exists())
+
+    def test_only_deletes_own_files(self):
+        "Files that generate_feed_files() didn't save shouldn't be deleted"
+        other_path = self.root / "terry/other/index.xml"
+        other_path.parent.mkdir(parents=True)
+        other_path.write_text("<rss></rss>")
+
+        generate_feed_files()
+
+        self.assertTrue(other_path.exists())
+
+    def test_serves_file(self):
+        "Once generated, the feed should be the file, not built from the DB"
+        generate_feed_files()
+        get_feed_file_path(self.feed_url).write_text("<rss></rss>")
+
+        response = self.client.get(self.feed_url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), b"<rss></rss>")
+
+    def test_serves_304(self):
+        generate_feed_files()
+        mtime = get_feed_file_path(self.feed_url).stat().st_mtime
+
+        response = self.client.get(
+            self.feed_url, headers={"If-Modified-Since": http_date(mtime)}
+        )
+
+        self.assertEqual(response.status_code, 304)
+
+    def test_saving_post_generates_files(self):
+        with (
+            patch("hines.core.feeds.files.async_task") as async_task,
+            self.captureOnCommitCallbacks(execute=True),
+        ):
+            LivePostFactory(blog=self.blog)
+
+        async_task.assert_called_with("hines.core.tasks.generate_feed_files")
+
+    def test_saving_posts_generates_files_once(self):
+        "Only one task should be queued until it runs"
+        with (
+            patch("hines.core.feeds.files.async_task") as async_task,
+            self.captureOnCommitCallbacks(execute=True),
+        ):
+            LivePostFactory.create_batch(3, blog=self.blog)
+
+        self.assertEqual(async_task.call_count, 1)
+
+        generate_feed_files()
+
+        with (
+            patch("hines.core.feeds.files.async_task") as async_task,
+            self.captureOnCommitCallbacks(execute=True),
+        ):
+            LivePostFactory(blog=self.blog)
+
+        self.assertEqual(async_task.call_count, 1)
+
+    def test_command(self):
+        out = StringIO()
+        call_command("generate_feed_files", stdout=out)
+        self.assertIn("4 feed files saved", out.getvalue())
+
+
+class GenerateFeedFilesCommandTestCase(FeedTestCase):
+    def test_error_if_no_root(self):
+        with (
+            patch.object(app_settings, "FEED_FILES_ROOT", ""),
+            self.assertRaises(CommandError),
+        ):
+            call_command("generate_feed_files")
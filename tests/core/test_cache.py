@@ -0,0 +1,563 @@
+import contextlib
+import math
+import threading
+import time
+from io import StringIO
+from unittest.mock import patch
+
+from ditto.pinboard.factories import BookmarkFactory
+from ditto.pinboard.models import Bookmark
+from django.contrib.sites.models import Site
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import resolve
+
+from hines.core.cache import (
+    PAGE_LOCK_WAIT,
+    PAGE_TAG,
+    TAG_VERSION_CACHE_KEY,
+    TAG_VERSION_TIMEOUT,
+    acquire_page_lock,
+    clear_cached_pages,
+    create_tagged_cache_key,
+    delete_cache_keys,
+    get_cache_tag_versions,
+    get_page_cache_tags,
+    get_tagged_cache_key,
+    get_view_key_prefix,
+    invalidate_cache_tags,
+    release_page_lock,
+    revalidate_if_stale,
+    wait_for_cached_response,
+)
+from hines.core.cache_metrics import get_cache_metrics, get_cached_views
+from hines.core.utils import make_datetime
+from hines.core.views import HomeView
+from hines.users.factories import UserFactory
+from hines.weblogs.factories import BlogFactory, LivePostFactory, TrackbackFactory
+from hines.weblogs.models import Post
+from tests import override_app_settings
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class CacheTagsTestCase(TestCase):
+    def setUp(self):
+        self.blog = BlogFactory(slug="my-blog")
+        self.post = LivePostFactory(
+            blog=self.blog,
+            title="Old title",
+            time_published=make_datetime("2016-08-31 12:00:00"),
+        )
+
+    def tearDown(self):
+        super().tearDown()
+        cache.clear()
+
+    def test_page_is_cached(self):
+        "Changing a Post without sending signals shouldn't change the page"
+        self.client.get("/terry/my-blog/")
+
+        Post.objects.filter(pk=self.post.pk).update(title="New title")
+
+        response = self.client.get("/terry/my-blog/")
+        self.assertContains(response, "Old title")
+
+    def test_saving_post_expires_pages(self):
+        "All the pages tagged with the Post's Blog should be expired"
+        self.client.get("/terry/my-blog/")
+        self.client.get("/terry/my-blog/2016/")
+
+        self.post.title = "New title"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.save()
+
+        self.assertContains(self.client.get("/terry/my-blog/"), "New title")
+        self.assertContains(self.client.get("/terry/my-blog/2016/"), "New title")
+
+    def test_saving_other_post_does_not_expire_page(self):
+        "Saving a Post in another Blog shouldn't expire this Blog's pages"
+        self.client.get("/terry/my-blog/")
+
+        Post.objects.filter(pk=self.post.pk).update(title="New title")
+        LivePostFactory(blog=BlogFactory(slug="other-blog"))
+
+        self.assertContains(self.client.get("/terry/my-blog/"), "Old title")
+
+    def test_saving_bookmark_expires_day(self):
+        bookmark = BookmarkFactory(
+            title="Old link", post_time=make_datetime("2016-08-31 12:00:00")
+        )
+        self.client.get("/terry/2016/08/31/")
+
+        Bookmark.objects.filter(pk=bookmark.pk).update(title="New link")
+        self.assertContains(self.client.get("/terry/2016/08/31/"), "Old link")
+
+        bookmark.title = "New link"
+        with self.captureOnCommitCallbacks(execute=True):
+            bookmark.save()
+        self.assertContains(self.client.get("/terry/2016/08/31/"), "New link")
+
+    def test_saving_post_waits_for_commit(self):
+        "Pages shouldn't be expired until the transaction commits"
+        self.client.get("/terry/my-blog/")
+
+        self.post.title = "New title"
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.post.save()
+            self.assertContains(self.client.get("/terry/my-blog/"), "Old title")
+
+        for callback in callbacks:
+            callback()
+        self.assertContains(self.client.get("/terry/my-blog/"), "New title")
+
+    def test_deferred_expiry_is_batched(self):
+        "Everything expired in a transaction should be deleted in one go"
+        with (
+            patch.object(cache, "delete_many", wraps=cache.delete_many) as delete,
+            self.captureOnCommitCallbacks(execute=True),
+        ):
+            invalidate_cache_tags(["posts"], defer=True)
+            delete_cache_keys(["hines_stats_chart:writing_per_year"], defer=True)
+            invalidate_cache_tags(["photos"], defer=True)
+
+        delete.assert_called_once()
+
+    def test_deferred_expiry_is_discarded_on_rollback(self):
+        "Nothing expired in a rolled back transaction should be deleted later"
+        invalidate_cache_tags(["rolled-back", "committed"])
+        before = get_cache_tag_versions(["rolled-back", "committed"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_cache_tags(["committed"], defer=True)
+            with contextlib.suppress(RuntimeError), transaction.atomic():
+                invalidate_cache_tags(["rolled-back"], defer=True)
+                raise RuntimeError
+            invalidate_cache_tags(["committed"], defer=True)
+
+        after = get_cache_tag_versions(["rolled-back", "committed"])
+        self.assertEqual(after["rolled-back"], before["rolled-back"])
+        self.assertNotEqual(after["committed"], before["committed"])
+
+    def test_moving_post_expires_old_pages(self):
+        "Pages for the Post's old Blog and day should also be expired"
+        LivePostFactory(
+            blog=self.post.blog,
+            title="Other title",
+            time_published=make_datetime("2016-08-31 09:00:00"),
+        )
+        self.client.get("/terry/my-blog/")
+        self.client.get("/terry/2016/08/31/")
+
+        self.post.blog = BlogFactory(slug="other-blog")
+        self.post.time_published = make_datetime("2017-01-01 12:00:00")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.save()
+
+        self.assertNotContains(self.client.get("/terry/my-blog/"), "Old title")
+        self.assertNotContains(self.client.get("/terry/2016/08/31/"), "Old title")
+
+    def test_trackback_expires_post_page(self):
+        "Changes to a Post's trackbacks should expire its page"
+        self.client.get(self.post.get_absolute_url())
+        Post.objects.filter(pk=self.post.pk).update(title="New title")
+        self.post.refresh_from_db()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            TrackbackFactory(post=self.post)
+
+        self.assertContains(self.client.get(self.post.get_absolute_url()), "New title")
+
+    def test_invalidating_changes_version(self):
+        "Nothing should be written to the cache for each page that's cached"
+        with patch.object(cache, "set_many") as set_many:
+            self.client.get("/terry/my-blog/")
+            self.client.get("/terry/my-blog/2016/")
+        before = get_cache_tag_versions(["blog:my-blog"])["blog:my-blog"]
+
+        invalidate_cache_tags(["blog:my-blog"])
+
+        set_many.assert_not_called()
+        self.assertNotEqual(
+            get_cache_tag_versions(["blog:my-blog"])["blog:my-blog"], before
+        )
+
+    def test_versions_expire(self):
+        "Tags' versions should be kept longer than any page cached with them"
+        with patch.object(cache, "add", wraps=cache.add) as add:
+            self.client.get("/terry/my-blog/")
+
+        timeouts = {
+            c.args[0]: c.args[2]
+            for c in add.call_args_list
+            if c.args[0].startswith(TAG_VERSION_CACHE_KEY.format(""))
+        }
+        self.assertIn(TAG_VERSION_CACHE_KEY.format("blog:my-blog"), timeouts)
+        self.assertEqual(set(timeouts.values()), {TAG_VERSION_TIMEOUT})
+        for _url_name, view_class in get_cached_views():
+            self.assertLess(
+                view_class.cache_timeout + (view_class.cache_stale_timeout or 0),
+                TAG_VERSION_TIMEOUT,
+                view_class,
+            )
+
+    def test_404_adds_no_versions(self):
+        "Requests for pages that aren't cached shouldn't write any versions"
+        request = RequestFactory().get("/terry/not-a-blog/")
+        request.resolver_match = resolve(request.path)
+
+        self.assertEqual(self.client.get("/terry/not-a-blog/").status_code, 404)
+
+        tags = ["blog:not-a-blog", *get_page_cache_tags(request)]
+        self.assertEqual(get_cache_tag_versions(tags), {})
+
+    def test_tag_invalidated_while_generating(self):
+        "If a missing version is added while generating, it shouldn't be cached"
+        versions = get_cache_tag_versions(["blog:my-blog"])
+
+        invalidate_cache_tags(["blog:my-blog"])
+
+        self.assertIsNone(get_tagged_cache_key("key", ["blog:my-blog"], versions))
+        self.assertIsNone(create_tagged_cache_key("key", ["blog:my-blog"], versions))
+
+    def test_evicted_version(self):
+        "If a tag's version is evicted, pages cached with it should be expired"
+        self.client.get("/terry/my-blog/")
+        Post.objects.filter(pk=self.post.pk).update(title="New title")
+
+        cache.delete(TAG_VERSION_CACHE_KEY.format("blog:my-blog"))
+
+        self.assertContains(self.client.get("/terry/my-blog/"), "New title")
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class StaleWhileRevalidateTestCase(TestCase):
+    "Using HomeView, which has a cache_stale_timeout"
+
+    def setUp(self):
+        # So that pages refreshed by tasks have the same URL as in the tests:
+        site = Site.objects.get()
+        site.domain = "testserver"
+        site.save()
+        # HomeView only shows Posts from this Blog:
+        self.post = LivePostFactory(blog=BlogFactory(slug="writing"), title="Old title")
+        self.later = time.time() + HomeView.cache_timeout + 1
+
+    def tearDown(self):
+        super().tearDown()
+        cache.clear()
+
+    @override_app_settings(CACHE_STALE_WHILE_REVALIDATE=True)
+    def test_serves_fresh_page(self):
+        "Before cache_timeout it should serve the cached page"
+        self.client.get("/")
+        Post.objects.filter(pk=self.post.pk).update(title="New title")
+
+        with patch("hines.core.cache.async_task") as async_task:
+            response = self.client.get("/")
+
+        self.assertContains(response, "Old title")
+        async_task.assert_not_called()
+
+    @override_app_settings(CACHE_STALE_WHILE_REVALIDATE=True)
+    def test_serves_stale_page_and_queues_task(self):
+        "After cache_timeout it should serve the stale page and queue one task"
+        self.client.get("/")
+        Post.objects.filter(pk=self.post.pk).update(title="New title")
+
+        with (
+            patch("hines.core.cache.time.time", return_value=self.later),
+            patch("hines.core.cache.async_task") as async_task,
+        ):
+            response = self.client.get("/")
+            self.client.get("/")
+
+        self.assertContains(response, "Old title")
+        async_task.assert_called_once_with(
+            "hines.core.tasks.refresh_cached_page", url="/"
+        )
+
+    @override_app_settings(CACHE_STALE_WHILE_REVALIDATE=True)
+    def test_refresh_cached_page(self):
+        "The task should replace the cached page with a fresh one"
+        self.client.get("/")
+        Post.objects.filter(pk=self.post.pk).update(title="New title")
+
+        call_command("refresh_cached_page", "/", stdout=StringIO())
+
+        with patch("hines.core.cache.async_task") as async_task:
+            response = self.client.get("/")
+
+        self.assertContains(response, "New title")
+        async_task.assert_not_called()
+
+    @override_app_settings(CACHE_STALE_WHILE_REVALIDATE=True)
+    def test_page_not_cached_by_middleware(self):
+        "The site-wide middleware shouldn't serve the page without checking it"
+        self.client.get("/")
+
+        # Only the page cached by CacheMixin:
+        invalidate_cache_tags([PAGE_TAG.format("/")])
+        Post.objects.filter(pk=self.post.pk).update(title="New title")
+
+        self.assertContains(self.client.get("/"), "New title")
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class PageLockTestCase(TestCase):
+    def setUp(self):
+        self.post = LivePostFactory(blog=BlogFactory(slug="my-blog"), title="Title")
+        self.request = RequestFactory().get("/terry/my-blog/")
+        self.key_prefix = get_view_key_prefix()
+
+    def tearDown(self):
+        super().tearDown()
+        cache.clear()
+
+    def test_lock_released(self):
+        "Once the page is cached its lock should be released"
+        self.client.get("/terry/my-blog/")
+
+        self.assertIsNotNone(acquire_page_lock(self.request, self.key_prefix))
+
+    def test_waits_for_other_request(self):
+        "If another request is generating the page it should wait for it"
+        acquire_page_lock(self.request, self.key_prefix)
+
+        with patch(
+            "hines.core.views.wait_for_cached_response",
+            return_value=HttpResponse("From the other request"),
+        ):
+            response = self.client.get("/terry/my-blog/")
+
+        self.assertContains(response, "From the other request")
+
+    @override_app_settings(CACHE_METRICS=True)
+    def test_waited_for_page_is_a_hit(self):
+        "The page the other request cached shouldn't be cached again, or a miss"
+        acquire_page_lock(self.request, self.key_prefix)
+        cached = HttpResponse("From the other request")
+        cached.hines_cache_metrics = ("BlogDetailView", "weblogs:blog_detail")
+
+        with (
+            patch("hines.core.views.wait_for_cached_response", return_value=cached),
+            patch.object(cache, "set", wraps=cache.set) as cache_set,
+        ):
+            self.client.get("/terry/my-blog/")
+
+        cache_set.assert_not_called()
+        metric = next(
+            m for m in get_cache_metrics() if m["url_name"] == "weblogs:blog_detail"
+        )
+        self.assertEqual((metric["hits"], metric["misses"]), (1, 0))
+
+    def test_stops_waiting_when_lock_released(self):
+        "If the other request releases the lock without caching, stop waiting"
+        lock_key = acquire_page_lock(self.request)
+        timer = threading.Timer(0.2, release_page_lock, [lock_key])
+        timer.start()
+        self.addCleanup(timer.cancel)
+
+        started = time.monotonic()
+        response = wait_for_cached_response(self.request)
+
+        self.assertIsNone(response)
+        self.assertLess(time.monotonic() - started, PAGE_LOCK_WAIT)
+
+    def test_404_releases_lock(self):
+        "A request whose page raises Http404 shouldn't keep others waiting"
+        request = RequestFactory().get("/terry/not-a-blog/")
+
+        response = self.client.get("/terry/not-a-blog/")
+
+        self.assertEqual(response.status_code, 404)
+        self.assertIsNotNone(acquire_page_lock(request, self.key_prefix))
+
+    @patch("hines.core.cache.PAGE_LOCK_WAIT", 0.2)
+    def test_generates_page_if_wait_too_long(self):
+        "If the other request doesn't cache the page in time, it generates it"
+        acquire_page_lock(self.request, self.key_prefix)
+
+        response = self.client.get("/terry/my-blog/")
+
+        self.assertContains(response, "Title")
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class RevalidateIfStaleTestCase(TestCase):
+    def setUp(self):
+        self.request = RequestFactory().get("/terry/stats/")
+        self.response = HttpResponse()
+        self.response.hines_fresh_until = time.time() + 10
+        self.response.hines_generation_time = 5
+
+    def tearDown(self):
+        super().tearDown()
+        cache.clear()
+
+    @patch("hines.core.cache.async_task")
+    def test_fresh(self, async_task):
+        revalidate_if_stale(self.request, self.response)
+        async_task.assert_not_called()
+
+    @patch("hines.core.cache.async_task")
+    def test_stale(self, async_task):
+        self.response.hines_fresh_until = time.time() - 1
+        revalidate_if_stale(self.request, self.response)
+        async_task.assert_called_once()
+
+    @patch("hines.core.cache.async_task")
+    @patch("hines.core.cache.random.random", return_value=1 - math.exp(-3))
+    def test_early_expiry(self, random, async_task):
+        "Generation time * beta * -log(1 - random) is 15 seconds, so it's expired"
+        revalidate_if_stale(self.request, self.response, early_expiry_beta=1)
+        async_task.assert_called_once()
+
+    @patch("hines.core.cache.async_task")
+    @patch("hines.core.cache.random.random", return_value=1 - math.exp(-1))
+    def test_no_early_expiry(self, random, async_task):
+        "Generation time * beta * -log(1 - random) is 5 seconds, so it's fresh"
+        revalidate_if_stale(self.request, self.response, early_expiry_beta=1)
+        async_task.assert_not_called()
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class ClearCachedPagesTestCase(TestCase):
+    def setUp(self):
+        self.blog = BlogFactory(slug="my-blog")
+        self.post = LivePostFactory(
+            blog=self.blog,
+            title="Old title",
+            time_published=make_datetime("2016-08-31 12:00:00"),
+        )
+        self.client.get("/terry/my-blog/")
+        self.client.get("/terry/my-blog/2016/")
+        Post.objects.filter(pk=self.post.pk).update(title="New title")
+
+    def tearDown(self):
+        super().tearDown()
+        cache.clear()
+
+    def test_page_cache_tags(self):
+        request = RequestFactory().get("/terry/my-blog/2016/")
+        request.resolver_match = resolve(request.path)
+
+        self.assertEqual(
+            get_page_cache_tags(request),
+            [
+                "view:weblogs:post_year_archive",
+                "page:/terry/my-blog/2016/",
+                "path:/",
+                "path:/terry/",
+                "path:/terry/my-blog/",
+                "path:/terry/my-blog/2016/",
+            ],
+        )
+
+    def test_prefix(self):
+        clear_cached_pages(prefixes=["/terry/my-blog/2016/"])
+
+        self.assertContains(self.client.get("/terry/my-blog/"), "Old title")
+        self.assertContains(self.client.get("/terry/my-blog/2016/"), "New title")
+
+    def test_prefix_includes_page(self):
+        clear_cached_pages(prefixes=["/terry/my-blog/"])
+
+        self.assertContains(self.client.get("/terry/my-blog/"), "New title")
+        self.assertContains(self.client.get("/terry/my-blog/2016/"), "New title")
+
+    def test_prefix_changes_version(self):
+        "Clearing a prefix should only change its version"
+        tag = "path:/terry/my-blog/"
+        before = get_cache_tag_versions([tag])[tag]
+
+        with patch.object(cache, "delete_many") as delete_many:
+            clear_cached_pages(prefixes=["/terry/my-blog/"])
+
+        self.assertNotEqual(get_cache_tag_versions([tag])[tag], before)
+        # Only the site-wide middleware's keys for the prefix's own page:
+        for key in delete_many.call_args.args[0]:
+            self.assertIn("cache_header", key)
+
+    def test_root_prefix(self):
+        clear_cached_pages(prefixes=["/"])
+
+        self.assertContains(self.client.get("/terry/my-blog/"), "New title")
+        self.assertContains(self.client.get("/terry/my-blog/2016/"), "New title")
+
+    def test_invalid_prefix(self):
+        with self.assertRaises(ValueError):
+            clear_cached_pages(prefixes=["terry/"])
+
+    def test_view(self):
+        clear_cached_pages(views=["weblogs:blog_detail"])
+
+        self.assertContains(self.client.get("/terry/my-blog/"), "New title")
+        self.assertContains(self.client.get("/terry/my-blog/2016/"), "Old title")
+
+    def test_unknown_view(self):
+        "Only URL names of views using CacheMixin have cached pages to clear"
+        with self.assertRaises(ValueError):
+            clear_cached_pages(views=["admin:index"])
+
+    def test_returns_uncached(self):
+        "It should return the views and tags that no cached page has"
+        self.assertEqual(
+            clear_cached_pages(
+                views=["weblogs:blog_detail", "weblogs:post_detail"],
+                tags=["blog:my-blog", "blog:not-a-blog"],
+            ),
+            ["weblogs:post_detail", "blog:not-a-blog"],
+        )
+
+    def test_tag(self):
+        clear_cached_pages(tags=["blog:my-blog"])
+
+        self.assertContains(self.client.get("/terry/my-blog/"), "New title")
+        self.assertContains(self.client.get("/terry/my-blog/2016/"), "New title")
+
+    def test_command(self):
+        out = StringIO()
+        call_command("clear_cache", prefix=["/terry/my-blog/2016/"], stdout=out)
+
+        self.assertIn("/terry/my-blog/2016/", out.getvalue())
+        self.assertContains(self.client.get("/terry/my-blog/"), "Old title")
+        self.assertContains(self.client.get("/terry/my-blog/2016/"), "New title")
+
+    def test_command_warns_uncached(self):
+        out, err = StringIO(), StringIO()
+        call_command(
+            "clear_cache", tag=["blog:my-blog", "blog:typo"], stdout=out, stderr=err
+        )
+
+        self.assertIn("blog:my-blog", out.getvalue())
+        self.assertNotIn("blog:typo", out.getvalue())
+        self.assertIn("No cached pages have blog:typo", err.getvalue())
+
+    def test_command_all(self):
+        call_command("clear_cache", stdout=StringIO())
+
+        self.assertContains(self.client.get("/terry/my-blog/"), "New title")
+
+    def test_admin(self):
+        self.client.force_login(UserFactory(is_staff=True, is_superuser=True))
+
+        self.client.get(
+            "/terry/admin-custom/clear-cache/", {"view": "weblogs:blog_detail"}
+        )
+        self.client.logout()
+
+        self.assertContains(self.client.get("/terry/my-blog/"), "New title")
+        self.assertContains(self.client.get("/terry/my-blog/2016/"), "Old title")
@@ -0,0 +1,134 @@
+from unittest.mock import patch
+
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+
+from hines.core import cache_backends
+
+CACHES = {
+    "default": {
+        "BACKEND": "hines.core.cache_backends.TwoTierCache",
+        "LOCATION": "shared",
+        "OPTIONS": {
+            "LOCAL_TIMEOUT": 5,
+            "MAX_ENTRIES": 3,
+            "CHECK_INTERVAL": 1,
+            "SHARED_ONLY_PREFIXES": ["lock:"],
+        },
+    },
+    "shared": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "two-tier-tests",
+    },
+}
+
+
+@override_settings(CACHES=CACHES)
+class TwoTierCacheTestCase(SimpleTestCase):
+    def setUp(self):
+        cache_backends._local_tiers.clear()
+        self.cache = cache_backends.TwoTierCache("shared", CACHES["default"])
+        self.shared = caches["shared"]
+
+    def tearDown(self):
+        self.shared.clear()
+        cache_backends._local_tiers.clear()
+
+    def test_get_from_shared(self):
+        self.shared.set("a", 1)
+
+        self.assertEqual(self.cache.get("a"), 1)
+        self.assertEqual(
+            self.cache.get_stats(),
+            {"local": {"hits": 0, "misses": 1}, "shared": {"hits": 1, "misses": 0}},
+        )
+
+    def test_get_from_local(self):
+        self.cache.set("a", 1)
+        # Checks the shared cache for deletions:
+        self.cache.get("a")
+
+        with patch.object(self.shared, "get", side_effect=AssertionError):
+            self.assertEqual(self.cache.get("a"), 1)
+
+        self.assertEqual(self.cache.get_stats()["local"], {"hits": 2, "misses": 0})
+
+    def test_miss(self):
+        self.assertEqual(self.cache.get("a", "default"), "default")
+        self.assertEqual(self.cache.get_stats()["shared"], {"hits": 0, "misses": 1})
+
+    def test_local_values_are_copies(self):
+        self.cache.set("a", {"b": 1})
+
+        self.cache.get("a")["b"] = 2
+
+        self.assertEqual(self.cache.get("a"), {"b": 1})
+
+    def test_local_timeout(self):
+        with patch("hines.core.cache_backends.time.monotonic", return_value=100):
+            self.cache.set("a", 1)
+        self.shared.set("a", 2)
+
+        with patch("hines.core.cache_backends.time.monotonic", return_value=104):
+            self.assertEqual(self.cache.get("a"), 1)
+        with patch("hines.core.cache_backends.time.monotonic", return_value=106):
+            self.assertEqual(self.cache.get("a"), 2)
+
+    def test_least_recently_used_removed(self):
+        self.cache.set_many({"a": 1, "b": 2, "c": 3})
+        self.cache.get("a")
+        self.cache.set("d", 4)
+
+        self.assertEqual(
+            list(cache_backends._local_tiers["shared"].values),
+            [":1:c", ":1:a", ":1:d"],
+        )
+
+    def test_get_many(self):
+        self.cache.set("a", 1)
+        self.shared.set("b", 2)
+
+        self.assertEqual(self.cache.get_many(["a", "b", "c"]), {"a": 1, "b": 2})
+        self.assertEqual(
+            self.cache.get_stats(),
+            {"local": {"hits": 1, "misses": 2}, "shared": {"hits": 1, "misses": 1}},
+        )
+
+    def test_delete_empties_other_processes(self):
+        self.cache.set("a", 1)
+        self.cache.set("b", 1)
+        self.cache.get("a")
+        # Another process deletes "b":
+        other_tier = cache_backends.LocalTier()
+        with patch.dict(cache_backends._local_tiers, {"shared": other_tier}):
+            other = cache_backends.TwoTierCache("shared", CACHES["default"])
+            other.delete("b")
+
+        # Until we next check, we still have our local copy of "b":
+        self.assertEqual(self.cache.get("b"), 1)
+
+        with patch(
+            "hines.core.cache_backends.time.monotonic",
+            return_value=cache_backends._local_tiers["shared"].checked_at + 2,
+        ):
+            self.assertIsNone(self.cache.get("b"))
+            self.assertEqual(self.cache.get("a"), 1)
+            self.assertEqual(self.cache.get_stats()["shared"]["hits"], 1)
+
+    def test_shared_only_prefixes(self):
+        self.assertTrue(self.cache.add("lock:a", value=True))
+        self.assertFalse(self.cache.add("lock:a", value=True))
+
+        self.assertEqual(cache_backends._local_tiers["shared"].values, {})
+
+        with patch.object(self.cache, "_bump_generation") as bump:
+            self.cache.delete("lock:a")
+        bump.assert_not_called()
+        self.assertTrue(self.cache.add("lock:a", value=True))
+
+    def test_clear(self):
+        self.cache.set("a", 1)
+        self.cache.clear()
+
+        self.assertIsNone(self.cache.get("a"))
+        self.assertIsNone(self.shared.get("a"))
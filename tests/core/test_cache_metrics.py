@@ -0,0 +1,159 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from hines.core import cache_backends
+from hines.core.cache_metrics import (
+    get_cache_metrics,
+    get_cache_tier_stats,
+    get_cached_views,
+    record_cache_hit,
+    record_cache_miss,
+)
+from hines.core.views import HomeView
+from hines.users.factories import UserFactory
+from hines.weblogs.factories import BlogFactory, LivePostFactory
+from hines.weblogs.views import PostDetailView
+from tests import override_app_settings
+
+
+def get_metric(url_name):
+    return next(m for m in get_cache_metrics() if m["url_name"] == url_name)
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class CacheMetricsTestCase(TestCase):
+    def tearDown(self):
+        super().tearDown()
+        cache.clear()
+
+    def test_cached_views(self):
+        views = get_cached_views()
+
+        self.assertIn(("home", HomeView), views)
+        self.assertIn(("weblogs:post_detail", PostDetailView), views)
+
+    def test_no_requests(self):
+        metric = get_metric("home")
+
+        self.assertEqual(metric["view"], "HomeView")
+        self.assertEqual(metric["hits"], 0)
+        self.assertEqual(metric["misses"], 0)
+        self.assertIsNone(metric["hit_ratio"])
+        self.assertIsNone(metric["average_render_ms"])
+
+    def test_totals_and_averages(self):
+        record_cache_hit("HomeView", "home")
+        record_cache_hit("HomeView", "home")
+        record_cache_hit("HomeView", "home")
+        record_cache_miss("HomeView", "home", 0.1, 1000)
+        record_cache_miss("HomeView", "home", 0.3, 3000)
+
+        metric = get_metric("home")
+
+        self.assertEqual(metric["hits"], 3)
+        self.assertEqual(metric["misses"], 2)
+        self.assertEqual(metric["hit_ratio"], 0.6)
+        self.assertEqual(metric["average_render_ms"], 200)
+        self.assertEqual(metric["average_bytes"], 2000)
+        self.assertEqual(metric["cache_timeout"], HomeView.cache_timeout)
+
+    @override_app_settings(CACHE_METRICS=True)
+    def test_records_requests(self):
+        LivePostFactory(blog=BlogFactory(slug="writing"))
+
+        response = self.client.get("/")
+        self.client.get("/")
+
+        metric = get_metric("home")
+        self.assertEqual(metric["hits"], 1)
+        self.assertEqual(metric["misses"], 1)
+        self.assertEqual(metric["average_bytes"], len(response.content))
+
+    def test_does_not_record_requests_by_default(self):
+        self.client.get("/")
+
+        self.assertEqual(get_metric("home")["misses"], 0)
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class AdminCacheMetricsTestCase(TestCase):
+    url = "/terry/admin-custom/cache-metrics/"
+
+    def tearDown(self):
+        super().tearDown()
+        cache.clear()
+
+    def test_superuser(self):
+        self.client.force_login(UserFactory(is_staff=True, is_superuser=True))
+        record_cache_hit("HomeView", "home")
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, "admin/cache_metrics.html")
+        self.assertContains(response, "HomeView")
+
+    def test_json(self):
+        self.client.force_login(UserFactory(is_staff=True, is_superuser=True))
+        record_cache_hit("HomeView", "home")
+
+        response = self.client.get(self.url, {"format": "json"})
+
+        data = response.json()
+        self.assertFalse(data["enabled"])
+        home = next(v for v in data["views"] if v["url_name"] == "home")
+        self.assertEqual(home["hits"], 1)
+
+    def test_no_tiers(self):
+        "Only a TwoTierCache has tiers"
+        self.client.force_login(UserFactory(is_staff=True, is_superuser=True))
+
+        response = self.client.get(self.url, {"format": "json"})
+
+        self.assertIsNone(response.json()["tiers"])
+        self.assertIsNone(get_cache_tier_stats())
+
+    @override_settings(
+        CACHES={
+            "default": {
+                "BACKEND": "hines.core.cache_backends.TwoTierCache",
+                "LOCATION": "shared",
+            },
+            "shared": {
+                "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                "LOCATION": "cache-metrics-tests",
+            },
+        }
+    )
+    def test_tiers(self):
+        self.client.force_login(UserFactory(is_staff=True, is_superuser=True))
+        cache_backends._local_tiers.clear()
+        self.addCleanup(cache_backends._local_tiers.clear)
+        cache.set("a", 1)
+        cache.get("a")
+        cache.get("b")
+
+        self.assertEqual(
+            get_cache_tier_stats(),
+            [
+                {"tier": "local", "hits": 1, "misses": 1, "hit_ratio": 0.5},
+                {"tier": "shared", "hits": 0, "misses": 1, "hit_ratio": 0.0},
+            ],
+        )
+        self.assertContains(self.client.get(self.url), "Cache tiers")
+
+    def test_not_superuser(self):
+        self.client.force_login(UserFactory(is_staff=True))
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 403)
+
+    def test_logged_out(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 302)
@@ -2,9 +2,10 @@ from ditto.flickr.factories import AccountFactory as FlickrAccountFactory
 from ditto.flickr.factories import PhotoFactory, UserFactory
 from ditto.pinboard.factories import AccountFactory as PinboardAccountFactory
 from ditto.pinboard.factories import BookmarkFactory
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 
-from hines.core.recent import RecentObjects
+from hines.core.recent import KIND_REGISTRY_CACHE_KEY, RecentObjects
 from hines.core.utils import make_datetime
 from hines.weblogs.factories import BlogFactory, DraftPostFactory, LivePostFactory
 from hines.weblogs.models import Post
@@ -231,3 +232,143 @@ class RecentObjectsTestCase(TestCase):
         self.assertEqual(objects[0]["object"], bookmark)
         self.assertEqual(objects[1]["object"], post)
         self.assertEqual(objects[2]["objects"][0], photo)
+
+    def test_mixture_interleaved(self):
+        "It should merge interleaved objects across chunk boundaries."
+        blog = BlogFactory(slug="my-blog")
+        pinboard_account = PinboardAccountFactory(username="bob")
+
+        expected = []
+        for day in range(1, 13):
+            time = make_datetime(f"2017-06-{day:02} 12:00:00")
+            if day % 3 == 0:
+                expected.append(
+                    BookmarkFactory(
+                        account=pinboard_account, is_private=False, post_time=time
+                    )
+                )
+            else:
+                expected.append(LivePostFactory(blog=blog, time_published=time))
+        expected.reverse()
+
+        r = RecentObjects((("blog_posts", "my-blog"), ("pinboard_bookmarks", "bob")))
+        r.chunk_size = 2
+        objects = r.get_objects(num=9)
+
+        self.assertEqual([o["object"] for o in objects], expected[:9])
+
+    def test_get_objects_fetches_lazily(self):
+        "It should only fetch the chunks of each kind that the merge needs."
+        blog = BlogFactory(slug="my-blog")
+        LivePostFactory.create_batch(
+            10, blog=blog, time_published=make_datetime("2017-06-01 12:00:00")
+        )
+        pinboard_account = PinboardAccountFactory(username="bob")
+        BookmarkFactory.create_batch(
+            10,
+            account=pinboard_account,
+            is_private=False,
+            post_time=make_datetime("2017-05-01 12:00:00"),
+        )
+
+        r = RecentObjects((("blog_posts", "my-blog"), ("pinboard_bookmarks", "bob")))
+
+        # One query for the first chunk of each kind; the newer Posts fill
+        # the list so no more Bookmarks are fetched:
+        with self.assertNumQueries(2):
+            objects = r.get_objects(num=3)
+
+        self.assertEqual(len(objects), 3)
+        for obj in objects:
+            self.assertEqual(obj["kind"], "blog_post")
+
+    def test_flickr_photos_queries(self):
+        "It should get all the Photos for several days in a single query."
+        user = UserFactory(nsid="11111111111@N01")
+        FlickrAccountFactory(user=user)
+        for day in range(1, 5):
+            PhotoFactory.create_batch(
+                2,
+                user=user,
+                is_private=False,
+                post_time=make_datetime(f"2017-05-0{day} 12:30:00"),
+            )
+
+        r = RecentObjects((("flickr_photos", user.nsid),))
+
+        with self.assertNumQueries(1):
+            objects = r.get_objects(num=3)
+            # Photos should already be fetched:
+            for obj in objects:
+                self.assertEqual(len(obj["objects"]), 2)
+
+        self.assertEqual(
+            [o["time"] for o in objects],
+            [
+                make_datetime("2017-05-04 00:00:00"),
+                make_datetime("2017-05-03 00:00:00"),
+                make_datetime("2017-05-02 00:00:00"),
+            ],
+        )
+
+    def test_flickr_photos_order_within_day(self):
+        "Each day's Photos should be ordered earliest first."
+        user = UserFactory(nsid="11111111111@N01")
+        FlickrAccountFactory(user=user)
+        later = PhotoFactory(
+            user=user, is_private=False, post_time=make_datetime("2017-05-01 18:00:00")
+        )
+        earlier = PhotoFactory(
+            user=user, is_private=False, post_time=make_datetime("2017-05-01 09:00:00")
+        )
+
+        objects = RecentObjects((("flickr_photos", user.nsid),)).get_objects()
+
+        self.assertEqual(objects[0]["objects"], [earlier, later])
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class RecentObjectsKindRegistryTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.blog = BlogFactory(slug="my-blog")
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_caches_valid_kinds(self):
+        "Validated kinds and their pks should be cached."
+        RecentObjects((("blog_posts", "my-blog"),))
+
+        self.assertEqual(
+            cache.get(KIND_REGISTRY_CACHE_KEY),
+            {("blog_posts", "my-blog"): self.blog.pk},
+        )
+
+    def test_uses_cached_kinds(self):
+        "It shouldn't query the database to validate kinds a second time."
+        RecentObjects((("blog_posts", "my-blog"),))
+
+        with self.assertNumQueries(0):
+            r = RecentObjects((("blog_posts", "my-blog"),))
+
+        self.assertEqual(r.kind_pks, {("blog_posts", "my-blog"): self.blog.pk})
+
+    def test_saving_blog_clears_cache(self):
+        RecentObjects((("blog_posts", "my-blog"),))
+
+        self.blog.save()
+
+        self.assertIsNone(cache.get(KIND_REGISTRY_CACHE_KEY))
+
+    def test_deleting_account_clears_cache(self):
+        account = PinboardAccountFactory(username="bob")
+        RecentObjects((("pinboard_bookmarks", "bob"),))
+
+        account.delete()
+
+        self.assertIsNone(cache.get(KIND_REGISTRY_CACHE_KEY))
+        with self.assertRaises(ValueError):
+            RecentObjects((("pinboard_bookmarks", "bob"),))
@@ -0,0 +1,96 @@
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.sites.models import Site
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from hines.core.utils import make_datetime
+from hines.core.warm import get_warm_cache_urls, warm_cache
+from hines.weblogs.factories import BlogFactory, LivePostFactory
+from hines.weblogs.models import Post
+from hines.weblogs.sitemaps import PostSitemap
+
+
+class GetWarmCacheUrlsTestCase(TestCase):
+    def setUp(self):
+        blog = BlogFactory(slug="my-blog")
+        self.old_post = LivePostFactory(
+            blog=blog, slug="old", time_published=make_datetime("2016-08-01 12:00:00")
+        )
+        self.new_post = LivePostFactory(
+            blog=blog, slug="new", time_published=make_datetime("2016-08-31 12:00:00")
+        )
+        Post.objects.filter(pk=self.old_post.pk).update(
+            time_modified=make_datetime("2016-08-01 12:00:00")
+        )
+        Post.objects.filter(pk=self.new_post.pk).update(
+            time_modified=make_datetime("2016-08-31 12:00:00")
+        )
+
+    def test_key_pages_first(self):
+        urls = get_warm_cache_urls({"posts": PostSitemap})
+
+        self.assertEqual(urls[:3], ["/", "/terry/my-blog/", "/terry/stats/creating/"])
+
+    def test_sitemap_urls(self):
+        urls = get_warm_cache_urls({"posts": PostSitemap})
+
+        self.assertIn("/terry/my-blog/2016/08/01/old/", urls)
+        self.assertIn("/terry/my-blog/2016/08/31/new/", urls)
+
+    def test_recent_first(self):
+        urls = get_warm_cache_urls({"posts": PostSitemap}, recent_first=True)
+
+        self.assertEqual(
+            urls[-2:],
+            ["/terry/my-blog/2016/08/31/new/", "/terry/my-blog/2016/08/01/old/"],
+        )
+
+    def test_limit(self):
+        urls = get_warm_cache_urls({"posts": PostSitemap}, limit=2)
+
+        self.assertEqual(urls, ["/", "/terry/my-blog/"])
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class WarmCacheTestCase(TestCase):
+    def setUp(self):
+        # So that the pages are requested with the same URLs as in the tests:
+        site = Site.objects.get()
+        site.domain = "testserver"
+        site.save()
+        self.post = LivePostFactory(blog=BlogFactory(slug="my-blog"), title="Old")
+
+    def tearDown(self):
+        super().tearDown()
+        cache.clear()
+
+    def test_caches_pages(self):
+        "After warming a page, requests for it should get the cached page"
+        results = warm_cache(["/terry/my-blog/"], concurrency=1)
+
+        self.assertEqual(results, {"requested": 1, "failed": 0, "skipped": 0})
+        Post.objects.filter(pk=self.post.pk).update(title="New")
+        self.assertContains(self.client.get("/terry/my-blog/"), "Old")
+
+    def test_failed(self):
+        results = warm_cache(["/terry/nope/"], concurrency=1)
+
+        self.assertEqual(results, {"requested": 0, "failed": 1, "skipped": 0})
+
+    def test_time_limit(self):
+        "Once past the time limit it should skip the remaining pages"
+        results = warm_cache(["/", "/terry/my-blog/"], concurrency=1, time_limit=-1)
+
+        self.assertEqual(results, {"requested": 0, "failed": 0, "skipped": 2})
+
+    @patch("hines.core.management.commands.warm_cache.sitemaps", {"posts": PostSitemap})
+    def test_command(self):
+        out = StringIO()
+        call_command("warm_cache", concurrency=1, limit=2, stdout=out)
+
+        self.assertIn("2 pages requested", out.getvalue())
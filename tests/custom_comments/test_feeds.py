@@ -3,6 +3,7 @@ from django.utils.feedgenerator import rfc2822_date
 
 from hines.core.utils import make_datetime
 from hines.custom_comments.factories import CustomCommentFactory
+from hines.custom_comments.models import CustomComment
 from hines.weblogs.factories import BlogFactory, LivePostFactory
 
 # from tests import override_app_settings
@@ -159,6 +160,49 @@ class CommentsFeedRSSTestCase(CommentsFeedRSSParentTestCase):
                 item.getElementsByTagName("guid")[0].attributes.get("isPermaLink")
             )
 
+    def test_not_modified(self):
+        etag = self.client.get(self.feed_url)["ETag"]
+
+        response = self.client.get(self.feed_url, headers={"if-none-match": etag})
+
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_changes_when_comment_edited(self):
+        etag = self.client.get(self.feed_url)["ETag"]
+
+        CustomComment.objects.filter(pk=self.comment.pk).update(comment="Edited")
+
+        self.assertNotEqual(self.client.get(self.feed_url)["ETag"], etag)
+
+    def test_etag_changes_when_comment_removed(self):
+        other = CustomCommentFactory.create(
+            content_object=self.post, object_pk=self.post.pk
+        )
+        etag = self.client.get(self.feed_url)["ETag"]
+
+        CustomComment.objects.filter(pk=other.pk).update(is_removed=True)
+
+        self.assertNotEqual(self.client.get(self.feed_url)["ETag"], etag)
+
+    def test_etag_changes_when_post_changed(self):
+        etag = self.client.get(self.feed_url)["ETag"]
+
+        self.post.title = "New title"
+        self.post.save()
+
+        response = self.client.get(self.feed_url)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertContains(response, "New title")
+
+    def test_num_queries(self):
+        "The number of queries shouldn't depend on the number of items."
+        num_queries = self.get_num_queries(self.feed_url)
+
+        for post in LivePostFactory.create_batch(3):
+            CustomCommentFactory.create(content_object=post, object_pk=post.pk)
+
+        self.assertEqual(self.get_num_queries(self.feed_url), num_queries)
+
 
 class AdminCommentsFeedRSSTestCase(CommentsFeedRSSParentTestCase):
     feed_url = "/terry/feeds/admin-comments/rss/"
@@ -167,6 +211,25 @@ class AdminCommentsFeedRSSTestCase(CommentsFeedRSSParentTestCase):
         response = self.client.get(self.feed_url)
         self.assertEqual(response.status_code, 200)
 
+    def test_items(self):
+        "The feed should contain all the comments, including spam"
+        CustomCommentFactory.create(
+            content_object=self.post, object_pk=self.post.pk, is_public=False
+        )
+        channel = self.get_channel_element(self.feed_url)
+
+        items = channel.getElementsByTagName("item")
+        self.assertEqual(len(items), 2)
+
+    def test_etag_changes_when_comment_moderated(self):
+        etag = self.client.get(self.feed_url)["ETag"]
+
+        CustomComment.objects.filter(pk=self.comment.pk).update(is_public=False)
+
+        response = self.client.get(self.feed_url)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertContains(response, "[SPAM]")
+
     # Can't work out why this test fails.
     # @override_app_settings(COMMENTS_ADMIN_PUBLISHED_FEED_SLUG="good-comments")
     # def test_response_200_with_custom_slug(self):
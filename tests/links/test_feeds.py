@@ -1,10 +1,14 @@
+from unittest.mock import patch
+
 from ditto.pinboard.factories import AccountFactory, BookmarkFactory
 from ditto.pinboard.models import Bookmark
 from django.contrib.sites.models import Site
 from django.utils.feedgenerator import rfc2822_date
 from freezegun import freeze_time
 
+from hines.core.converters import FeedCursorConverter
 from hines.core.utils import make_datetime
+from hines.links.feeds import BookmarksFeedRSS
 from hines.users.factories import UserFactory
 from tests import override_app_settings
 from tests.core.feeds import FeedTestCase
@@ -164,3 +168,108 @@ class BookmarksFeedRSSTestCase(FeedTestCase):
             self.assertIsNone(
                 item.getElementsByTagName("guid")[0].attributes.get("isPermaLink")
             )
+
+    def test_num_queries(self):
+        "The number of queries shouldn't depend on the number of items."
+        num_queries = self.get_num_queries(self.feed_url)
+
+        for bookmark in BookmarkFactory.create_batch(3, account=AccountFactory()):
+            bookmark.tags.set(["cats", "fish"])
+
+        self.assertEqual(self.get_num_queries(self.feed_url), num_queries)
+
+
+@patch.object(BookmarksFeedRSS, "num_items", 2)
+@patch.object(BookmarksFeedRSS, "archive_page_size", 2)
+class BookmarksFeedRSSArchiveTestCase(FeedTestCase):
+    feed_url = "/terry/feeds/links/rss/"
+
+    def setUp(self):
+        super().setUp()
+        account = AccountFactory(username="bobferris")
+        self.bookmarks = [
+            BookmarkFactory(
+                account=account, post_time=make_datetime(f"2017-04-0{day} 12:00:00")
+            )
+            for day in (1, 2, 3)
+        ]
+
+    def get_archive_url(self, url):
+        "Returns the href of the prev-archive link in the feed at url"
+        channel = self.get_channel_element(url)
+        return [
+            el.getAttribute("href")
+            for el in channel.getElementsByTagName("atom:link")
+            if el.getAttribute("rel") == "prev-archive"
+        ][0]
+
+    def get_item_links(self, url):
+        items = self.get_channel_element(url).getElementsByTagName("item")
+        return [
+            item.getElementsByTagName("link")[0].firstChild.wholeText for item in items
+        ]
+
+    def test_archive_page(self):
+        archive_url = self.get_archive_url(self.feed_url)
+
+        response = self.client.get(archive_url)
+        self.assertEqual(response.status_code, 200)
+        # It's complete, so can be cached for a long time:
+        self.assertIn("max-age=31536000", response.headers["Cache-Control"])
+
+        self.assertEqual(
+            self.get_item_links(archive_url),
+            [self.bookmarks[1].url, self.bookmarks[0].url],
+        )
+
+    def test_incomplete_archive_page(self):
+        channel = self.get_channel_element(self.get_archive_url(self.feed_url))
+        archive_url = [
+            el.getAttribute("href")
+            for el in channel.getElementsByTagName("atom:link")
+            if el.getAttribute("rel") == "next-archive"
+        ][0]
+
+        response = self.client.get(archive_url)
+        self.assertEqual(response.status_code, 200)
+        # It isn't complete, so shouldn't be cached for long:
+        self.assertNotIn("max-age=31536000", response.headers["Cache-Control"])
+
+        self.assertEqual(self.get_item_links(archive_url), [self.bookmarks[2].url])
+
+    def test_archive_url_is_stable(self):
+        "New items shouldn't change the URL of an archive page"
+        archive_url = self.get_archive_url(self.feed_url)
+
+        BookmarkFactory(
+            account=self.bookmarks[0].account,
+            post_time=make_datetime("2017-04-04 12:00:00"),
+        )
+
+        self.assertEqual(self.get_archive_url(self.feed_url), archive_url)
+
+    def test_other_cursor_redirects(self):
+        "A cursor that isn't the start of a page redirects to its page"
+        archive_url = self.get_archive_url(self.feed_url)
+        cursor = FeedCursorConverter().to_url(
+            (self.bookmarks[1].post_time, self.bookmarks[1].pk)
+        )
+
+        response = self.client.get(f"{self.feed_url}archive/{cursor}/")
+
+        self.assertRedirects(response, archive_url, fetch_redirect_response=False)
+
+    def test_cursor_before_items_404s(self):
+        cursor = FeedCursorConverter().to_url(
+            (make_datetime("2017-03-31 12:00:00"), self.bookmarks[0].pk)
+        )
+
+        response = self.client.get(f"{self.feed_url}archive/{cursor}/")
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_out_of_range_cursor_404s(self):
+        for cursor in ("99999999999999999999999-1", "1-99999999999999999999999"):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(f"{self.feed_url}archive/{cursor}/")
+                self.assertEqual(response.status_code, 404)
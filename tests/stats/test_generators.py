@@ -129,6 +129,38 @@ class EventsGeneratorTestCase(TestCase):
             ],
         )
 
+    def test_all_kinds(self):
+        "Should include each kind as a column, in one query"
+        GigEventFactory(date=make_date("2018-01-01"))
+        CinemaEventFactory(date=make_date("2018-01-01"))
+        CinemaEventFactory(date=make_date("2018-06-01"))
+
+        with self.assertNumQueries(1):
+            result = EventsGenerator("all").get_per_year()
+
+        self.assertEqual(result["title"], "All Events")
+        columns = result["data"][0]["columns"]
+        # Kinds with no events at all aren't included:
+        self.assertEqual(list(columns), ["cinema", "gig"])
+        self.assertEqual(columns["cinema"]["value"], 2)
+        self.assertEqual(columns["gig"]["value"], 1)
+
+    def test_shared_counts(self):
+        "Generators sharing counts shouldn't make any more queries"
+        GigEventFactory(date=make_date("2018-01-01"))
+        counts = EventsGenerator.get_counts()
+
+        with self.assertNumQueries(0):
+            result = EventsGenerator("gig", counts=counts).get_per_year()
+
+        self.assertEqual(result["data"][0]["columns"]["gig"]["value"], 1)
+
+    def test_undated_events(self):
+        "Events without a date aren't counted"
+        GigEventFactory(date=None)
+
+        self.assertEqual(EventsGenerator.get_counts(), {})
+
 
 class FlickrGeneratorTestCase(TestCase):
     def test_title_description(self):
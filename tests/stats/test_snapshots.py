@@ -0,0 +1,142 @@
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+
+from hines.core.utils import make_datetime
+from hines.stats.generators import StaticGenerator, WeblogGenerator
+from hines.stats.models import StatsSnapshot
+from hines.stats.snapshots import compute_snapshots, get_chart_names
+from hines.stats.views import StatsView
+from hines.weblogs.factories import BlogFactory, LivePostFactory
+
+
+class ComputeSnapshotsTestCase(TestCase):
+    def setUp(self):
+        self.blog = BlogFactory(slug="writing")
+        LivePostFactory(
+            blog=self.blog, time_published=make_datetime("2018-01-01 12:00:00")
+        )
+
+    def test_computes_all_charts(self):
+        results = compute_snapshots()
+
+        self.assertEqual(results["computed"], get_chart_names())
+        self.assertEqual(StatsSnapshot.objects.count(), len(get_chart_names()))
+
+    def test_snapshot(self):
+        compute_snapshots(["writing_per_year"])
+
+        snapshot = StatsSnapshot.objects.get(chart_name="writing_per_year")
+        self.assertEqual(snapshot.generator, "WeblogGenerator")
+        self.assertEqual(snapshot.watermark, WeblogGenerator.get_watermark())
+        self.assertEqual(snapshot.data["data"][0]["label"], "2018")
+
+    def test_skips_unchanged(self):
+        compute_snapshots(["writing_per_year"])
+
+        results = compute_snapshots(["writing_per_year"])
+
+        self.assertEqual(results["skipped"], ["writing_per_year"])
+
+    def test_recomputes_changed(self):
+        compute_snapshots(["writing_per_year"])
+        LivePostFactory(
+            blog=self.blog, time_published=make_datetime("2019-01-01 12:00:00")
+        )
+
+        results = compute_snapshots(["writing_per_year"])
+
+        self.assertEqual(results["computed"], ["writing_per_year"])
+
+    def test_always_recomputes_without_watermark(self):
+        compute_snapshots(["steps_per_year"])
+
+        results = compute_snapshots(["steps_per_year"])
+
+        self.assertIsNone(StaticGenerator.get_watermark())
+        self.assertEqual(results["computed"], ["steps_per_year"])
+
+    def test_force(self):
+        compute_snapshots(["writing_per_year"])
+
+        results = compute_snapshots(["writing_per_year"], force=True)
+
+        self.assertEqual(results["computed"], ["writing_per_year"])
+
+    def test_saving_post_expires_snapshot(self):
+        compute_snapshots(["writing_per_year", "steps_per_year"])
+
+        LivePostFactory(blog=self.blog)
+
+        self.assertEqual(
+            list(StatsSnapshot.objects.values_list("chart_name", flat=True)),
+            ["steps_per_year"],
+        )
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class StatsViewSnapshotTestCase(TestCase):
+    def tearDown(self):
+        cache.clear()
+
+    def test_reads_snapshot(self):
+        StatsSnapshot.objects.create(
+            chart_name="writing_per_year",
+            generator="WeblogGenerator",
+            data={"title": "From the snapshot", "data": []},
+            computed_at=make_datetime("2018-01-01 00:00:00"),
+        )
+
+        with patch.object(
+            WeblogGenerator, "get_posts_per_year", side_effect=AssertionError
+        ):
+            data = StatsView().get_chart_data("writing_per_year")
+
+        self.assertEqual(data["title"], "From the snapshot")
+
+    def test_saves_missing_snapshot(self):
+        StatsView().get_chart_data("writing_per_year")
+
+        self.assertTrue(
+            StatsSnapshot.objects.filter(chart_name="writing_per_year").exists()
+        )
+
+    def test_computing_expires_changed_chart(self):
+        StatsView().get_chart_data("steps_per_year")
+
+        with patch.object(
+            StaticGenerator,
+            "get_steps_per_year",
+            return_value={"title": "Changed", "data": []},
+        ):
+            compute_snapshots(["steps_per_year"])
+
+        self.assertIsNone(cache.get(StatsView().get_chart_cache_key("steps_per_year")))
+
+    def test_computing_keeps_unchanged_chart(self):
+        StatsView().get_chart_data("steps_per_year")
+
+        compute_snapshots(["steps_per_year"])
+
+        self.assertIsNotNone(
+            cache.get(StatsView().get_chart_cache_key("steps_per_year"))
+        )
+
+
+class ComputeStatsCommandTestCase(TestCase):
+    def test_output(self):
+        out = StringIO()
+        call_command(
+            "compute_stats", "steps_per_year", "headaches_per_year", stdout=out
+        )
+
+        self.assertIn("2 charts computed", out.getvalue())
+
+    def test_unknown_chart(self):
+        with self.assertRaises(CommandError):
+            call_command("compute_stats", "nope", stdout=StringIO())
@@ -0,0 +1,85 @@
+import os
+import tempfile
+from pathlib import Path
+from unittest.mock import patch
+
+from django.test import TestCase
+
+from hines.core import app_settings
+from hines.stats import static_data
+from hines.stats.generators import StaticGenerator
+from hines.stats.static_data import (
+    DEFAULT_DATA_DIR,
+    get_data_dir,
+    load_data,
+    load_series,
+)
+
+
+class StaticDataTestCase(TestCase):
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.addCleanup(static_data._data_files.clear)
+        self.data_dir = Path(tmp_dir.name)
+
+        patcher = patch.object(app_settings, "STATS_DATA_DIR", tmp_dir.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.path = self.data_dir / "things.toml"
+        self.path.write_text('[totals]\n"2002" = 50\n"2001" = 42\n\n[other]\n')
+
+    def test_data_dir(self):
+        self.assertEqual(get_data_dir(), self.data_dir)
+
+    @patch.object(app_settings, "STATS_DATA_DIR", "")
+    def test_default_data_dir(self):
+        self.assertEqual(get_data_dir(), DEFAULT_DATA_DIR)
+
+    def test_load_data(self):
+        data = load_data("things")
+
+        self.assertEqual(data, {"totals": {"2001": 42, "2002": 50}, "other": {}})
+        # Sorted by year:
+        self.assertEqual(list(data["totals"]), ["2001", "2002"])
+
+    def test_load_series(self):
+        self.assertEqual(load_series("things"), {"2001": 42, "2002": 50})
+        self.assertEqual(load_series("things", "other"), {})
+
+    def test_parses_once(self):
+        self.assertIs(load_data("things"), load_data("things"))
+
+    def test_parses_changed_file(self):
+        load_data("things")
+        self.path.write_text('[totals]\n"2001" = 43\n')
+        # Make sure the modified time is different:
+        stat = self.path.stat()
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+        self.assertEqual(load_data("things"), {"totals": {"2001": 43}})
+
+    def test_missing_file(self):
+        with self.assertRaises(FileNotFoundError):
+            load_data("nope")
+
+    def test_generator_uses_data_dir(self):
+        (self.data_dir / "headaches.toml").write_text('[totals]\n"2020" = 3\n')
+
+        result = StaticGenerator().get_headaches_per_year()
+
+        self.assertEqual(
+            result["data"],
+            [
+                {
+                    "label": "2020",
+                    "columns": {"headaches": {"label": "Headaches", "value": 3}},
+                }
+            ],
+        )
+
+    def test_all_data_files_load(self):
+        with patch.object(app_settings, "STATS_DATA_DIR", ""):
+            for path in DEFAULT_DATA_DIR.glob("*.toml"):
+                self.assertTrue(load_data(path.stem), path.name)
@@ -0,0 +1,245 @@
+import threading
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
+
+from hines.core import app_settings
+from hines.stats.generators import LastfmGenerator, StaticGenerator, WeblogGenerator
+from hines.stats.models import StatsSnapshot
+from hines.stats.views import StatsView
+from hines.weblogs.factories import BlogFactory, LivePostFactory
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class StatsViewChartCacheTestCase(TestCase):
+    def tearDown(self):
+        cache.clear()
+
+    def test_caches_chart_data(self):
+        view = StatsView()
+        first = view.get_chart_data("writing_per_year")
+
+        with patch.object(
+            WeblogGenerator, "get_posts_per_year", side_effect=AssertionError
+        ):
+            second = view.get_chart_data("writing_per_year")
+
+        self.assertEqual(first, second)
+        self.assertEqual(second["name"], "writing_per_year")
+
+    def test_shared_between_views(self):
+        StatsView().get_chart_data("headaches_per_year")
+
+        self.assertIsNotNone(
+            cache.get(StatsView().get_chart_cache_key("headaches_per_year"))
+        )
+
+    def test_timeout_from_generator(self):
+        with patch.object(cache, "set", wraps=cache.set) as cache_set:
+            StatsView().get_chart_data("lastfm_scrobbles_per_year")
+            StatsView().get_chart_data("steps_per_year")
+
+        self.assertEqual(cache_set.call_args_list[0].args[2], 3600)
+        self.assertEqual(LastfmGenerator.cache_timeout, 3600)
+        self.assertIsNone(cache_set.call_args_list[1].args[2])
+        self.assertIsNone(StaticGenerator.cache_timeout)
+
+    def test_saving_post_expires_weblog_charts(self):
+        blog = BlogFactory(slug="writing")
+        StatsView().get_chart_data("writing_per_year")
+        StatsView().get_chart_data("steps_per_year")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            LivePostFactory(blog=blog)
+
+        self.assertIsNone(
+            cache.get(StatsView().get_chart_cache_key("writing_per_year"))
+        )
+        self.assertIsNotNone(
+            cache.get(StatsView().get_chart_cache_key("steps_per_year"))
+        )
+
+    def test_all_charts_have_generators(self):
+        for page in StatsView.pages:
+            for chart in page["charts"]:
+                method = getattr(StatsView, f"get_data_{chart}")
+                self.assertTrue(hasattr(method, "chart_generator"), chart)
+
+
+class StatsViewEventsTestCase(TestCase):
+    def test_events_charts_share_one_query(self):
+        view = StatsView()
+        charts = next(p for p in StatsView.pages if p["slug"] == "events")["charts"]
+
+        with self.assertNumQueries(1):
+            for chart in charts:
+                view.get_live_data(chart)
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class StatsViewPendingChartsTestCase(TestCase):
+    def tearDown(self):
+        cache.clear()
+
+    def test_pending_charts(self):
+        response = self.client.get("/terry/stats/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(
+            response, 'data-chart-url="/terry/stats/data/writing_per_year.json"'
+        )
+        self.assertFalse(StatsSnapshot.objects.exists())
+
+    def test_page_with_pending_charts_not_cached(self):
+        self.client.get("/terry/stats/")
+        StatsView().get_chart_data("writing_per_year")
+
+        response = self.client.get("/terry/stats/")
+
+        self.assertIn("no-store", response["Cache-Control"])
+        self.assertContains(response, '<h2 id="writingperyear">')
+
+    def test_cache_tags_from_generators(self):
+        view = StatsView()
+        view.setup(RequestFactory().get("/terry/stats/"), slug="creating")
+        self.assertIn("posts", view.get_cache_tags())
+
+        view.setup(RequestFactory().get("/terry/stats/health/"), slug="health")
+        self.assertEqual(view.get_cache_tags(), [])
+
+    def test_ready_charts(self):
+        StatsView().get_chart_data("writing_per_year")
+
+        response = self.client.get("/terry/stats/")
+
+        self.assertNotContains(
+            response, 'data-chart-url="/terry/stats/data/writing_per_year.json"'
+        )
+        self.assertContains(response, '<h2 id="writingperyear">')
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class StatsChartDataViewTestCase(TestCase):
+    def tearDown(self):
+        cache.clear()
+
+    def test_response(self):
+        response = self.client.get("/terry/stats/data/steps_per_year.json")
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["name"], "steps_per_year")
+        self.assertIn("data", data)
+        self.assertIn('<h2 id="stepsperyear">', data["html"])
+
+    def test_headers(self):
+        response = self.client.get("/terry/stats/data/steps_per_year.json")
+
+        self.assertIn("ETag", response.headers)
+        self.assertIn("private", response.headers["Cache-Control"])
+        self.assertIn("max-age=86400", response.headers["Cache-Control"])
+
+    def test_max_age_from_generator(self):
+        lastfm = self.client.get("/terry/stats/data/lastfm_scrobbles_per_year.json")
+        writing = self.client.get("/terry/stats/data/writing_per_year.json")
+
+        self.assertIn("max-age=3600", lastfm.headers["Cache-Control"])
+        self.assertIn("max-age=0", writing.headers["Cache-Control"])
+
+    def test_not_modified(self):
+        response = self.client.get("/terry/stats/data/steps_per_year.json")
+
+        response = self.client.get(
+            "/terry/stats/data/steps_per_year.json",
+            headers={"if-none-match": response.headers["ETag"]},
+        )
+
+        self.assertEqual(response.status_code, 304)
+
+    def test_unknown_chart(self):
+        response = self.client.get("/terry/stats/data/nope.json")
+
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class StatsViewComputeChartsTestCase(TestCase):
+    url = "/terry/stats/health/"
+
+    def tearDown(self):
+        cache.clear()
+
+    @patch.object(app_settings, "STATS_CHART_WORKERS", 2)
+    def test_computes_missing_charts(self):
+        response = self.client.get(self.url)
+
+        self.assertNotContains(response, 'data-chart-url="')
+        self.assertContains(response, '<h2 id="headachesperyear">')
+        self.assertContains(response, '<h2 id="stepsperyear">')
+        self.assertEqual(StatsSnapshot.objects.count(), 2)
+
+    @patch.object(app_settings, "STATS_CHART_WORKERS", 2)
+    def test_computes_at_the_same_time(self):
+        # Each chart waits for the other to start, so would time out if they
+        # were computed one after the other.
+        barrier = threading.Barrier(2, timeout=5)
+
+        def wait_for_other(original):
+            def method(self):
+                barrier.wait()
+                return original(self)
+
+            return method
+
+        with (
+            patch.object(
+                StaticGenerator,
+                "get_headaches_per_year",
+                wait_for_other(StaticGenerator.get_headaches_per_year),
+            ),
+            patch.object(
+                StaticGenerator,
+                "get_steps_per_year",
+                wait_for_other(StaticGenerator.get_steps_per_year),
+            ),
+        ):
+            charts = StatsView().compute_charts(
+                ["headaches_per_year", "steps_per_year"]
+            )
+
+        self.assertEqual(set(charts), {"headaches_per_year", "steps_per_year"})
+
+    @patch.object(app_settings, "STATS_CHART_WORKERS", 2)
+    @patch.object(app_settings, "STATS_CHART_TIMEOUT", 0.1)
+    def test_timeout(self):
+        finish = threading.Event()
+        original = StaticGenerator.get_steps_per_year
+
+        def slow(self):
+            finish.wait(5)
+            return original(self)
+
+        with patch.object(StaticGenerator, "get_steps_per_year", slow):
+            response = self.client.get(self.url)
+            finish.set()
+
+        self.assertContains(
+            response, 'data-chart-url="/terry/stats/data/steps_per_year.json"'
+        )
+        self.assertContains(response, '<h2 id="headachesperyear">')
+
+    @patch.object(app_settings, "STATS_CHART_WORKERS", 2)
+    def test_closes_connections(self):
+        with patch("hines.stats.views.connections") as connections:
+            StatsView().compute_charts(["headaches_per_year", "steps_per_year"])
+
+        self.assertEqual(connections.close_all.call_count, 2)
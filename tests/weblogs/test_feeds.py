@@ -1,12 +1,16 @@
 from unittest.mock import patch
 
 from django.contrib.sites.models import Site
+from django.test import override_settings
 from django.utils.feedgenerator import rfc2822_date
+from django.utils.http import http_date
 from freezegun import freeze_time
 
 from hines.core.utils import make_datetime
 from hines.users.factories import UserFactory
 from hines.weblogs.factories import BlogFactory, DraftPostFactory, LivePostFactory
+from hines.weblogs.feeds import BlogPostsFeedRSS
+from tests import override_app_settings
 from tests.core.feeds import FeedTestCase
 
 
@@ -212,3 +216,224 @@ class BlogPostsFeedRSSTestCase(FeedTestCase):
             items[0].getElementsByTagName("dc:creator")[0].firstChild.wholeText,
             "Bob Ferris",
         )
+
+    def test_num_queries(self):
+        "The number of queries shouldn't depend on the number of items."
+        blog = BlogFactory(slug="other-blog")
+        LivePostFactory(blog=blog, tags=["Fish"])
+        url = "/terry/other-blog/feeds/posts/rss/"
+
+        num_queries = self.get_num_queries(url)
+
+        LivePostFactory.create_batch(3, blog=blog, tags=["Dogs", "Cats"])
+
+        self.assertEqual(self.get_num_queries(url), num_queries)
+
+    def test_etag_not_modified(self):
+        "It should return a 304 if the client has the current ETag."
+        etag = self.client.get(self.feed_url).headers["ETag"]
+
+        response = self.client.get(self.feed_url, headers={"If-None-Match": etag})
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+
+    def test_last_modified_not_modified(self):
+        "It should return a 304 if not modified since Last-Modified."
+        response = self.client.get(self.feed_url)
+        last_modified = response.headers["Last-Modified"]
+
+        latest = self.blog.public_posts.latest("time_modified").time_modified
+        self.assertEqual(last_modified, http_date(latest.timestamp()))
+
+        response = self.client.get(
+            self.feed_url, headers={"If-Modified-Since": last_modified}
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_changes_when_blog_changes(self):
+        "The Blog's details are in the feed, so should change the ETag"
+        etag = self.client.get(self.feed_url).headers["ETag"]
+
+        with freeze_time("2022-08-31 12:00:00", tz_offset=0):
+            self.blog.feed_title = "New Feed Title"
+            self.blog.save()
+
+            response = self.client.get(self.feed_url, headers={"If-None-Match": etag})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("New Feed Title", response.content.decode())
+
+    @override_app_settings(COMMENTS_ALLOWED=True, COMMENTS_CLOSE_AFTER_DAYS=30)
+    def test_etag_changes_when_comments_close(self):
+        "Whether comments are open is in the feed, so should change the ETag"
+        post = LivePostFactory(
+            blog=self.blog, time_published=make_datetime("2022-08-20 12:00:00")
+        )
+        etag = self.client.get(self.feed_url).headers["ETag"]
+
+        with freeze_time("2022-09-20 12:00:00", tz_offset=0):
+            self.assertFalse(post.comments_allowed)
+            response = self.client.get(self.feed_url, headers={"If-None-Match": etag})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.headers["Last-Modified"],
+            http_date(make_datetime("2022-09-19 12:00:00").timestamp()),
+        )
+
+    def test_etag_changes_when_post_removed(self):
+        "Removing any Post, even one not in the feed, should change the ETag."
+        etag = self.client.get(self.feed_url).headers["ETag"]
+
+        # The oldest one, which isn't in the feed:
+        self.blog.public_posts.order_by("time_published").first().delete()
+
+        response = self.client.get(self.feed_url, headers={"If-None-Match": etag})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers["ETag"], etag)
+
+
+# Don't cache entire pages, so that we're only testing the content cache:
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+    CACHE_MIDDLEWARE_SECONDS=0,
+)
+class BlogPostsFeedRSSContentCacheTestCase(FeedTestCase):
+    feed_url = "/terry/my-blog/feeds/posts/rss/"
+
+    def setUp(self):
+        super().setUp()
+        blog = BlogFactory(slug="my-blog")
+        LivePostFactory.create_batch(
+            2, blog=blog, time_published=make_datetime("2017-04-22 15:00:00")
+        )
+        # The most recent, so the first item in the feed:
+        self.post = LivePostFactory(
+            blog=blog,
+            intro="Old intro.",
+            body="",
+            time_published=make_datetime("2017-04-25 16:00:00"),
+        )
+
+    def get_content(self):
+        channel = self.get_channel_element(self.feed_url)
+        item = channel.getElementsByTagName("item")[0]
+        return item.getElementsByTagName("content:encoded")[0].firstChild.wholeText
+
+    def test_content_is_cached(self):
+        "A second request shouldn't render any of the items' content."
+        self.client.get(self.feed_url)
+
+        with patch.object(
+            BlogPostsFeedRSS, "item_content", autospec=True
+        ) as item_content:
+            self.client.get(self.feed_url)
+
+        item_content.assert_not_called()
+
+    def test_changed_item_is_rendered(self):
+        "Only the item that has been changed should be rendered again."
+        self.get_content()
+
+        self.post.intro = "New intro."
+        self.post.save()
+
+        with patch.object(
+            BlogPostsFeedRSS,
+            "item_content",
+            autospec=True,
+            side_effect=BlogPostsFeedRSS.item_content,
+        ) as item_content:
+            content = self.get_content()
+
+        self.assertEqual(item_content.call_count, 1)
+        self.assertIn("New intro.", content)
+
+
+@patch.object(BlogPostsFeedRSS, "archive_page_size", 2)
+class BlogPostsFeedRSSArchiveTestCase(FeedTestCase):
+    feed_url = "/terry/my-blog/feeds/posts/rss/"
+
+    def setUp(self):
+        super().setUp()
+        self.blog = BlogFactory(slug="my-blog")
+        # 9 Posts: 5 in the feed, and then 2 pages of archives.
+        # Two have the same time to check we use the pk to order them.
+        for day in (1, 2, 3, 3, 4, 5, 6, 7, 8):
+            LivePostFactory(
+                blog=self.blog,
+                time_published=make_datetime(f"2017-04-0{day} 12:00:00"),
+            )
+
+        site = Site.objects.get()
+        site.domain = "example.com"
+        site.save()
+
+    def get_links(self, channel):
+        "Returns a dict of rel: path for the channel's atom:link elements"
+        return {
+            el.getAttribute("rel"): el.getAttribute("href").replace(
+                "http://example.com", ""
+            )
+            for el in channel.getElementsByTagName("atom:link")
+        }
+
+    def get_guids(self, channel):
+        return [el.firstChild.wholeText for el in channel.getElementsByTagName("guid")]
+
+    def test_feed_links_to_archive(self):
+        channel = self.get_channel_element(self.feed_url)
+        links = self.get_links(channel)
+
+        self.assertIn("prev-archive", links)
+        self.assertNotIn("current", links)
+        self.assertEqual(len(channel.getElementsByTagName("fh:archive")), 0)
+
+    def test_archive_contains_all_posts(self):
+        "Following the prev-archive links we should see every Post once"
+        channel = self.get_channel_element(self.feed_url)
+        guids = self.get_guids(channel)
+        url = self.get_links(channel)["prev-archive"]
+        num_pages = 0
+
+        while url:
+            channel = self.get_channel_element(url)
+            guids += self.get_guids(channel)
+            url = self.get_links(channel).get("prev-archive")
+            num_pages += 1
+
+        self.assertEqual(num_pages, 2)
+        self.assertEqual(
+            guids,
+            [
+                p.get_absolute_url_with_domain()
+                for p in self.blog.public_posts.order_by("-time_published", "-pk")
+            ],
+        )
+
+    def test_archive_page(self):
+        url = self.get_links(self.get_channel_element(self.feed_url))["prev-archive"]
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        # It's complete, so can be cached for a long time:
+        self.assertIn("max-age=31536000", response.headers["Cache-Control"])
+
+        channel = self.get_channel_element(url)
+        links = self.get_links(channel)
+
+        self.assertEqual(len(channel.getElementsByTagName("fh:archive")), 1)
+        self.assertEqual(links["current"], self.feed_url)
+
+        # The pages before and after this should link back to it:
+        prev_channel = self.get_channel_element(links["prev-archive"])
+        self.assertEqual(self.get_links(prev_channel)["next-archive"], url)
+
+        next_channel = self.get_channel_element(links["next-archive"])
+        self.assertEqual(self.get_links(next_channel)["prev-archive"], url)
+
+    def test_archive_404(self):
+        response = self.client.get(f"{self.feed_url}archive/nope/")
+        self.assertEqual(response.status_code, 404)
@@ -1,7 +1,11 @@
+from datetime import timedelta
+
+from django.core.cache import cache
 from django.http.response import Http404
-from django.test import Client
+from django.test import Client, TestCase, override_settings
 
-from hines.core.utils import make_date, make_datetime
+from hines.core.utils import datetime_now, make_date, make_datetime
+from hines.custom_comments.factories import CustomCommentFactory
 from hines.users.models import User
 from hines.weblogs import views
 from hines.weblogs.factories import (
@@ -10,6 +14,7 @@ from hines.weblogs.factories import (
     LivePostFactory,
     ScheduledPostFactory,
 )
+from hines.weblogs.models import Post
 from tests import override_app_settings
 from tests.core.test_views import ViewTestCase
 
@@ -352,6 +357,53 @@ class PostDetailViewTestCase(ViewTestCase):
         self.assertEqual(response.context_data["blog"], self.blog)
 
 
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class PostDetailViewCacheTestCase(TestCase):
+    def setUp(self):
+        # Recent enough that comments are still open:
+        self.post = LivePostFactory(
+            blog=BlogFactory(slug="my-blog", allow_comments=True),
+            title="Old title",
+            allow_comments=True,
+            time_published=datetime_now() - timedelta(days=1),
+        )
+        self.url = self.post.get_absolute_url()
+
+    def tearDown(self):
+        super().tearDown()
+        cache.clear()
+
+    def test_page_is_cached(self):
+        self.client.get(self.url)
+        Post.objects.filter(pk=self.post.pk).update(title="New title")
+
+        self.assertContains(self.client.get(self.url), "Old title")
+
+    def test_comment_form_per_request(self):
+        "Each request should get its own comment form, with its own CSRF token"
+        response_1 = self.client.get(self.url)
+        response_2 = Client().get(self.url)
+
+        self.assertContains(response_1, 'id="comment-form"')
+        self.assertNotContains(response_1, "hines:per_request")
+        self.assertNotEqual(
+            response_1.context["csrf_token"], response_2.context["csrf_token"]
+        )
+        self.assertContains(response_2, str(response_2.context["csrf_token"]))
+
+    def test_comment_expires_page(self):
+        self.client.get(self.url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            CustomCommentFactory(
+                content_object=self.post, object_pk=self.post.pk, comment="Hello"
+            )
+
+        self.assertContains(self.client.get(self.url), "Hello")
+
+
 class PostRedirectViewTestCase(ViewTestCase):
     def setUp(self):
         super().setUp()